@@ -8,4 +8,6 @@ SRC_PATH = os.path.join(os.getcwd(), 'src')
 EXECUTOR_PATH = os.path.join(SRC_PATH, 'aceinna', 'executor.py')
 
 sys.path.append('./src')
-runpy.run_path(EXECUTOR_PATH, run_name='__main__')
+# the log parser workers import this file when they are spawned
+if __name__ == '__main__':
+    runpy.run_path(EXECUTOR_PATH, run_name='__main__')
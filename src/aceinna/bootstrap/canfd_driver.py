@@ -17,7 +17,7 @@ from ..framework.context import APP_CONTEXT
 from ..framework.utils import helper
 from ..framework.decorator import throttle
 
-from ..devices.widgets import(canfd, NTRIPClient, canfd_config)
+from ..devices.widgets import(canfd, NTRIPClient, canfd_config, create_rtcm_forwarder)
 from ..framework.utils import print as print_helper
 from ..framework.utils import resource
 from ..core.gnss import RTCMParser
@@ -83,6 +83,7 @@ class canfd_app_driver:
         self.rawdata_file = ''
         self.rover_file = ''
         self.base_file = None
+        self.rtcm_forwarder = None
         self.imu_log = {}
         self.ins_log = {}
         self.all_base_len = 0
@@ -625,8 +626,11 @@ class canfd_app_driver:
         self.start_parse()
 
     def ntrip_client_thread(self):
+        # messages are coalesced to fill the can frames
+        self.rtcm_forwarder = create_rtcm_forwarder(
+            self.send_base_data, self.options)
         self.ntrip_client = NTRIPClient(self.properties)
-        self.ntrip_client.on('canfd_base', self.send_base_data)
+        self.ntrip_client.on('canfd_base', self.rtcm_forwarder.put)
         self.ntrip_client.run()
 
     def send_base_data(self, data):
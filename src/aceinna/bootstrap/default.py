@@ -8,12 +8,13 @@ import threading
 from ..models import WebserverArgs
 
 from ..core.driver import (Driver, DriverEvents)
+from ..core.fleet_driver import FleetDriver
 from ..core.device_context import DeviceContext
 from ..core.tunnel_base import TunnelEvents
 
 from ..framework import AppLogger
 from ..framework.utils import resource
-from ..framework.constants import APP_TYPE
+from ..framework.constants import (APP_TYPE, INTERFACES)
 from ..framework.context import APP_CONTEXT
 
 
@@ -63,7 +64,11 @@ class Default:
         self._tunnel.notify('continous', packet_type, data)
 
     def _prepare_driver(self):
-        self._driver = Driver(self.options)
+        if self.options.fleet and self.options.interface in \
+                [INTERFACES.ETH_100BASE_T1, INTERFACES.UART]:
+            self._driver = FleetDriver(self.options)
+        else:
+            self._driver = Driver(self.options)
 
         self._driver.on(DriverEvents.Discovered,
                         self.handle_discovered)
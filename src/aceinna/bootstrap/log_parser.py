@@ -1,10 +1,16 @@
 import os
 import sys
 from ctypes import *
+from concurrent.futures import ProcessPoolExecutor
 from ..models import LogParserArgs
 from ..framework.constants import APP_TYPE
 from ..framework.context import APP_CONTEXT
 from ..framework.utils import resource
+from ..devices.parsers.ins401_log_decoder import (UserLogDecoder, MAX_FRAME_LEN)
+
+# log types could be decoded by the python backend
+PYTHON_LOG_TYPES = ['ins401', 'ins402', 'ins502']
+DEFAULT_CHUNK_SIZE = 32 * 1024 * 1024
 
 def prepare_lib_folder():
     executor_path = resource.get_executor_path()
@@ -38,26 +44,205 @@ def prepare_lib_folder():
     return lib_path
 
 
-def do_parse(log_type, folder_path, kml_rate, dr_parse):
-    lib_path = prepare_lib_folder()
+def _is_log_file(fname):
+    return (fname.startswith('user') and fname.endswith('.bin')) or \
+        (fname.startswith('ins_save') and fname.endswith('.bin')) or \
+        ('canfd' in fname and fname.endswith('.txt'))
+
 
-    lib = CDLL(lib_path)
+def _find_log_files(folder_path):
+    file_paths = []
     for root, _, file_name in os.walk(folder_path):
         for fname in file_name:
-            if (fname.startswith('user') and fname.endswith('.bin')) or (fname.startswith('ins_save') and fname.endswith('.bin')) or ('canfd' in fname and fname.endswith('.txt')):
-                file_path = os.path.join(folder_path, fname)
-                if log_type == 'rtkl':
-                    lib.decode_openrtk_inceptio(bytes(file_path, encoding='utf8'))
-                elif log_type == 'beidou':
-                    lib.decode_beidou(bytes(file_path, encoding='utf8'), kml_rate)
-                elif log_type == 'ins401' or log_type == 'ins402':
-                    lib.decode_ins401(bytes(file_path, encoding='utf8'), bytes(dr_parse, encoding='utf8'), kml_rate)
-                elif log_type == 'ins401c':
-                    lib.decode_ins401c(bytes(file_path, encoding='utf8'))
-                elif log_type == 'rtk350la':
-                    lib.decode_rtk350la(bytes(file_path, encoding='utf8'))
-                elif log_type == 'ins502':
-                    lib.decode_ins502(bytes(file_path, encoding='utf8'))
+            if _is_log_file(fname):
+                file_paths.append(os.path.join(root, fname))
+    return file_paths
+
+
+_LIBS = {}
+
+
+def decode_with_lib(lib_path, log_type, file_path, kml_rate, dr_parse):
+    '''
+    Decode a log file with UserDecoderLib, run in the worker processes
+    '''
+    lib = _LIBS.get(lib_path)
+    if lib is None:
+        lib = _LIBS[lib_path] = CDLL(lib_path)
+
+    path = bytes(file_path, encoding='utf8')
+    if log_type == 'rtkl':
+        lib.decode_openrtk_inceptio(path)
+    elif log_type == 'beidou':
+        lib.decode_beidou(path, kml_rate)
+    elif log_type == 'ins401' or log_type == 'ins402':
+        lib.decode_ins401(path, bytes(dr_parse, encoding='utf8'), kml_rate)
+    elif log_type == 'ins401c':
+        lib.decode_ins401c(path)
+    elif log_type == 'rtk350la':
+        lib.decode_rtk350la(path)
+    elif log_type == 'ins502':
+        lib.decode_ins502(path)
+    return file_path
+
+
+_DECODERS = {}
+
+
+def decode_chunk(file_path, start, end):
+    '''
+    Decode the frames start in [start, end) of a user log with the Python
+    decoder, run in the worker processes
+    '''
+    decoder = _DECODERS.get('user')
+    if decoder is None:
+        decoder = _DECODERS['user'] = UserLogDecoder()
+
+    with open(file_path, 'rb') as log_file:
+        log_file.seek(start)
+        # the last frame may end after the chunk
+        buffer = log_file.read(end - start + MAX_FRAME_LEN)
+    return decoder.decode_to_csv(buffer, 0, end - start)
+
+
+def _get_output_folder(file_path):
+    return os.path.splitext(file_path)[0] + '_p'
+
+
+def _split_file(file_path, chunk_size):
+    file_size = os.path.getsize(file_path)
+    return [(start, min(start + chunk_size, file_size))
+            for start in range(0, file_size, chunk_size)]
+
+
+class _CsvOutput(object):
+    '''
+    The CSV files of a decoded user log, chunks are written in file order
+    '''
+
+    def __init__(self, file_path, layouts):
+        self.folder = _get_output_folder(file_path)
+        self.layouts = layouts
+        self.files = {}
+        self.counts = dict((packet_type, 0) for packet_type in layouts)
+
+    def write(self, result):
+        for packet_type, (count, rows) in result.items():
+            if count == 0:
+                continue
+            output_file = self.files.get(packet_type)
+            if output_file is None:
+                layout = self.layouts[packet_type]
+                if not os.path.isdir(self.folder):
+                    os.makedirs(self.folder)
+                output_file = open(
+                    os.path.join(self.folder, layout.file_name), 'w')
+                output_file.write(layout.header)
+                self.files[packet_type] = output_file
+            output_file.write(rows)
+            self.counts[packet_type] += count
+
+    def close(self):
+        for output_file in self.files.values():
+            output_file.close()
+        self.files.clear()
+
+
+def _create_executor(workers):
+    if workers == 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers or None)
+
+
+def _run_jobs(executor, func, jobs):
+    '''
+    Run func on each job, the results are yielded in the order of jobs
+    '''
+    if executor is None:
+        for job in jobs:
+            yield func(*job)
+        return
+
+    futures = [executor.submit(func, *job) for job in jobs]
+    for future in futures:
+        yield future.result()
+
+
+def _parse_with_lib(executor, log_type, file_paths, kml_rate, dr_parse):
+    lib_path = prepare_lib_folder()
+    jobs = [(lib_path, log_type, file_path, kml_rate, dr_parse)
+            for file_path in file_paths]
+    for file_path in _run_jobs(executor, decode_with_lib, jobs):
+        print('Parsed {0}'.format(file_path))
+
+
+def _parse_with_python(executor, file_paths, chunk_size):
+    layouts = UserLogDecoder().layouts
+    for file_path in file_paths:
+        if not os.path.basename(file_path).startswith('user'):
+            print('Skip {0}, it is not supported by the python backend'.format(
+                file_path))
+            continue
+
+        jobs = [(file_path, start, end)
+                for start, end in _split_file(file_path, chunk_size)]
+        output = _CsvOutput(file_path, layouts)
+        try:
+            for result in _run_jobs(executor, decode_chunk, jobs):
+                output.write(result)
+        finally:
+            output.close()
+        print('Parsed {0}, packets: {1}'.format(
+            file_path,
+            ', '.join('{0} {1}'.format(layouts[packet_type].file_name[:-4], count)
+                      for packet_type, count in output.counts.items())))
+
+
+def _has_lib():
+    platform = sys.platform
+    if platform.startswith('win'):
+        lib_file = 'UserDecoderLib.dll'
+    elif platform.startswith('linux'):
+        lib_file = 'UserDecoderLib.so'
+    else:
+        return False
+    try:
+        return resource.get_content_from_bundle('libs', lib_file) is not None
+    except (IOError, OSError):
+        return False
+
+
+def _select_backend(log_type, backend):
+    if backend == 'auto':
+        if _has_lib() or log_type not in PYTHON_LOG_TYPES:
+            return 'native'
+        return 'python'
+
+    if backend == 'python' and log_type not in PYTHON_LOG_TYPES:
+        raise ValueError('Log type {0} is not supported by the python backend'
+                         .format(log_type))
+    return backend
+
+
+def do_parse(log_type, folder_path, kml_rate, dr_parse,
+             backend='auto', workers=1, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Decode the logs in folder_path. With workers other than 1, the files are
+    decoded by a process pool of the count of workers, 0 is the cpu count.
+    The python backend also splits large files to chunks of chunk_size.
+    '''
+    backend = _select_backend(log_type, backend)
+    file_paths = _find_log_files(folder_path)
+
+    executor = _create_executor(workers)
+    try:
+        if backend == 'python':
+            _parse_with_python(executor, file_paths, chunk_size)
+        else:
+            _parse_with_lib(executor, log_type, file_paths, kml_rate, dr_parse)
+    finally:
+        if executor:
+            executor.shutdown()
 
 
 class LogParser:
@@ -77,7 +262,9 @@ class LogParser:
         do_parse(self._options.log_type,
                  self._options.path,
                  self._options.kml_rate,
-                 self._options.powerdr)
+                 self._options.powerdr,
+                 backend=self._options.backend,
+                 workers=self._options.workers)
 
         os._exit(1)
 
@@ -10,19 +10,21 @@ from ..framework.context import APP_CONTEXT
 from ..framework.utils import helper
 from ..framework.decorator import throttle
 
-from ..devices.widgets import(NTRIPClient, OdometerListener, CanOptions)
+from ..devices.widgets import(NTRIPClient, OdometerListener, CanOptions, create_rtcm_forwarder)
 
 
 class Receiver:
     options = None
     _driver = None
     _ntrip_client = None
+    _rtcm_forwarder = None
     _odometer_listener = None
 
     def __init__(self, **kwargs) -> None:
         self.options = None
         self._driver = None
         self._ntrip_client = None
+        self._rtcm_forwarder = None
         self._odometer_listener = None
         self._build_options(**kwargs)
         APP_CONTEXT.mode = APP_TYPE.RECEIVER
@@ -64,10 +66,12 @@ class Receiver:
             self._ntrip_client.send(data)
 
     def _prepare_ntrip_client(self):
+        self._rtcm_forwarder = create_rtcm_forwarder(
+            self._handle_data_parsed, self.options)
         self._ntrip_client = NTRIPClient(
             APP_CONTEXT.device_context._provider.properties
         )
-        self._ntrip_client.on('parsed', self._handle_data_parsed)
+        self._ntrip_client.on('parsed', self._rtcm_forwarder.put)
         self._ntrip_client.run()
 
     def _handle_data_parsed(self, data):
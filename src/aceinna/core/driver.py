@@ -89,6 +89,10 @@ class Driver(EventBase):
         self._device_provider.on('continous',
                                  self._handle_receive_continous_data)
 
+        # a replay serves the recorded data once the logs are opened
+        if hasattr(self._communicator, 'start_replay'):
+            self._communicator.start_replay()
+
     def _handle_device_exception(self, error, message):
         # TODO: check the error type
         self.emit(DriverEvents.Error, error, message)
@@ -15,6 +15,14 @@ class EventBase(object):
 
         self.listeners[event_type].append(handler)
 
+    def off(self, event_type, handler):
+        '''
+        Remove the handler of event
+        '''
+        handlers = self.listeners.get(event_type)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+
     def emit(self, event_type, *args, **kwargs):
         '''
         Trigger event
@@ -0,0 +1,195 @@
+import os
+import re
+from .event_base import EventBase
+from .driver import DriverEvents
+from .packet_statistics import PacketStatistics
+from ..devices.upgrade_orchestrator import (UpgradeOrchestrator, DEFAULT_CONCURRENCY)
+from ..devices.upgrade_workers import UPGRADE_EVENT
+from ..framework.utils.print import print_red
+from ..framework.constants import INTERFACES
+
+
+def _get_folder_name(device_key):
+    # the mac without ':', or the port without '/' and '.'
+    return re.sub(r'[^0-9A-Za-z_-]', '', device_key)
+
+
+class FleetDriver(EventBase):
+    ''' Drive the devices on a 100base-t1 network card with one capture, or
+        the devices on the serial ports of --com-port with UART.
+        Each device has its own provider, so its own message center, parser,
+        logger and statistics. Commands are addressed by the mac or the port
+        of device.
+    '''
+
+    def __init__(self, options, fleet=None):
+        super(FleetDriver, self).__init__()
+        self._options = options
+        self._fleet = fleet
+        self._providers = {}
+        # kept by mac, the counters of a device survive its reconnect
+        self._statistics = {}
+
+    def detect(self):
+        ''' Discover the devices, then setup a provider for each one
+        '''
+        if self._fleet is None:
+            if self._options.interface == INTERFACES.UART:
+                from ..framework.communicators.serial_fleet import SerialFleet
+                self._fleet = SerialFleet(self._options)
+            else:
+                from ..framework.communicators.ethernet_fleet import EthernetFleet
+                self._fleet = EthernetFleet(self._options)
+
+        units = self._fleet.discover()
+        if not units:
+            print_red('No device was found on the network card or serial ports')
+            return
+
+        for unit in units:
+            if unit.device_key in self._providers:
+                continue
+            # a device not found stays out of the fleet, the others go on
+            try:
+                unit.find_device(
+                    lambda device_provider, unit=unit:
+                    self._device_discover_handler(unit, device_provider))
+            except Exception as ex:  # pylint: disable=broad-except
+                print_red('Device {0} is not found: {1}'.format(
+                    unit.device_key, ex))
+
+    def _device_discover_handler(self, unit, device_provider):
+        '''
+        Handler after a device of fleet discovered
+        '''
+        statistics = self._statistics.get(unit.device_key)
+        if statistics is None:
+            statistics = PacketStatistics()
+            receive_cache = getattr(unit, 'receive_cache', None)
+            if receive_cache is not None:
+                statistics.register_buffer('ethernet_receive', receive_cache)
+            self._statistics[unit.device_key] = statistics
+        device_provider.statistics = statistics
+
+        # log of each device is in the folder named by its key, a provider
+        # found again on reconnect has the folder already
+        data_folder = getattr(device_provider, 'data_folder', None)
+        folder_name = _get_folder_name(unit.device_key)
+        if data_folder and \
+                os.path.basename(os.path.normpath(data_folder)) != folder_name:
+            unit_folder = os.path.join(data_folder, folder_name)
+            if not os.path.isdir(unit_folder):
+                os.makedirs(unit_folder)
+            device_provider.data_folder = unit_folder
+
+        self._providers[unit.device_key] = device_provider
+        device_provider.setup(self._options)
+        device_provider.on(
+            'exception',
+            lambda error, message, unit=unit:
+            self._handle_device_exception(unit, error, message))
+        device_provider.on(
+            'upgrade_failed',
+            lambda code, reason: self.emit(DriverEvents.UpgradeFail, code, reason))
+        device_provider.on(
+            'upgrade_restart',
+            lambda unit=unit: self._handle_device_upgrade_restart(unit))
+        device_provider.on(
+            'continous',
+            lambda packet_type, data: self.emit(
+                DriverEvents.Continous, packet_type, data))
+
+        self.emit(DriverEvents.Discovered, device_provider)
+
+    def _handle_device_exception(self, unit, error, message):
+        self.emit(DriverEvents.Error, error, message)
+        device_provider = self._providers.pop(unit.device_key, None)
+        if device_provider:
+            device_provider.reset()
+        unit.find_device(
+            lambda device_provider, unit=unit:
+            self._device_discover_handler(unit, device_provider),
+            not_found_handler=lambda: self.emit(DriverEvents.Lost))
+
+    def _handle_device_upgrade_restart(self, unit):
+        def upgrade_restart_handler(device_provider):
+            self._providers[unit.device_key] = device_provider
+            device_provider.upgrade_completed(self._options)
+            self.emit(DriverEvents.UpgradeFinished)
+
+        def not_found_handler():
+            self._providers.pop(unit.device_key, None)
+            self.emit(DriverEvents.UpgradeFail, 'UPGRADE.FAILED.002',
+                      'Cannot detect device after upgrade firmware')
+            self.emit(DriverEvents.Lost)
+            print_red('Upgrade fail. The device {0} lost.'.format(
+                unit.device_key))
+
+        unit.find_device(upgrade_restart_handler, retries=2,
+                         not_found_handler=not_found_handler)
+
+    def get_providers(self):
+        ''' Providers of the discovered devices, by mac or port
+        '''
+        return dict(self._providers)
+
+    def get_statistics(self):
+        ''' Packet statistics of each device, by mac or port
+        '''
+        return dict((mac, provider.statistics.get_result())
+                    for mac, provider in self._providers.items())
+
+    def upgrade_all(self, params):
+        ''' Upgrade the firmware of all discovered devices, params is the same
+            as upgrade_framework of provider
+        '''
+        max_concurrency = (self._options and self._options.upgrade_concurrency) \
+            or DEFAULT_CONCURRENCY
+        orchestrator = UpgradeOrchestrator(self._providers, max_concurrency)
+        orchestrator.on(
+            UPGRADE_EVENT.ERROR,
+            lambda mac, message: print_red('Upgrade {0} failed: {1}'.format(mac, message)))
+        orchestrator.on(
+            UPGRADE_EVENT.FINISH,
+            lambda mac: print('Upgrade {0} finished'.format(mac)))
+        result = orchestrator.run(params)
+        print('Upgraded {0} devices, {1} failed, {2} devices per hour'.format(
+            result['succeeded'], result['failed'], result['units_per_hour']))
+        return {
+            'packetType': 'success',
+            'data': result
+        }
+
+    def execute(self, method, parameters=None):
+        ''' Execute command on the device of parameters['mac'] or
+            parameters['port'], it could be omitted when there is only one
+            device. An upgrade without it is done on all devices.
+        '''
+        key = None
+        if isinstance(parameters, dict):
+            key = parameters.get('mac') or parameters.get('port')
+        if method == 'upgrade_framework' and not key:
+            return self.upgrade_all(parameters)
+
+        if key:
+            device_provider = self._providers.get(key) or \
+                self._providers.get(key.lower())
+        elif len(self._providers) == 1:
+            device_provider = list(self._providers.values())[0]
+        else:
+            device_provider = None
+
+        if device_provider is None:
+            return {
+                'packetType': 'error',
+                'data': 'Device {0} is not found'.format(key)
+            }
+
+        return getattr(device_provider, method, None)(parameters)
+
+    def close(self):
+        for device_provider in self._providers.values():
+            device_provider.close()
+        self._providers.clear()
+        if self._fleet:
+            self._fleet.close()
@@ -1,129 +1,316 @@
-import collections
+import math
 import time
+import threading
 
+# rate windows in seconds, counted by the buckets of RATE_BUCKET_TIME
+RATE_WINDOWS = [1, 10, 60]
+RATE_BUCKET_TIME = 0.1
+# an interval longer than GAP_FACTOR times of the expected one is a gap
+GAP_FACTOR = 2.5
+GAP_AVERAGE_WEIGHT = 1.0 / 16
+GAP_MIN_PACKETS = 10
+# histogram values are in microseconds, 2**SUB_BUCKET_BITS buckets per octave
+SUB_BUCKET_BITS = 4
+MAX_HISTOGRAM_VALUE = 2 ** 40
+HISTOGRAM_PERCENTILES = [('p50', 0.5), ('p90', 0.9), ('p99', 0.99)]
 
-def calculate_collect(packet_collection, failure_collection, key):
-    ''' Calculate collect data as statistics
+
+class RateCounter(object):
+    ''' Count events in a ring of time buckets, the count of each window is
+        kept as a running total, so adding an event and reading a rate are O(1)
+    '''
+
+    def __init__(self, windows=RATE_WINDOWS, bucket_time=RATE_BUCKET_TIME):
+        self.windows = list(windows)
+        self.bucket_time = bucket_time
+        self._window_buckets = [int(round(window / bucket_time))
+                                for window in self.windows]
+        self._buckets = [0] * max(self._window_buckets)
+        self._totals = [0] * len(self.windows)
+        self._first_bucket = None
+        self._current_bucket = None
+
+    def reset(self):
+        self._buckets = [0] * len(self._buckets)
+        self._totals = [0] * len(self.windows)
+        self._first_bucket = None
+        self._current_bucket = None
+
+    def add(self, event_time, count=1):
+        self.advance(event_time)
+        self._buckets[self._current_bucket % len(self._buckets)] += count
+        for index in range(len(self._totals)):
+            self._totals[index] += count
+
+    def advance(self, now):
+        ''' Move the current bucket to now, buckets leaving a window are
+            subtracted from its total
+        '''
+        bucket = int(now / self.bucket_time)
+        if self._current_bucket is None:
+            self._first_bucket = self._current_bucket = bucket
+            return
+        if bucket <= self._current_bucket:
+            return
+
+        size = len(self._buckets)
+        if bucket - self._current_bucket >= size:
+            self._buckets = [0] * size
+            self._totals = [0] * len(self.windows)
+            self._current_bucket = bucket
+            return
+
+        buckets = self._buckets
+        window_buckets = self._window_buckets
+        totals = self._totals
+        for current in range(self._current_bucket + 1, bucket + 1):
+            # the bucket leaves a window of count buckets, the largest window
+            # leaves the bucket to be reused
+            for index, count in enumerate(window_buckets):
+                totals[index] -= buckets[(current - count) % size]
+            buckets[current % size] = 0
+        self._current_bucket = bucket
+
+    def get_rates(self, now=None):
+        ''' Events per second of each window, a window not filled yet is
+            divided by the time passed
+        '''
+        if now is not None:
+            self.advance(now)
+        if self._current_bucket is None:
+            return [0] * len(self.windows)
+
+        passed = (self._current_bucket - self._first_bucket + 1) * self.bucket_time
+        return [round(total / min(window, passed), 1)
+                for window, total in zip(self.windows, self._totals)]
+
+
+class LatencyHistogram(object):
+    ''' Log-linear histogram of microsecond values, like HdrHistogram. The
+        buckets of an octave are 2**SUB_BUCKET_BITS, so a value is kept with
+        about 6% precision in constant memory
+    '''
+
+    def __init__(self):
+        self._sub_bucket_count = 1 << SUB_BUCKET_BITS
+        octaves = int(math.log2(MAX_HISTOGRAM_VALUE)) - SUB_BUCKET_BITS + 1
+        self._counts = [0] * (self._sub_bucket_count * (octaves + 1))
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def reset(self):
+        self._counts = [0] * len(self._counts)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _get_index(self, value):
+        sub_bucket_count = self._sub_bucket_count
+        if value < sub_bucket_count:
+            return value
+        shift = value.bit_length() - SUB_BUCKET_BITS - 1
+        return sub_bucket_count * (shift + 1) + (value >> shift) - sub_bucket_count
+
+    def _get_value(self, index):
+        ''' The middle of the bucket of index
+        '''
+        sub_bucket_count = self._sub_bucket_count
+        if index < sub_bucket_count:
+            return index
+        shift = index // sub_bucket_count - 1
+        mantissa = index % sub_bucket_count + sub_bucket_count
+        return (mantissa << shift) + (1 << shift) // 2
+
+    def record(self, value):
+        ''' Record a value in microseconds
+        '''
+        value = min(max(int(value), 0), MAX_HISTOGRAM_VALUE - 1)
+        self._counts[self._get_index(value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def get_percentile(self, ratio):
+        if self.count == 0:
+            return 0
+        target = max(int(math.ceil(self.count * ratio)), 1)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= target:
+                return min(self._get_value(index), self.max)
+        return self.max
+
+    def get_result(self):
+        if self.count == 0:
+            return None
+        result = {
+            'count': self.count,
+            'min': self.min,
+            'mean': round(self.total / self.count, 1),
+            'max': self.max
+        }
+        for name, ratio in HISTOGRAM_PERCENTILES:
+            result[name] = self.get_percentile(ratio)
+        return result
+
+
+class PacketCollect(object):
+    ''' Statistics of a packet type
     '''
-    received = 0
-    crc_failures = 0
-    rate = 0
 
-    if key in packet_collection:
-        received = packet_collection[key]['received']
-        rate = packet_collection[key]['rate']
+    def __init__(self):
+        self.received = 0
+        self.failures = 0
+        self.rate_counter = RateCounter()
+        self.interval_histogram = LatencyHistogram()
+        self.latency_histogram = LatencyHistogram()
+        self.last_event_time = None
+        self.expected_interval = None
+        self.gaps = 0
+        self.missing = 0
+        self.max_gap = 0
+        self.last_sequence = None
+        self.sequence_step = None
+        self.sequence_drops = 0
+        self.sequence_resets = 0
+
+    def reset(self):
+        self.__init__()
+
+    def add(self, event_time, sequence=None, latency=None):
+        self.received += 1
+        self.rate_counter.add(event_time)
+
+        if self.last_event_time is not None:
+            interval = event_time - self.last_event_time
+            self.interval_histogram.record(interval * 1e6)
+            self._check_gap(interval)
+        self.last_event_time = event_time
 
-    if key in failure_collection:
-        crc_failures = failure_collection[key]
+        if latency is not None:
+            self.latency_histogram.record(latency * 1e6)
 
-    calculate_result = {
-        'received': received,
-        'failures': crc_failures,
-        'rate': rate,
-        # 'event_time': event_time
-    }
+        if sequence is not None:
+            self._check_sequence(sequence)
 
-    return calculate_result
+    def _check_gap(self, interval):
+        # the expected interval is a moving average of the intervals which
+        # are not gaps
+        expected = self.expected_interval
+        if expected is None:
+            self.expected_interval = interval
+            return
+        if self.received > GAP_MIN_PACKETS and expected > 0 and \
+                interval > expected * GAP_FACTOR:
+            self.gaps += 1
+            self.missing += max(int(round(interval / expected)) - 1, 1)
+            self.max_gap = max(self.max_gap, interval)
+            return
+        self.expected_interval = expected + (interval - expected) * GAP_AVERAGE_WEIGHT
+
+    def _check_sequence(self, sequence):
+        last_sequence = self.last_sequence
+        self.last_sequence = sequence
+        if last_sequence is None:
+            return
+
+        step = sequence - last_sequence
+        if step <= 0:
+            self.sequence_resets += 1
+            return
+        # the smallest step is the step of sequence
+        if self.sequence_step is None or step < self.sequence_step:
+            self.sequence_step = step
+            return
+        dropped = int(round(step / self.sequence_step)) - 1
+        if dropped > 0:
+            self.sequence_drops += dropped
+
+    def get_result(self, now=None):
+        ''' The rates are up to now, the time of packets as time.time() by
+            default, so a stopped stream drops to 0
+        '''
+        rates = self.rate_counter.get_rates(time.time() if now is None else now)
+        return {
+            'received': self.received,
+            'failures': self.failures,
+            'rate': rates[0],
+            'rates': dict(zip(['{0}s'.format(window) for window in RATE_WINDOWS], rates)),
+            'interval_us': self.interval_histogram.get_result(),
+            'latency_us': self.latency_histogram.get_result(),
+            'gaps': self.gaps,
+            'missing': self.missing,
+            'max_gap': round(self.max_gap, 6),
+            'sequence_drops': self.sequence_drops,
+            'sequence_resets': self.sequence_resets
+        }
 
 
 class PacketStatistics:
     ''' Packet Statistics Service
     '''
-    # {
-    #   'z1': Freeze sized Queue,
-    #   'pos': Freeze sized Queue,
-    # }
-    _packet_collect_dict = {}
-    _failure_collect_dict = {}
-    _last_statistics = None
-    _last_time = None
-
-    def _get_packet_types(self):
-        packet_types_in_success = self._packet_collect_dict.keys()
-        packet_types_in_failure = self._failure_collect_dict.keys()
-        packet_types = list(packet_types_in_success)
-
-        for packet_type in packet_types_in_failure:
-            if packet_type not in packet_types:
-                packet_types.append(packet_type)
-
-        if len(packet_types) == 0:
-            return None
 
-        return packet_types
+    def __init__(self):
+        self._collect_dict = {}
+        self._buffer_dict = {}
+        self._last_statistics = None
+        self._lock = threading.Lock()
+
+    def _get_collect(self, packet_type):
+        collect = self._collect_dict.get(packet_type)
+        if collect is None:
+            collect = self._collect_dict[packet_type] = PacketCollect()
+        return collect
+
+    def collect(self, collect_type, packet_type, event_time, sequence=None, latency=None):
+        ''' Collect packet type. sequence is a number increased by the device
+            for each packet, like the time of week, used to find the dropped
+            packets. latency is the seconds from reading to parsing the packet.
+        '''
+        with self._lock:
+            collect = self._get_collect(packet_type)
+            if collect_type == 'success':
+                collect.add(event_time, sequence, latency)
+
+            if collect_type == 'fail':
+                collect.failures += 1
 
-    def collect(self, collect_type, packet_type, event_time):
-        ''' Collect packet type
+    def register_buffer(self, name, buffer):
+        ''' Register a receive buffer, its drop and high watermark counters
+            are read when getting the buffer result
         '''
-        if collect_type == 'success':
-            if packet_type not in self._packet_collect_dict:
-                self._packet_collect_dict[packet_type] = {
-                    'received': 0,
-                    # max calculate 500Hz
-                    'sampling': collections.deque(maxlen=500),
-                    'rate': 0,
-                    'last_calculate_time': event_time,
-                }
-
-            self._packet_collect_dict[packet_type]['received'] += 1
-            self._packet_collect_dict[packet_type]['sampling'].append(
-                event_time
-            )
-
-            last_calculate_time = self._packet_collect_dict[packet_type]['last_calculate_time']
-            duration = event_time - last_calculate_time
-
-            if duration >= 1:
-                count = 0
-
-                try:
-                    start = self._packet_collect_dict[packet_type]['sampling'].index(
-                        last_calculate_time)
-                    end = self._packet_collect_dict[packet_type]['sampling'].index(
-                        event_time)
-                    count = end - start
-                except ValueError:
-                    count = 0
-
-                self._packet_collect_dict[packet_type]['rate'] = round(
-                    count/duration, 1)
-
-                self._packet_collect_dict[packet_type]['last_calculate_time'] = event_time
-
-        if collect_type == 'fail':
-            if packet_type not in self._failure_collect_dict:
-                self._failure_collect_dict[packet_type] = 0
-
-            self._failure_collect_dict[packet_type] += 1
+        self._buffer_dict[name] = buffer
 
     def reset(self):
         ''' Reset statistics
         '''
-        for packet_type in self._packet_collect_dict:
-            self._packet_collect_dict[packet_type]['received'] = 0
-            self._packet_collect_dict[packet_type]['rate'] = 0
+        with self._lock:
+            for collect in self._collect_dict.values():
+                collect.reset()
 
-        for packet_type in self._failure_collect_dict:
-            self._failure_collect_dict[packet_type] = 0
+        for name in self._buffer_dict:
+            self._buffer_dict[name].reset_counters()
 
-        self._last_time = None
-
-    def get_result(self):
-        ''' Get statistics result
+    def get_result(self, now=None):
+        ''' Get statistics result, None if nothing is changed since last time.
+            The rates are up to now, time.time() by default
         '''
-        packet_types = self._get_packet_types()
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if len(self._collect_dict) == 0:
+                return None
 
-        if not packet_types:
-            return None
-
-        result = {}
-        for key in packet_types:
-            statistics_result = calculate_collect(
-                self._packet_collect_dict,
-                self._failure_collect_dict,
-                key
-            )
-            result[key] = statistics_result
+            result = {}
+            for packet_type, collect in self._collect_dict.items():
+                result[packet_type] = collect.get_result(now)
 
         # diff the last statistics, if no change, return None
         if self._last_statistics == result:
@@ -132,3 +319,15 @@ class PacketStatistics:
         self._last_statistics = result
 
         return result
+
+    def get_buffer_result(self):
+        ''' Get the counters of registered receive buffers
+        '''
+        if len(self._buffer_dict) == 0:
+            return None
+
+        result = {}
+        for name in self._buffer_dict:
+            result[name] = self._buffer_dict[name].get_counters()
+
+        return result
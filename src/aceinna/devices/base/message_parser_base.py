@@ -1,7 +1,20 @@
+import collections
 from abc import ABCMeta, abstractmethod
 from . import EventBase
+from ..parsers.packet_decoder import get_output_decoder
 from ...framework.utils import helper
 
+
+class PACKET_CATEGORY:
+    INPUT = 'input'
+    OTHER_OUTPUT = 'other'
+    OUTPUT = 'output'
+
+
+PacketDispatch = collections.namedtuple(
+    'PacketDispatch', ['category', 'decoder', 'configuration'])
+
+
 class MessageParserBase(EventBase):
     '''
         Message parser base
@@ -10,10 +23,16 @@ class MessageParserBase(EventBase):
 
     properties = None
     run_command = ''
+    # packet types of the device, overridden by the parsers
+    input_packets = []
+    other_output_packets = []
 
     def __init__(self, configuration):
         super(MessageParserBase, self).__init__()
-        self.properties = configuration
+        self._dispatch_table = {}
+        self._input_packet_configs = {}
+        self._dispatch_source = None
+        self.set_configuration(configuration)
 
     @abstractmethod
     def set_run_command(self, command):
@@ -33,6 +52,78 @@ class MessageParserBase(EventBase):
         '''
         self.properties = configuration
 
+        source = self._get_dispatch_source(configuration)
+        if self._dispatch_source is None or \
+                any(a is not b for a, b in zip(self._dispatch_source, source)):
+            self._build_dispatch_table(configuration)
+            self._dispatch_source = source
+
+    def match_command_handler(self, packet_type):  # pylint: disable=unused-argument
+        '''
+        Find the payload parser of an input packet
+        '''
+        return None
+
+    def other_output_parser(self, payload):
+        '''
+        Payload parser of the packets in other_output_packets
+        '''
+        return payload
+
+    def get_dispatch(self, packet_type):
+        '''
+        Get the PacketDispatch of packet type, None if it is unknown
+        '''
+        return self._dispatch_table.get(packet_type)
+
+    def get_input_packet_config(self, packet_type):
+        '''
+        Get the inputPackets configuration of packet type
+        '''
+        return self._input_packet_configs.get(packet_type)
+
+    def _get_dispatch_source(self, configuration):
+        user_messages = configuration.get('userMessages', {}) \
+            if configuration else {}
+        return (configuration,
+                user_messages.get('outputPackets'),
+                user_messages.get('inputPackets'))
+
+    def _build_dispatch_table(self, configuration):
+        '''
+        Map packet type to its category, payload decoder and configuration.
+        Input packets take precedence over other output packets, which take
+        precedence over the configured output packets.
+        '''
+        _, output_packets, input_packets = self._get_dispatch_source(
+            configuration)
+
+        dispatch_table = {}
+        for packet_config in output_packets or []:
+            if packet_config['name'] in dispatch_table:
+                continue
+            dispatch_table[packet_config['name']] = PacketDispatch(
+                PACKET_CATEGORY.OUTPUT,
+                get_output_decoder(packet_config).decode,
+                packet_config)
+
+        for packet_type in self.other_output_packets:
+            dispatch_table[packet_type] = PacketDispatch(
+                PACKET_CATEGORY.OTHER_OUTPUT, self.other_output_parser, None)
+
+        input_packet_configs = {}
+        for packet_config in input_packets or []:
+            input_packet_configs.setdefault(packet_config['name'], packet_config)
+
+        for packet_type in self.input_packets:
+            dispatch_table[packet_type] = PacketDispatch(
+                PACKET_CATEGORY.INPUT,
+                self.match_command_handler(packet_type),
+                input_packet_configs.get(packet_type))
+
+        self._dispatch_table = dispatch_table
+        self._input_packet_configs = input_packet_configs
+
     def get_packet_info(self, raw_command):
         '''
         Build packet info
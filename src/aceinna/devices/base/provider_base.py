@@ -12,6 +12,7 @@ from . import EventBase
 from ...framework.context import APP_CONTEXT
 from ...framework.utils import (helper, resource)
 from ...framework.file_storage import FileLoger
+from ...framework.columnar_storage import ColumnarFileLoger
 from ...framework.configuration import get_config
 from ...framework.ans_platform_api import AnsPlatformAPI
 from ...framework.progress_bar import ProgressBar
@@ -25,6 +26,9 @@ if sys.version_info[0] > 2:
 else:
     from Queue import Queue
 
+# fields of GPS time of week in the parsed output packets
+SEQUENCE_FIELDS = ['GPS_TimeofWeek', 'GPS_TimeOfWeek', 'TimeOfWeek']
+
 
 class OpenDeviceBase(EventBase):
     '''
@@ -57,6 +61,11 @@ class OpenDeviceBase(EventBase):
         self._pbar = None
         self._device_info_string = ''
         self.with_upgrade_error = False
+        self.statistics = APP_CONTEXT.statistics
+        # False when the device is upgraded together with other devices, an
+        # upgrade error is reported instead of exiting the process
+        self.exclusive_upgrade = True
+        self._preloaded_firmware = None
 
     @property
     def is_in_bootloader(self):
@@ -148,12 +157,14 @@ class OpenDeviceBase(EventBase):
         3. log raw data
         '''
         self.load_properties()
-        self._logger = FileLoger(self.properties)
         self.cli_options = options
+        self._logger = self._create_data_logger()
 
         with_data_log = options and options.with_data_log
+        command_window = options and options.command_window
 
         self._setup_message_center()
+        self._message_center.set_pipeline_window(command_window)
 
         if with_data_log and not self.is_logging and self.enable_data_log:
             log_result = self._logger.start_user_log('data')
@@ -176,22 +187,43 @@ class OpenDeviceBase(EventBase):
         event handler after got continuous message
         '''
         # collect output packet data for statistics
-        APP_CONTEXT.statistics.collect('success', packet_type, event_time)
+        read_time = kwargs.pop('read_time', None)
+        self.statistics.collect(
+            'success', packet_type, event_time,
+            sequence=self.get_packet_sequence(packet_type, data),
+            latency=event_time - read_time if read_time else None)
 
         if isinstance(data, list):
-            for item in data:
-                self._logger.append(packet_type, item)
+            self._logger.append_many(packet_type, data)
         else:
             self._logger.append(packet_type, data)
 
         self.on_receive_output_packet(packet_type, data, *args, **kwargs)
 
+    def get_packet_sequence(self, packet_type, data):
+        '''
+        Sequence of an output packet to find the dropped packets, it is the
+        GPS time of week of a parsed packet, None if not known
+        '''
+        if not isinstance(data, dict):
+            return None
+        for field in SEQUENCE_FIELDS:
+            if field in data:
+                return data[field]
+        return None
+
+    def get_upgrade_window(self):
+        '''
+        Number of firmware blocks sent before their acks when upgrading
+        '''
+        return (self.cli_options and self.cli_options.upgrade_window) or 1
+
     def on_crc_failure(self, packet_type, event_time):
         '''
         event handler when got crc failure
         '''
         # save store crc data in app context
-        APP_CONTEXT.statistics.collect('fail', packet_type, event_time)
+        self.statistics.collect('fail', packet_type, event_time)
 
     @abstractmethod
     def on_read_raw(self, data):
@@ -277,6 +309,8 @@ class OpenDeviceBase(EventBase):
                 return
 
             workers = self.get_upgrade_workers(firmware_content)
+            for worker in workers:
+                worker.exit_on_error = self.exclusive_upgrade
 
             upgrade_center = UpgradeCenter()
             upgrade_center.register_workers(workers)
@@ -284,7 +318,8 @@ class OpenDeviceBase(EventBase):
             upgrade_center.on('error', self.handle_upgrade_error)
             upgrade_center.on('finish', self.handle_upgrade_complete)
 
-            self._pbar = ProgressBar(total=upgrade_center.total)
+            if self.exclusive_upgrade:
+                self._pbar = ProgressBar(total=upgrade_center.total)
             upgrade_center.start()
 
         except Exception as ex:  # pylint:disable=broad-except
@@ -337,10 +372,20 @@ class OpenDeviceBase(EventBase):
 
         return firmware_content
 
+    def preload_firmware(self, file, firmware_content):
+        '''
+        Use the content read before as the firmware of file, so a firmware
+        upgraded to many devices is read once
+        '''
+        self._preloaded_firmware = (file, firmware_content)
+
     def download_firmware(self, file):
         '''
         Downlaod firmware from Azure storage
         '''
+        if self._preloaded_firmware and self._preloaded_firmware[0] == file:
+            return True, self._preloaded_firmware[1]
+
         can_download = False
         firmware_content = None
         try:
@@ -359,8 +404,8 @@ class OpenDeviceBase(EventBase):
         self.is_upgrading = False
 
         self.load_properties()
-        self._logger = FileLoger(self.properties)
         self.cli_options = options
+        self._logger = self._create_data_logger()
 
         self._message_center.get_parser().set_configuration(self.properties)
         self._message_center.resume()
@@ -375,6 +420,15 @@ class OpenDeviceBase(EventBase):
 
         self.after_upgrade_completed()
 
+    def _create_data_logger(self):
+        '''
+        Create the logger of output packets, as CSV or .npy record files
+        '''
+        data_log_format = self.cli_options and self.cli_options.data_log_format
+        if data_log_format == 'npy':
+            return ColumnarFileLoger(self.properties)
+        return FileLoger(self.properties)
+
     def start_data_log(self, *args):
         '''
         Start to log
@@ -383,7 +437,7 @@ class OpenDeviceBase(EventBase):
             return False
 
         if self._logger is None:
-            self._logger = FileLoger(self.properties)
+            self._logger = self._create_data_logger()
 
         log_result = self._logger.start_user_log('data')
         if log_result == 1 or log_result == 2:
@@ -412,7 +466,8 @@ class OpenDeviceBase(EventBase):
         # self.add_output_packet('upgrade_complete', {
         #                        'success': False, 'message': message})
         print("upgrade_failed")
-        os._exit(1)
+        if self.exclusive_upgrade:
+            os._exit(1)
 
     def handle_upgrade_process(self, step, current, total):
         if self._pbar:
@@ -447,7 +502,7 @@ class OpenDeviceBase(EventBase):
         }
 
     def reset_statistics(self, *args):
-        APP_CONTEXT.statistics.reset()
+        self.statistics.reset()
 
         return {
             'packetType': 'success'
@@ -1,3 +1,4 @@
+import os
 from abc import ABCMeta, abstractmethod
 from . import EventBase
 
@@ -14,6 +15,9 @@ class UpgradeWorkerBase(EventBase):
         self._key = None
         self._group = None
         self._is_stopped = False
+        # the process exits after an error, unless the device is upgraded
+        # together with others
+        self.exit_on_error = True
 
     @property
     def name(self):
@@ -43,6 +47,11 @@ class UpgradeWorkerBase(EventBase):
     def is_stopped(self):
         return self._is_stopped
 
+    def exit_on_failure(self):
+        '''exit the process if the error of worker is fatal'''
+        if self.exit_on_error:
+            os._exit(1)
+
     @abstractmethod
     def get_upgrade_content_size(self):
         '''get the size of upgrade content'''
@@ -1,60 +1,106 @@
 import functools
+import threading
 import time
+from concurrent.futures import (Future, TimeoutError as FutureTimeoutError)
 from .message_center import (DeviceMessage)
 
 
-def with_device_message(func):
+def _is_message_batch(value):
+    return isinstance(value, list) and len(value) > 0 and \
+        all(isinstance(item, DeviceMessage) for item in value)
+
+
+def _is_device_message(value):
+    return isinstance(value, DeviceMessage) or _is_message_batch(value)
+
+
+def _build_result(kwargs):
+    return {
+        'packet_type': kwargs['packet_type'],
+        'data': kwargs['data'],
+        'error': kwargs['error'],
+        'raw': kwargs['raw']
+    }
+
+
+def send_device_message(device_message):
+    '''
+    Send a DeviceMessage, or a list of them, and return a Future. It is
+    resolved with the result of the message, or the list of results in the
+    order of the messages, when the messages are finished.
+    '''
+    future = Future()
+
+    if isinstance(device_message, DeviceMessage):
+        def on_resolve(*args, **kwargs):
+            future.set_result(_build_result(kwargs))
+
+        device_message.on('finished', on_resolve)
+        device_message.send()
+        return future
+
+    results = [None] * len(device_message)
+    remaining = [len(device_message)]
+    batch_lock = threading.Lock()
+
+    def build_item_resolve(index):
+        def on_item_resolve(*args, **kwargs):
+            with batch_lock:
+                results[index] = _build_result(kwargs)
+                remaining[0] -= 1
+                is_completed = remaining[0] == 0
+            if is_completed:
+                future.set_result(results)
+        return on_item_resolve
+
+    for index, item in enumerate(device_message):
+        item.on('finished', build_item_resolve(index))
+
+    for item in device_message:
+        item.send()
+
+    return future
+
+
+def with_device_message(func=None, deadline=None):
     '''
     This is a decorator for method with DeviceMessage, it would looks like
     code: yield message_center.build(command=command_line)
+    A list of DeviceMessage could be yielded as well, they are sent together
+    and the list of results is sent back in the same order.
+    Use @with_device_message(deadline=seconds) to limit the overall time of
+    the method, it returns 'No Response' when the deadline is passed.
     '''
+    if func is None:
+        return functools.partial(with_device_message, deadline=deadline)
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         generator_func = func(*args, **kwargs)
-        global generator_result
-        generator_result = None
-
-        def check_result():
-            global generator_result
-            while not generator_result:
-                time.sleep(0.05)
-                continue
-
-            if generator_result:
-                next_device_message = generator_func.send(generator_result)
-                if isinstance(next_device_message, DeviceMessage):
-                    generator_result = None
-                    next_device_message.on('finished', on_resolve)
-                    next_device_message.send()
-
-                    return check_result()
-                else:
-                    return next_device_message
-
-        def on_resolve(*args, **kwargs):
-            global generator_result
-
-            generator_result = {
-                'packet_type': kwargs['packet_type'],
-                'data': kwargs['data'],
-                'error': kwargs['error'],
-                'raw': kwargs['raw']
-            }
+        no_response = {
+            'packetType': 'error',
+            'data': 'No Response'
+        }
+        end_time = None
+        if deadline is not None:
+            end_time = time.monotonic() + deadline
 
         try:
             device_message = generator_func.send(None)
-            if isinstance(device_message, DeviceMessage):
-                device_message.on('finished', on_resolve)
-                device_message.send()
-                return check_result()
-            else:
-                return device_message
+            while _is_device_message(device_message):
+                future = send_device_message(device_message)
+                wait_time = None
+                if end_time is not None:
+                    wait_time = max(end_time - time.monotonic(), 0)
+                result = future.result(wait_time)
+                device_message = generator_func.send(result)
+
+            return device_message
+        except FutureTimeoutError:
+            generator_func.close()
+            return no_response
         except StopIteration as ex:
-            value = {
-                'packetType': 'error',
-                'data': 'No Response'
-            }
+            value = no_response
 
             if hasattr(ex, 'value'):
                 value = ex.value
@@ -44,12 +44,17 @@ class DeviceManager:
         device_info = ping_info['device_info']
         app_info = ping_info['app_info']
 
+        # devices sharing a communicator type, as the units of a fleet, are
+        # told apart by the key of communicator
+        device_key = getattr(communicator, 'device_key', None)
+
         provider = None
         # find provider from cached device_list
         for index in range(len(DeviceManager.device_list)):
             exist_device = DeviceManager.device_list[index]
             if exist_device['device_type'] == device_type and \
-                    exist_device['communicator_type'] == communicator.type:
+                    exist_device['communicator_type'] == communicator.type and \
+                    exist_device['device_key'] == device_key:
                 provider = exist_device['provider']
                 provider.communicator = communicator
                 break
@@ -62,6 +67,7 @@ class DeviceManager:
             DeviceManager.device_list.append({
                 'device_type': device_type,
                 'communicator_type': communicator.type,
+                'device_key': device_key,
                 'provider': provider
             })
         else:
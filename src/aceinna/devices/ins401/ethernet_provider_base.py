@@ -8,9 +8,12 @@ import math
 import re
 import struct
 from ..widgets import (NTRIPClient, EthernetDataLogger,
-                       EthernetDebugDataLogger, EthernetRTCMDataLogger)
+                       EthernetDebugDataLogger, EthernetRTCMDataLogger,
+                       EthernetRTCMPacker, create_rtcm_forwarder)
 from ...framework.utils import (helper, resource)
 from ...framework.context import APP_CONTEXT
+from ...core.gnss import NMEAParser
+from ...framework import log_writer
 from ...framework.utils.firmware_parser import parser as firmware_content_parser
 from ..base.provider_base import OpenDeviceBase
 from ..configs.ins401_predefine import (APP_STR, get_ins401_products,
@@ -29,11 +32,15 @@ from ..upgrade_workers import (
     UPGRADE_GROUP
 )
 
-GNZDA_DATA_LEN = 39
 
 SDK_UPGRADE_CHIP_FIRST = 1
 SDK_UPGRADE_CHIP_SECOND = 2
 
+# output packets lead by GPS week (uint16) and time of week (uint32, ms)
+TIMED_OUTPUT_PACKETS = [b'\x01\n', b'\x02\n', b'\x03\n', b'\x04\n', b'\x05\n']
+GPS_TIME_STRUCT = struct.Struct('<HI')
+MS_OF_WEEK = 7 * 24 * 3600 * 1000
+
 class Provider_base(OpenDeviceBase):
     '''
     INS401 Ethernet 100base-t1 provider
@@ -61,10 +68,11 @@ class Provider_base(OpenDeviceBase):
         self.enable_data_log = False
         self.is_app_matched = False
         self.ntrip_client_enable = False
-        self.nmea_buffer = []
-        self.nmea_sync = 0
+        self.nmea_parser = NMEAParser()
         self.prepare_folders()
         self.ntrip_client = None
+        self.rtcm_forwarder = None
+        self.rtcm_packer = None
         self.connected = True
         self.rtk_log_file_name = ''
         self.rtcm_rover_logf = None
@@ -239,6 +247,10 @@ class Provider_base(OpenDeviceBase):
             )
 
     def ntrip_client_thread(self): 
+        self.rtcm_packer = EthernetRTCMPacker(
+            self.communicator.get_dst_mac(), self.communicator.get_src_mac())
+        self.rtcm_forwarder = create_rtcm_forwarder(
+            self.write_rtcm_data, self.cli_options)
         self.ntrip_client = NTRIPClient(self.properties)
         self.ntrip_client.on('parsed', self.handle_rtcm_data_parsed)
         if self.device_info.__contains__('sn') and self.device_info.__contains__('pn'):
@@ -249,19 +261,21 @@ class Provider_base(OpenDeviceBase):
         self.ntrip_client.run()
 
     def handle_rtcm_data_parsed(self, data):
-        # print('rtcm',data)
-
         if not self.is_upgrading and not self.with_upgrade_error:
-            if self.rtcm_logf is not None and data is not None:
-                self.rtcm_logf.write(bytes(data))
-                self.rtcm_logf.flush()
+            self.rtcm_forwarder.put(data)
 
-            if self.communicator.can_write():
-                command = helper.build_ethernet_packet(
-                    self.communicator.get_dst_mac(),
-                    self.communicator.get_src_mac(), b'\x02\x0b', data)
+    def write_rtcm_data(self, data):
+        '''
+        Write the RTCM messages coalesced by forwarder in one 0x020b packet
+        '''
+        if self.is_upgrading or self.with_upgrade_error:
+            return
 
-                self.communicator.write(command.actual_command)
+        if self.rtcm_logf is not None:
+            self.rtcm_logf.write(data)
+
+        if self.communicator.can_write():
+            self.communicator.write(self.rtcm_packer.pack(data))
 
     def after_setup(self):
         set_user_para = self.cli_options and self.cli_options.set_user_para
@@ -279,13 +293,13 @@ class Provider_base(OpenDeviceBase):
                 self.rtk_log_file_name = file_name
 
                 self.ins401_log_file_path = file_name + '/' + 'user_' + file_time + '.bin'
-                self.user_logf = open(self.ins401_log_file_path, "wb")
-                self.rtcm_logf = open(
-                    file_name + '/' + 'rtcm_base_' + file_time + '.bin', "wb")
-                self.rtcm_rover_logf = open(
-                    file_name + '/' + 'rtcm_rover_' + file_time + '.bin', "wb")
-                self.ins_save_logf = open(
-                    file_name + '/' + 'ins_save_' + file_time + '.bin', "wb")
+                self.user_logf = self.open_log_file(self.ins401_log_file_path)
+                self.rtcm_logf = self.open_log_file(
+                    file_name + '/' + 'rtcm_base_' + file_time + '.bin')
+                self.rtcm_rover_logf = self.open_log_file(
+                    file_name + '/' + 'rtcm_rover_' + file_time + '.bin')
+                self.ins_save_logf = self.open_log_file(
+                    file_name + '/' + 'ins_save_' + file_time + '.bin')
             if set_user_para and not self.is_upgrading:
                 result = self.set_params(
                     self.properties["initial"]["userParameters"])
@@ -333,43 +347,34 @@ class Provider_base(OpenDeviceBase):
             return False
 
 
-    def nmea_checksum(self, data):
-        nmea_str = data[1:len(data) - 2]
-        nmeadata = nmea_str[0:len(nmea_str)-3]
-        cksum = nmea_str[len(nmea_str)-2:len(nmea_str)]
-
-        calc_cksum = 0
-        for s in nmeadata:
-            calc_cksum ^= ord(s)
-        return int(cksum, 16), calc_cksum
-
     def on_read_raw(self, data):
         if data[0] != 0x24 or data[1] != 0x47:
             return
-        
-        temp_str_nmea = data.decode('utf-8')
-        if (temp_str_nmea.find("\r\n", len(temp_str_nmea)-2, len(temp_str_nmea)) != -1):
-            str_nmea = temp_str_nmea 
-        else:
-            result = temp_str_nmea.find("\r\n", GNZDA_DATA_LEN-10, GNZDA_DATA_LEN)
-            if result != -1:
-                str_nmea = temp_str_nmea[0:result + 2]
-            else:
-                return
 
-        try:
-            cksum, calc_cksum = self.nmea_checksum(str_nmea)
-            if cksum == calc_cksum:
-                if str_nmea.find("$GPGGA", 0, 6) != -1 or str_nmea.find("$GNGGA", 0, 6) != -1:
-                    if self.ntrip_client:
-                        self.ntrip_client.send(str_nmea)
-                if self.user_logf:
-                    self.user_logf.write(data)
-            
-            APP_CONTEXT.get_print_logger().info(str_nmea[0:len(str_nmea) - 2])
-        except Exception as e:
-            print('NMEA fault:{0}'.format(e))
+        log_data = False
+        for sentence in self.nmea_parser.receive(data):
+            if sentence.checksum_passed:
+                if sentence.sentence_type == 'GGA' and \
+                        sentence.talker in ['GP', 'GN'] and self.ntrip_client:
+                    self.ntrip_client.send(sentence.raw)
+                log_data = True
+            APP_CONTEXT.get_print_logger().info(sentence.text)
 
+        if log_data and self.user_logf:
+            self.user_logf.write(data)
+
+
+    def open_log_file(self, path):
+        '''
+        Open a binary log file, it is written by the log writer thread and
+        rotated as set by --log-rotate-size and --log-rotate-interval
+        '''
+        rotate_size = self.cli_options and self.cli_options.log_rotate_size
+        rotate_interval = self.cli_options and self.cli_options.log_rotate_interval
+        return log_writer.open_log(
+            path,
+            rotate_size=(rotate_size or 0) * 1024 * 1024,
+            rotate_interval=(rotate_interval or 0) * 60)
 
     def thread_data_log(self, *args, **kwargs):
         self.ethernet_data_logger = EthernetDataLogger(self.properties,
@@ -515,6 +520,17 @@ class Provider_base(OpenDeviceBase):
             self.mountangle_thread = threading.Thread(target=self.mountangle_parse_thread)
             self.mountangle_thread.start()
 
+    def get_packet_sequence(self, packet_type, data):
+        '''
+        The output packets are not parsed, read GPS time from the payload
+        '''
+        if packet_type in TIMED_OUTPUT_PACKETS and \
+                isinstance(data, (bytes, bytearray, memoryview)) and \
+                len(data) >= GPS_TIME_STRUCT.size:
+            week, time_of_week = GPS_TIME_STRUCT.unpack_from(data)
+            return week * MS_OF_WEEK + time_of_week
+        return super(Provider_base, self).get_packet_sequence(packet_type, data)
+
     def on_receive_output_packet(self, packet_type, data, *args, **kwargs):
         '''
         Listener for getting output packet
@@ -559,7 +575,7 @@ class Provider_base(OpenDeviceBase):
                     if len(split_text) > 2:
                         self.bootloader_version = split_text[3]
         else:
-            os._exit(1)
+            raise Exception('No response of bootloader after jump')
            
 
     def do_reshake(self):
@@ -602,8 +618,8 @@ class Provider_base(OpenDeviceBase):
                 if result:     
                     break
             if result is None:
-                print('send cs command failed, core:{0}'.format(ord(core)))
-                os._exit(1)
+                raise Exception(
+                    'send cs command failed, core:{0}'.format(ord(core)))
         else:
             command = helper.build_ethernet_packet(
                 self.communicator.get_dst_mac(),
@@ -738,7 +754,8 @@ class Provider_base(OpenDeviceBase):
                 ethernet_ack_enable,
                 lambda: helper.format_firmware_content(content),
                 self.ins_firmware_write_command_generator,
-                packet_len)
+                packet_len,
+                window_size=self.get_upgrade_window())
             rtk_upgrade_worker.name = 'MAIN_RTK'
             rtk_upgrade_worker.on(
                 UPGRADE_EVENT.FIRST_PACKET, lambda: time.sleep(erase_time))
@@ -752,7 +769,8 @@ class Provider_base(OpenDeviceBase):
                 ethernet_ack_enable,
                 lambda: helper.format_firmware_content(content),
                 self.ins_firmware_write_command_generator,
-                packet_len)
+                packet_len,
+                window_size=self.get_upgrade_window())
             ins_upgrade_worker.name = 'MAIN_RTK'
             ins_upgrade_worker.group = UPGRADE_GROUP.FIRMWARE
             ins_upgrade_worker.on(
@@ -1176,16 +1194,26 @@ class Provider_base(OpenDeviceBase):
         '''
         has_error = False
         parameter_values = []
+        parameters = [parameter for parameter in self.properties['userConfiguration']
+                      if parameter['paramId'] != 0]
+
+        if self._message_center.get_pipeline_window() > 1 and parameters:
+            results = yield [self._build_get_param_message(parameter)
+                             for parameter in parameters]
+            for result in results:
+                if result['error'] or not result['data']:
+                    has_error = True
+                    break
 
-        for parameter in self.properties['userConfiguration']:
-            if parameter['paramId'] == 0:
-                continue
-            result = self.get_param(parameter)
-            if result['packetType'] == 'error':
-                has_error = True
-                break
+                parameter_values.append(result['data'])
+        else:
+            for parameter in parameters:
+                result = self.get_param(parameter)
+                if result['packetType'] == 'error':
+                    has_error = True
+                    break
 
-            parameter_values.append(result['data'])
+                parameter_values.append(result['data'])
 
         if not has_error:
             self.parameters = parameter_values
@@ -1193,18 +1221,23 @@ class Provider_base(OpenDeviceBase):
 
         yield {'packetType': 'error', 'data': 'No Response'}
 
-    @with_device_message
-    def get_param(self, params, *args):  # pylint: disable=unused-argument
-        '''
-        Update paramter value
-        '''
+    def _build_get_param_message(self, params):
         gP = b'\x02\xcc'
         message_bytes = []
         message_bytes.extend(encode_value('uint32', params['paramId']))
         command_line = helper.build_ethernet_packet(
             self.communicator.get_dst_mac(), self.communicator.get_src_mac(),
             gP, message_bytes)
-        result = yield self._message_center.build(command=command_line.actual_command)
+        return self._message_center.build(command=command_line.actual_command,
+                                          packet_type=gP,
+                                          match_id=params['paramId'])
+
+    @with_device_message
+    def get_param(self, params, *args):  # pylint: disable=unused-argument
+        '''
+        Update paramter value
+        '''
+        result = yield self._build_get_param_message(params)
         data = result['data']
         error = result['error']
 
@@ -1224,6 +1257,27 @@ class Provider_base(OpenDeviceBase):
         '''
         input_parameters = self.properties['userConfiguration']
 
+        if self._message_center.get_pipeline_window() > 1:
+            messages = []
+            for parameter in params:
+                exist_parameter = next((x for x in input_parameters
+                                        if x['paramId'] == parameter['paramId']),
+                                       None)
+                if exist_parameter:
+                    parameter['type'] = exist_parameter['type']
+                    messages.append(self._build_set_param_message(parameter))
+
+            if not messages:
+                yield {'packetType': 'success', 'data': {'error': 0}}
+
+            results = yield messages
+            for result in results:
+                if result['error']:
+                    yield {'packetType': 'error', 'data': {'error': {'error': result['data']}}}
+                    break
+
+            yield {'packetType': 'success', 'data': {'error': 0}}
+
         for parameter in params:
             exist_parameter = next((x for x in input_parameters
                                     if x['paramId'] == parameter['paramId']),
@@ -1247,11 +1301,7 @@ class Provider_base(OpenDeviceBase):
 
         yield {'packetType': 'success', 'data': {'error': 0}}
 
-    @with_device_message
-    def set_param(self, params, *args):  # pylint: disable=unused-argument
-        '''
-        Update paramter value
-        '''
+    def _build_set_param_message(self, params):
         uP = b'\x03\xcc'
         message_bytes = []
         message_bytes.extend(encode_value('uint32', params['paramId']))
@@ -1259,7 +1309,16 @@ class Provider_base(OpenDeviceBase):
         command_line = helper.build_ethernet_packet(
             self.communicator.get_dst_mac(), self.communicator.get_src_mac(),
             uP, message_bytes)
-        result = yield self._message_center.build(command=command_line.actual_command)
+        # the uP response has no param id, responses come back in order
+        return self._message_center.build(command=command_line.actual_command,
+                                          packet_type=uP)
+
+    @with_device_message
+    def set_param(self, params, *args):  # pylint: disable=unused-argument
+        '''
+        Update paramter value
+        '''
+        result = yield self._build_set_param_message(params)
 
         error = result['error']
         data = result['data']
@@ -123,13 +123,13 @@ class Provider(Provider_base):
                 self.rtk_log_file_name = file_name
 
                 self.ins401_log_file_path = file_name + '/' + 'user_' + file_time + '.bin'
-                self.user_logf = open(self.ins401_log_file_path, "wb")
-                self.rtcm_logf = open(
-                    file_name + '/' + 'rtcm_base_' + file_time + '.bin', "wb")
-                self.rtcm_rover_logf = open(
-                    file_name + '/' + 'rtcm_rover_' + file_time + '.bin', "wb")
-                self.ins_save_logf = open(
-                    file_name + '/' + 'ins_save_' + file_time + '.bin', "wb")
+                self.user_logf = self.open_log_file(self.ins401_log_file_path)
+                self.rtcm_logf = self.open_log_file(
+                    file_name + '/' + 'rtcm_base_' + file_time + '.bin')
+                self.rtcm_rover_logf = self.open_log_file(
+                    file_name + '/' + 'rtcm_rover_' + file_time + '.bin')
+                self.ins_save_logf = self.open_log_file(
+                    file_name + '/' + 'ins_save_' + file_time + '.bin')
             if set_user_para and not self.is_upgrading:
                 result = self.set_params(
                     self.properties["initial"]["userParameters"])
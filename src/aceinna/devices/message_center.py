@@ -24,14 +24,28 @@ class EVENT_TYPE:
     CRC_FAILURE = 'crc_failure'
 
 
+# put into data_queue to wake up the parser thread when stopping
+QUEUE_STOP_SIGNAL = object()
+
+# max number of packets taken from a packet based communicator per read
+READ_BATCH_SIZE = 1000
+# seconds a batch read waits for data, the stop is checked between reads
+READ_BATCH_TIMEOUT = 0.05
+# seconds to sleep when a communicator without batch read has no data
+READ_IDLE_INTERVAL = 0.01
+
+
 class DeviceMessage(EventBase):
-    def __init__(self, message_center, command, timeout=1):
+    def __init__(self, message_center, command, timeout=1, packet_type=None, match_id=None):
         super(DeviceMessage, self).__init__()
         self.message_id = None
         self.result = None
         self._message_center = message_center
         self._command = command
-        # self._packet_type = packet_type
+        # packet type and id of the expected response, used to match the
+        # response when several messages are in flight
+        self._packet_type = packet_type
+        self._match_id = match_id
         self._status = ''
         self._start_time = None
         self._timeout = timeout
@@ -60,6 +74,23 @@ class DeviceMessage(EventBase):
     def get_timeout(self):
         return self._timeout
 
+    def get_packet_type(self):
+        return self._packet_type
+
+    def get_match_id(self):
+        return self._match_id
+
+    def is_match(self, packet_type, response_id):
+        '''
+        Check if a response belongs to the message. The id is compared only
+        when both the message and the response carry one.
+        '''
+        if self._packet_type is None or self._packet_type != packet_type:
+            return False
+        if self._match_id is None or response_id is None:
+            return True
+        return self._match_id == response_id
+
     def get_finished(self):
         return self._is_finished
 
@@ -77,11 +108,19 @@ class DeviceMessageCenter(EventBase):
         self._is_pause = False
         self._has_exception = False
         self.data_queue = Queue()  # data container
-        self.data_lock = threading.Lock()
         self.exception_lock = threading.Lock()
+        self._exception_event = threading.Event()
+        self._resume_event = threading.Event()
+        self._resume_event.set()
+        self._stop_event = threading.Event()
+        self._run_lock = threading.RLock()
+        self._timeout_timers = {}
+        self._pipeline_window = 1
+        self._inflight_messages = []
         self._is_running = False
         self.prerun_queue = Queue()
         self._parser = None
+        self._read_time = None
         self._running_message = None
         self._is_ready = False
         self._has_running_checker = False
@@ -104,35 +143,92 @@ class DeviceMessageCenter(EventBase):
     def get_parser(self):
         return self._parser
 
-    def build(self, command, timeout=3):
-        return DeviceMessage(self, command, timeout)
+    def build(self, command, timeout=3, packet_type=None, match_id=None):
+        return DeviceMessage(self, command, timeout, packet_type, match_id)
+
+    def set_pipeline_window(self, window):
+        '''
+        Set how many messages could wait for response at the same time.
+        Only messages built with a packet_type are pipelined, the others
+        still run one by one.
+        '''
+        with self._run_lock:
+            self._pipeline_window = max(int(window or 1), 1)
+
+    def get_pipeline_window(self):
+        return self._pipeline_window
+
+    def _can_run(self, message):
+        if not self._inflight_messages:
+            return True
+
+        if len(self._inflight_messages) >= self._pipeline_window:
+            return False
+
+        if message.get_packet_type() is None:
+            return False
+
+        return all(item.get_packet_type() is not None
+                   for item in self._inflight_messages)
 
     def request_run(self, message):
-        if self._is_running:
-            self.prerun_queue.put(message)
-        else:
-            self.run(message)
+        with self._run_lock:
+            if self.prerun_queue.empty() and self._can_run(message):
+                self.run(message)
+            else:
+                self.prerun_queue.put(message)
 
     def run(self, message):
-        if not self._is_running:
-            self._run_id = str(uuid.uuid1())
+        with self._run_lock:
+            if not self._is_running:
+                self._run_id = str(uuid.uuid1())
 
-        self._is_running = True
-        self._running_message = message
-        message.set_start_time(datetime.datetime.now())
+            self._is_running = True
+            self._inflight_messages.append(message)
+            self._running_message = self._inflight_messages[0]
+            message.set_start_time(datetime.datetime.now())
+            self._start_timeout_timer(message)
 
-        self._parser.set_run_command(message.get_command())
-        self._communicator.write(message.get_command())
+            self._parser.set_run_command(message.get_command())
+            self._communicator.write(message.get_command())
 
     def run_post(self):
-        if self.prerun_queue.empty():
-            self._is_running = False
-            self._run_id = None
-        else:
-            next_message = self.prerun_queue.get()
-            self.run(next_message)
+        with self._run_lock:
+            while not self.prerun_queue.empty():
+                next_message = self.prerun_queue.queue[0]
+                if not self._can_run(next_message):
+                    break
+                self.prerun_queue.get()
+                self.run(next_message)
+
+            if not self._inflight_messages:
+                self._is_running = False
+                self._running_message = None
+                self._run_id = None
         # print('post')
 
+    def _complete(self, message, **kwargs):
+        self._cancel_timeout_timer(message)
+        if message in self._inflight_messages:
+            self._inflight_messages.remove(message)
+        if self._inflight_messages:
+            self._running_message = self._inflight_messages[0]
+        message.finish(**kwargs)
+
+    def _match_inflight_message(self, packet_type, data):
+        if not self._inflight_messages:
+            return None
+
+        if self._pipeline_window == 1:
+            return self._inflight_messages[0]
+
+        response_id = data.get('paramId') if isinstance(data, dict) else None
+        for message in self._inflight_messages:
+            if message.get_packet_type() is None or \
+                    message.is_match(packet_type, response_id):
+                return message
+        return None
+
     def setup(self):
         if not self._has_running_checker:
             thread = threading.Thread(target=self.thread_running_checker)
@@ -152,70 +248,100 @@ class DeviceMessageCenter(EventBase):
 
     def pause(self):
         self._is_pause = True
+        self._resume_event.clear()
 
     def resume(self):
+        self.exception_lock.acquire()
         self._has_exception = False
+        self._exception_event.clear()
+        self.exception_lock.release()
         self._is_pause = False
+        self._resume_event.set()
         helper.clear_elements(self.threads)
 
     def stop(self):
         self._is_stop = True
+        self._stop_event.set()
+        # wake up the threads waiting for data, resume or exception
+        self._resume_event.set()
+        self._exception_event.set()
+        self.data_queue.put(QUEUE_STOP_SIGNAL)
+        with self._run_lock:
+            for message in list(self._timeout_timers):
+                self._cancel_timeout_timer(message)
         # if self.loop:
         #     self.loop.close()
 
-    def timeout_check(self):
-        if self._is_running:
-            timeout = self._running_message.get_timeout()
-            start_time = self._running_message.get_start_time()
-            current_time = datetime.datetime.now()
-
-            span = current_time - start_time
-            if span.total_seconds() > timeout and not \
-                    self._running_message.get_finished():
-                timeout_command = self._running_message.get_command()
-                # print('command timeout',
-                #       timeout_command,
-                #       timeout, start_time, current_time)
-                APP_CONTEXT.get_logger().error('command timeout')
-                packet_info = self._parser.get_packet_info(
-                    timeout_command)
-                self._last_timeout_command = packet_info
-                self._last_timeout_command['run_id'] = self._run_id
-                self._running_message.finish(
-                    error='Timeout', **packet_info)
-                # print('timeout')
-                self.run_post()
+    def _start_timeout_timer(self, message):
+        timer = threading.Timer(
+            message.get_timeout(), self.timeout_check, args=(message,))
+        timer.daemon = True
+        self._timeout_timers[message] = timer
+        timer.start()
 
-    def thread_running_checker(self):
+    def _cancel_timeout_timer(self, message):
+        timer = self._timeout_timers.pop(message, None)
+        if timer:
+            timer.cancel()
+
+    def timeout_check(self, message):
         '''
-        Check running status
+        Fired by the timer of an in-flight message when it is out of time
         '''
-        # if sys.version_info[0] > 2:
-        #     import asyncio
-        #     self.loop = asyncio.new_event_loop()
-        #     asyncio.set_event_loop(self.loop)
+        with self._run_lock:
+            if message not in self._inflight_messages:
+                return
+
+            if message.get_finished():
+                return
+
+            timeout_command = message.get_command()
+            APP_CONTEXT.get_logger().error('command timeout')
+            packet_info = self._parser.get_packet_info(
+                timeout_command)
+            self._last_timeout_command = packet_info
+            self._last_timeout_command['run_id'] = self._run_id
+            self._complete(message, error='Timeout', **packet_info)
+            self.run_post()
+
+    def _set_exception(self):
+        self.exception_lock.acquire()
+        self._has_exception = True  # Notice thread paser to exit.
+        self._exception_event.set()
+        self.exception_lock.release()
 
+    def thread_running_checker(self):
+        '''
+        Report communicator error, until the message center is resumed
+        '''
         while True:
-            self.exception_lock.acquire()
-            if self._has_exception:
-                self.emit(EVENT_TYPE.ERROR, 'app', 'communicator read error')
-            self.exception_lock.release()
+            self._exception_event.wait()
 
             # Exit running checker
             if self._is_stop:
                 return
 
-            self.timeout_check()
+            self.exception_lock.acquire()
+            has_exception = self._has_exception
+            self.exception_lock.release()
+            if has_exception:
+                self.emit(EVENT_TYPE.ERROR, 'app', 'communicator read error')
 
             try:
-                time.sleep(0.1)
+                # report again if the error is not recovered by the handler
+                if self._stop_event.wait(0.1):
+                    return
             except KeyboardInterrupt:  # response for KeyboardInterrupt such as Ctrl+C
                 return True
 
     def thread_receiver(self, *args, **kwargs):
         ''' receive data and push data into data_queue.
             return when occur Exception or set as stop
+            a packet based communicator is read by batch, the list of
+            packets is pushed as one item.
+            data is pushed with its read time, for the parse latency.
         '''
+        read_batch = getattr(self._communicator, 'read_batch', None)
         while True:
             if self._has_exception:
                 APP_CONTEXT.get_logger().error('Thread receiver exit with exception')
@@ -223,72 +349,79 @@ class DeviceMessageCenter(EventBase):
 
             if self._is_stop:
                 APP_CONTEXT.get_logger().error('Thread receiver stopped')
+                self.data_queue.put(QUEUE_STOP_SIGNAL)
                 return
             if self._is_pause:
-                time.sleep(0.01)
+                self._resume_event.wait()
                 continue
 
             data = None
             try:
-                data = self._communicator.read(1000)
+                if read_batch:
+                    data = read_batch(READ_BATCH_SIZE, READ_BATCH_TIMEOUT)
+                else:
+                    data = self._communicator.read(1000)
                 # print('thread_receiver:', data)
             except Exception as ex:  # pylint: disable=broad-except
                 print('Thread:receiver error:', ex)
-                self.exception_lock.acquire()
-                self._has_exception = True  # Notice thread paser to exit.
-                self.exception_lock.release()
+                self._set_exception()
+                self.data_queue.put(QUEUE_STOP_SIGNAL)
                 return  # exit thread receiver
 
             if data and len(data) > 0:
-                self.emit(EVENT_TYPE.READ_BLOCK, data)
-                self.data_lock.acquire()
-                self.data_queue.put(data)
-                self.data_lock.release()
-            else:
-                time.sleep(0.01)
+                if read_batch:
+                    for block in data:
+                        self.emit(EVENT_TYPE.READ_BLOCK, block)
+                else:
+                    self.emit(EVENT_TYPE.READ_BLOCK, data)
+                self.data_queue.put((time.time(), data))
+            elif not read_batch:
+                # communicator has nothing buffered and cannot wait for
+                # data, avoid a busy loop
+                time.sleep(READ_IDLE_INTERVAL)
 
     def thread_parser(self, *args, **kwargs):
         ''' get data from data_queue and parse data into one whole frame.
             return when occur Exception or set as stop.
         '''
-        # if sys.version_info[0] > 2:
-        #     import asyncio
-        #     loop = asyncio.new_event_loop()
-        #     asyncio.set_event_loop(loop)
         while True:
-            if self._has_exception or self._is_stop:
-                return
+            item = self.data_queue.get()
 
-            self.exception_lock.acquire()
-            if self._has_exception:
-                self.exception_lock.release()
+            if self._has_exception or self._is_stop:
                 return  # exit thread parser
-            self.exception_lock.release()
 
-            if self._is_pause:
-                time.sleep(0.01)
+            if item is QUEUE_STOP_SIGNAL:
+                # left by a receiver stopped before resume
                 continue
 
-            self.data_lock.acquire()
-            if self.data_queue.empty():
-                self.data_lock.release()
-                time.sleep(0.001)
+            self._read_time, data = item
+
+            if self._is_pause:
+                self._resume_event.wait()
+                if self._is_stop:
+                    return
+
+            if not self._parser:
                 continue
-            else:
-                data = self.data_queue.get()
-                self.data_lock.release()
 
-            if self._parser:
+            if isinstance(data, list):
+                for block in data:
+                    self._parser.analyse(block)
+            else:
                 self._parser.analyse(data)
 
     def on_command_receive(self, *args, **kwargs):
         # TODO: should do timeout command check
-        if self._running_message:
-            self._running_message.finish(**kwargs)
-        self.run_post()
+        with self._run_lock:
+            message = self._match_inflight_message(
+                kwargs.get('packet_type'), kwargs.get('data'))
+            if message:
+                self._complete(message, **kwargs)
+            self.run_post()
 
     def on_continuous_messageReceive(self, *args, **kwargs):
         # save data
+        kwargs.setdefault('read_time', self._read_time)
         self.emit(EVENT_TYPE.CONTINUOUS_MESSAGE, **kwargs)
 
     def on_crc_failure(self, *args, **kwargs):
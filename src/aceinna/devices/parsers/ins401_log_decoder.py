@@ -0,0 +1,148 @@
+"""
+Decoder of the user_*.bin logs of INS401/INS402/INS502, in Python and NumPy
+"""
+import os
+import json
+import struct
+import binascii
+import numpy as np
+from ...framework.utils import crc
+from ...framework.utils import resource
+from ...framework.columnar_storage import build_record_dtype
+
+LOG_PARSER_SETTING = os.path.join('INS401', 'log-parser.json')
+MSG_HEADER = b'UU'
+PACKET_TYPE_INDEX = 2
+PAYLOAD_LEN_INDEX = 4
+PAYLOAD_INDEX = 8
+CRC_LENGTH = 2
+# the frames are sent in ethernet packets
+MAX_PAYLOAD_LEN = 1500
+MAX_FRAME_LEN = PAYLOAD_INDEX + MAX_PAYLOAD_LEN + CRC_LENGTH
+
+
+def load_output_packets():
+    '''
+    Load userOutputPackets of the INS401 log parser setting
+    '''
+    content = resource.get_content_from_bundle('setting', LOG_PARSER_SETTING)
+    if content is None:
+        raise ValueError('Log parser setting content is empty')
+    return json.loads(content)['userOutputPackets']
+
+
+def _get_packet_type(name):
+    # name in setting is like "01,0a"
+    return bytes(int(item, 16) for item in name.split(','))
+
+
+def _get_file_name(output_packet):
+    return output_packet['display'].lower().replace(' ', '_') + '.csv'
+
+
+def _get_label(field):
+    if field['unit']:
+        return '{0} ({1})'.format(field['name'], field['unit'])
+    return field['name']
+
+
+class UserPacketLayout(object):
+    '''
+    The record dtype and CSV row template of an output packet
+    '''
+
+    def __init__(self, output_packet):
+        self.name = output_packet['name']
+        self.packet_type = _get_packet_type(self.name)
+        self.file_name = _get_file_name(output_packet)
+        self.dtype = build_record_dtype(output_packet)
+        self.size = self.dtype.itemsize
+        self.header = ','.join(
+            _get_label(field) for field in output_packet['payload']) + '\n'
+        self.row_template = ','.join(
+            '{' + (':' + field['format'] if field.get('format') else '') + '}'
+            for field in output_packet['payload']) + '\n'
+
+    def format_rows(self, records):
+        template = self.row_template
+        return ''.join([template.format(*row) for row in records.tolist()])
+
+
+def iter_frames(buffer, start=0, end=None):
+    '''
+    Yield (packet_type, payload_index, payload_len) of the frames in buffer
+    which pass the crc check and start in [start, end). A frame may end
+    after end. When a header is not followed by a valid frame, it looks for
+    the next header from the byte after it.
+    '''
+    size = len(buffer)
+    if end is None or end > size:
+        end = size
+    view = memoryview(buffer)
+    find = buffer.find
+    unpack_from = struct.Struct('<I').unpack_from
+    crc_hqx = binascii.crc_hqx
+    # header found by find(.., limit) starts before end
+    limit = min(end + len(MSG_HEADER) - 1, size)
+
+    index = find(MSG_HEADER, start, limit)
+    while index != -1:
+        crc_index = -1
+        if index + PAYLOAD_INDEX <= size:
+            payload_len = unpack_from(buffer, index + PAYLOAD_LEN_INDEX)[0]
+            if payload_len <= MAX_PAYLOAD_LEN:
+                crc_index = index + PAYLOAD_INDEX + payload_len
+
+        if crc_index != -1 and crc_index + CRC_LENGTH <= size and \
+                crc_hqx(view[index + PACKET_TYPE_INDEX:crc_index], crc.CRC16_INIT) == \
+                (buffer[crc_index] << 8 | buffer[crc_index + 1]):
+            yield (bytes(view[index + PACKET_TYPE_INDEX:index + PAYLOAD_LEN_INDEX]),
+                   index + PAYLOAD_INDEX, payload_len)
+            index = find(MSG_HEADER, crc_index + CRC_LENGTH, limit)
+        else:
+            index = find(MSG_HEADER, index + 1, limit)
+
+
+class UserLogDecoder(object):
+    '''
+    Decode the frames of a user log to a NumPy structured array per packet
+    type. Frames are located in Python, the payloads of the same type are
+    gathered and viewed as records with NumPy.
+    '''
+
+    def __init__(self, output_packets=None):
+        if output_packets is None:
+            output_packets = load_output_packets()
+        self.layouts = {}
+        for output_packet in output_packets:
+            layout = UserPacketLayout(output_packet)
+            self.layouts[layout.packet_type] = layout
+
+    def decode(self, buffer, start=0, end=None):
+        '''
+        Decode the frames start in [start, end) of buffer, return a dict of
+        packet type to records
+        '''
+        offsets = dict((packet_type, []) for packet_type in self.layouts)
+        for packet_type, payload_index, payload_len in iter_frames(buffer, start, end):
+            packet_offsets = offsets.get(packet_type)
+            if packet_offsets is not None and \
+                    payload_len == self.layouts[packet_type].size:
+                packet_offsets.append(payload_index)
+
+        data = np.frombuffer(buffer, dtype=np.uint8)
+        result = {}
+        for packet_type, layout in self.layouts.items():
+            indexes = np.asarray(offsets[packet_type], dtype=np.intp)
+            payloads = data[indexes[:, None] + np.arange(layout.size)]
+            result[packet_type] = payloads.view(layout.dtype).reshape(-1)
+        return result
+
+    def decode_to_csv(self, buffer, start=0, end=None):
+        '''
+        Decode like decode, return a dict of packet type to (count, rows)
+        '''
+        return dict(
+            (packet_type, (len(records),
+                           self.layouts[packet_type].format_rows(records)))
+            for packet_type, records in self.decode(buffer, start, end).items())
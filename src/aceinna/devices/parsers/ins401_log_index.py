@@ -0,0 +1,216 @@
+"""
+Frame index of the user_*.bin logs of INS401/INS402/INS502
+"""
+import os
+import mmap
+import struct
+import numpy as np
+from .ins401_log_decoder import (iter_frames, load_output_packets,
+                                 PAYLOAD_INDEX, CRC_LENGTH, PAYLOAD_LEN_INDEX)
+
+INDEX_FILE_SUFFIX = '.idx.npz'
+INDEX_VERSION = 1
+# names of the INS401 setting output packets with the same layout as the
+# frames of the log, other packets are given by type, as '05,0a'
+PACKET_TYPE_ALIASES = {
+    's1': b'\x01\n',
+    'gN': b'\x02\n',
+    'iN': b'\x03\n'
+}
+# GPS week (uint16) and time of week (uint32, ms) lead the payload
+TIME_STRUCT = struct.Struct('<HI')
+MS_OF_WEEK = 7 * 24 * 3600 * 1000
+NO_TIME = -1
+
+
+def get_index_path(path):
+    return path + INDEX_FILE_SUFFIX
+
+
+def to_time_key(week, time_of_week):
+    '''
+    Combine GPS week and time of week (ms) to a comparable int
+    '''
+    return week * MS_OF_WEEK + int(time_of_week)
+
+
+def _get_packet_type(packet_type):
+    '''
+    Accept b'\\x03\\n', 0x030a, '03,0a' or 'iN'
+    '''
+    if isinstance(packet_type, int):
+        return packet_type
+    if isinstance(packet_type, str):
+        if packet_type in PACKET_TYPE_ALIASES:
+            packet_type = PACKET_TYPE_ALIASES[packet_type]
+        else:
+            try:
+                packet_type = bytes(int(item, 16) for item in packet_type.split(','))
+            except ValueError:
+                raise ValueError('Unknown packet type {0}'.format(packet_type))
+    return struct.unpack('>H', bytes(packet_type))[0]
+
+
+def _get_timed_packet_types():
+    return set(_get_packet_type(output_packet['name'])
+               for output_packet in load_output_packets())
+
+
+def build_index(buffer, timed_packet_types=None):
+    '''
+    Locate the frames which pass the crc check in buffer, return the
+    arrays of the index: frame offsets, packet types and time keys.
+    '''
+    if timed_packet_types is None:
+        timed_packet_types = _get_timed_packet_types()
+    unpack_time = TIME_STRUCT.unpack_from
+
+    offsets = []
+    packet_types = []
+    time_keys = []
+    for packet_type, payload_index, payload_len in iter_frames(buffer):
+        packet_type = packet_type[0] << 8 | packet_type[1]
+        offsets.append(payload_index - PAYLOAD_INDEX)
+        packet_types.append(packet_type)
+        if packet_type in timed_packet_types and payload_len >= TIME_STRUCT.size:
+            week, time_of_week = unpack_time(buffer, payload_index)
+            time_keys.append(week * MS_OF_WEEK + time_of_week)
+        else:
+            time_keys.append(NO_TIME)
+
+    return (np.array(offsets, dtype=np.uint64),
+            np.array(packet_types, dtype=np.uint16),
+            np.array(time_keys, dtype=np.int64))
+
+
+class FrameIndex(object):
+    '''
+    Random access to the frames of a recorded log. The log is memory mapped,
+    the index is saved next to it as <log>.idx.npz and rebuilt when the size
+    or modify time of log is changed.
+    Frames are returned as memoryview of the mapped log without copying,
+    release them before close().
+    '''
+
+    def __init__(self, path, rebuild=False):
+        self.path = path
+        self.index_path = get_index_path(path)
+        self._file = open(path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self._file_info = np.array([INDEX_VERSION, stat.st_size, stat.st_mtime_ns],
+                                   dtype=np.int64)
+        self._mmap = None
+        self._view = memoryview(b'')
+        if stat.st_size > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        self._type_offsets = {}
+
+        if rebuild or not self._load():
+            self.offsets, self.packet_types, self.time_keys = build_index(
+                self._mmap if self._mmap is not None else b'')
+            self._save()
+        self._build_time_table()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def count(self, packet_type=None):
+        '''
+        Count of the frames, or the frames of a packet type
+        '''
+        if packet_type is None:
+            return len(self.offsets)
+        return len(self.get_offsets(packet_type))
+
+    def get_offsets(self, packet_type):
+        '''
+        Offsets of the frames of a packet type in the log
+        '''
+        packet_type = _get_packet_type(packet_type)
+        offsets = self._type_offsets.get(packet_type)
+        if offsets is None:
+            offsets = self.offsets[self.packet_types == packet_type]
+            self._type_offsets[packet_type] = offsets
+        return offsets
+
+    def get_frame(self, offset):
+        '''
+        The frame starts at offset, as memoryview
+        '''
+        offset = int(offset)
+        payload_len = struct.unpack_from(
+            '<I', self._view, offset + PAYLOAD_LEN_INDEX)[0]
+        return self._view[offset:offset + PAYLOAD_INDEX + payload_len + CRC_LENGTH]
+
+    def iter_frames(self, start=0):
+        '''
+        Yield all the frames, from the offset of start
+        '''
+        first = np.searchsorted(self.offsets, start)
+        for offset in self.offsets[first:].tolist():
+            yield self.get_frame(offset)
+
+    def iter_type(self, packet_type, start=0):
+        '''
+        Yield the frames of a packet type, from the offset of start
+        '''
+        offsets = self.get_offsets(packet_type)
+        first = np.searchsorted(offsets, start)
+        for offset in offsets[first:].tolist():
+            yield self.get_frame(offset)
+
+    def seek_time(self, week, time_of_week):
+        '''
+        Offset of the first frame at or after GPS week and time of week (ms),
+        None if the log ends before it
+        '''
+        position = np.searchsorted(
+            self._time_table, to_time_key(week, time_of_week))
+        if position >= len(self._time_offsets):
+            return None
+        return int(self._time_offsets[position])
+
+    def _build_time_table(self):
+        # logs are recorded in time order, the running max keeps the table
+        # sorted when a time jumps back
+        timed = self.time_keys != NO_TIME
+        self._time_offsets = self.offsets[timed]
+        self._time_table = np.maximum.accumulate(self.time_keys[timed]) \
+            if len(self._time_offsets) else self.time_keys[timed]
+
+    def _load(self):
+        if not os.path.isfile(self.index_path):
+            return False
+        try:
+            with np.load(self.index_path) as index_file:
+                if not np.array_equal(index_file['file_info'], self._file_info):
+                    return False
+                self.offsets = index_file['offsets']
+                self.packet_types = index_file['packet_types']
+                self.time_keys = index_file['time_keys']
+        except (IOError, OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def _save(self):
+        try:
+            with open(self.index_path, 'wb') as index_file:
+                np.savez(index_file,
+                         file_info=self._file_info,
+                         offsets=self.offsets,
+                         packet_types=self.packet_types,
+                         time_keys=self.time_keys)
+        except (IOError, OSError):
+            # the log folder may be read only, the index is kept in memory
+            pass
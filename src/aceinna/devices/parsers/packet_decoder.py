@@ -0,0 +1,141 @@
+import struct
+import collections
+from ...framework.utils.print import print_yellow
+from ...framework.context import APP_CONTEXT
+
+PAYLOAD_TYPE_FORMATS = {
+    'float': 'f',
+    'uint32': 'I',
+    'int32': 'i',
+    'int16': 'h',
+    'uint16': 'H',
+    'double': 'd',
+    'int64': 'q',
+    'uint64': 'Q',
+    'char': 'c',
+    'uchar': 'B',
+    'uint8': 'B'
+}
+
+error_decode_packet = 0
+
+
+def _warn_decode_error(ex):
+    global error_decode_packet
+    error_decode_packet = error_decode_packet + 1
+    if error_decode_packet == 100 or error_decode_packet == 400 or error_decode_packet == 700:
+        print_yellow(
+            "warning: your firmware may not suitable for this driver, pls update firmware or driver")
+
+    if error_decode_packet % 300 == 0:
+        APP_CONTEXT.get_logger().logger.warning(
+            "error happened when decode the payload of packets, pls restart driver: {0}"
+            .format(ex))
+
+
+class OutputPacketDecoder(object):
+    '''
+    Decoder of one output packet type, compiled once from the payload
+    definition in userMessages.outputPackets.
+    '''
+
+    def __init__(self, configuration):
+        self.name = configuration['name']
+        self.is_list = configuration.get('isList', 0) == 1
+
+        pack_fmt = '<'
+        fields = []
+        float_indexes = []
+        for value in configuration['payload']:
+            fmt = PAYLOAD_TYPE_FORMATS.get(value['type'])
+            if fmt is None:
+                continue
+            if fmt in 'fd':
+                float_indexes.append(len(fields))
+            pack_fmt += fmt
+            fields.append(value['name'])
+
+        self.fields = tuple(fields)
+        self.struct = struct.Struct(pack_fmt)
+        self.size = self.struct.size
+        self._float_indexes = tuple(float_indexes)
+
+    def _filter_nan(self, values):
+        for index in self._float_indexes:
+            value = values[index]
+            if value != value:
+                values = values[:index] + (0,) + values[index + 1:]
+        return values
+
+    def decode(self, payload):
+        '''
+        Decode payload to an OrderedDict, or a list of them for isList packets
+        '''
+        if not isinstance(payload, (bytes, bytearray, memoryview)):
+            payload = bytes(payload)
+        return self.decode_from(payload, 0, len(payload))
+
+    def decode_from(self, buffer, offset, length):
+        '''
+        Decode payload in place, starting from offset of the frame buffer
+        '''
+        if self.is_list:
+            return self._decode_list(buffer, offset, length)
+
+        if length != self.size:
+            _warn_decode_error(struct.error(
+                'unpack requires a buffer of {0} bytes'.format(self.size)))
+            return None
+
+        try:
+            values = self.struct.unpack_from(buffer, offset)
+        except struct.error as ex:
+            _warn_decode_error(ex)
+            return None
+
+        if self._float_indexes:
+            values = self._filter_nan(values)
+        return collections.OrderedDict(zip(self.fields, values))
+
+    def _decode_list(self, buffer, offset, length):
+        if self.size == 0:
+            return []
+
+        packet_num = length // self.size
+        view = memoryview(buffer)[offset:offset + packet_num * self.size]
+        fields = self.fields
+        try:
+            return [collections.OrderedDict(zip(fields, item))
+                    for item in self.struct.iter_unpack(view)]
+        except struct.error as ex:
+            print(
+                "error happened when decode the payload, pls restart driver: {0}"
+                .format(ex))
+            return []
+
+
+def build_output_decoders(output_packets):
+    '''
+    Compile decoders for all output packets, keyed by packet name
+    '''
+    decoders = {}
+    for configuration in output_packets:
+        decoders[configuration['name']] = OutputPacketDecoder(configuration)
+    return decoders
+
+
+_decoder_cache = {}
+
+
+def get_output_decoder(configuration):
+    '''
+    Get the compiled decoder of an output packet configuration. The
+    configuration object is kept with the decoder, so a reloaded json
+    compiles again instead of matching a reused id.
+    '''
+    key = id(configuration)
+    cached = _decoder_cache.get(key)
+    if cached is None or cached[0] is not configuration:
+        cached = (configuration, OutputPacketDecoder(configuration))
+        _decoder_cache[key] = cached
+    return cached[1]
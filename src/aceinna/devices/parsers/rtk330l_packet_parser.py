@@ -1,13 +1,9 @@
 import sys
 import struct
-import collections
-from . import filter_nan
 from .rtk330l_field_parser import decode_value
-from ...framework.utils.print import print_yellow
-from ...framework.context import APP_CONTEXT
+from .packet_decoder import get_output_decoder
 
 # input packet
-error_decode_packet = 0
 
 
 def string_parser(payload, user_configuration):
@@ -210,89 +206,7 @@ def common_continuous_parser(payload, configuration):
     if configuration is None:
         return
 
-    data = None
-    is_list = 0
-    length = 0
-    pack_fmt = '<'
-    for value in configuration['payload']:
-        if value['type'] == 'float':
-            pack_fmt += 'f'
-            length += 4
-        elif value['type'] == 'uint32':
-            pack_fmt += 'I'
-            length += 4
-        elif value['type'] == 'int32':
-            pack_fmt += 'i'
-            length += 4
-        elif value['type'] == 'int16':
-            pack_fmt += 'h'
-            length += 2
-        elif value['type'] == 'uint16':
-            pack_fmt += 'H'
-            length += 2
-        elif value['type'] == 'double':
-            pack_fmt += 'd'
-            length += 8
-        elif value['type'] == 'int64':
-            pack_fmt += 'q'
-            length += 8
-        elif value['type'] == 'uint64':
-            pack_fmt += 'Q'
-            length += 8
-        elif value['type'] == 'char':
-            pack_fmt += 'c'
-            length += 1
-        elif value['type'] == 'uchar':
-            pack_fmt += 'B'
-            length += 1
-        elif value['type'] == 'uint8':
-            pack_fmt += 'B'
-            length += 1
-    len_fmt = '{0}B'.format(length)
-
-    has_list = configuration.__contains__('isList')
-    if has_list:
-        is_list = configuration['isList']
-
-    if is_list == 1:
-        packet_num = len(payload) // length
-        data = []
-        for i in range(packet_num):
-            payload_c = payload[i*length:(i+1)*length]
-            try:
-                pack_item = struct.pack(len_fmt, *payload_c)
-                item = struct.unpack(pack_fmt, pack_item)
-                out = [(value['name'], item[idx])
-                       for idx, value in enumerate(configuration['payload'])]
-                item = collections.OrderedDict(out)
-                data.append(item)
-            except Exception as ex:  # pylint: disable=broad-except
-                print(
-                    "error happened when decode the payload, pls restart driver: {0}"
-                    .format(ex))
-    else:
-        try:
-            pack_item = struct.pack(len_fmt, *payload)
-            data = struct.unpack(pack_fmt, pack_item)
-            out = [(
-                value['name'],
-                filter_nan(data[idx])
-            ) for idx, value in enumerate(configuration['payload'])]
-
-            data = collections.OrderedDict(out)
-        except Exception as ex:  # pylint: disable=broad-except
-            global error_decode_packet
-            error_decode_packet = error_decode_packet + 1
-            if error_decode_packet == 100 or error_decode_packet == 400 or error_decode_packet == 700:
-                print_yellow(
-                    "warning: your firmware may not suitable for this driver, pls update firmware or driver")
-
-            if error_decode_packet % 300 == 0:
-                APP_CONTEXT.get_logger().logger.warning(
-                    "error happened when decode the payload of packets, pls restart driver: {0}"
-                    .format(ex))
-
-    return data
+    return get_output_decoder(configuration).decode(payload)
 
 
 def other_output_parser(payload):
@@ -1,14 +1,10 @@
-import collections
-import operator
 import time
-from ..base.message_parser_base import MessageParserBase
+from ..base.message_parser_base import MessageParserBase, PACKET_CATEGORY
 from ...framework.utils import helper
 from ...framework.context import APP_CONTEXT
+from .uart_framer import (UartFramer, PAYLOAD_LEN_INDEX)
 from .rtk350l_packet_parser import (
-    match_command_handler, common_continuous_parser, other_output_parser)
-
-MSG_HEADER = [0x55, 0x55]
-PACKET_TYPE_INDEX = 2
+    match_command_handler, other_output_parser)
 
 INPUT_PACKETS = ['pG', 'uC', 'uP', 'uA', 'uB',
                  'sC', 'rD',
@@ -28,72 +24,57 @@ class ANALYSIS_STATUS:
     CRC_PASSED = 4
 
 class UartMessageParser(MessageParserBase):
+    input_packets = INPUT_PACKETS
+    other_output_packets = OTHER_OUTPUT_PACKETS
+    match_command_handler = staticmethod(match_command_handler)
+    other_output_parser = staticmethod(other_output_parser)
+
     def __init__(self, configuration):
         super(UartMessageParser, self).__init__(configuration)
-        self.frame = []
-        self.payload_len_idx = 5
-        self.sync_pattern = collections.deque(2*[0], 2)
-        self.find_header = False
-        self.payload_len = 0
+        self._framer = UartFramer()
         # command,continuous_message
 
     def set_run_command(self, command):
         pass
 
     def analyse(self, data):
-        for data_block in data:
-            if self.find_header:
-                self.frame.append(data_block)
-                if self.payload_len_idx == len(self.frame):
-                    self.payload_len = data_block
-
-                elif 5 + self.payload_len + 2 == len(self.frame):
-                    packet_type = ''.join(
-                        ["%c" % x for x in self.frame[PACKET_TYPE_INDEX:4]])
-                    self.find_header = False
-                    result = helper.calc_crc(self.frame[2:-2])
-                    if result[0] == self.frame[-2] and result[1] == self.frame[-1]:
-                        # find a whole frame
-                        # self._parse_frame(self.frame, self.payload_len)
-                        self._parse_message(
-                            packet_type, self.payload_len, self.frame)
-
-                        self.find_header = False
-                        self.payload_len = 0
-                        self.sync_pattern = collections.deque(2*[0], 2)
-                    else:
-                        APP_CONTEXT.get_logger().logger.info(
-                            "crc check error! packet_type:{0}".format(packet_type))
-
-                        self.emit('crc_failure', packet_type=packet_type,
-                                event_time=time.time())
-                        input_packet_config = next(
-                            (x for x in self.properties['userMessages']['inputPackets']
-                            if x['name'] == packet_type), None)
-                        if input_packet_config:
-                            self.emit('command',
-                                    packet_type=packet_type,
-                                    data=[],
-                                    error=True,
-                                    raw=self.frame)
-            else:
-                self.sync_pattern.append(data_block)
-                if operator.eq(list(self.sync_pattern), MSG_HEADER):
-                    self.frame = MSG_HEADER[:]  # header_tp.copy()
-                    self.find_header = True
+        for packet_type, frame, crc_passed in self._framer.feed(data):
+            frame = list(frame)
+            if crc_passed:
+                # find a whole frame
+                self._parse_message(
+                    packet_type, frame[PAYLOAD_LEN_INDEX], frame)
+                continue
+
+            APP_CONTEXT.get_logger().logger.info(
+                "crc check error! packet_type:{0}".format(packet_type))
+
+            self.emit('crc_failure', packet_type=packet_type,
+                      event_time=time.time())
+            input_packet_config = self.get_input_packet_config(
+                packet_type)
+            if input_packet_config:
+                self.emit('command',
+                          packet_type=packet_type,
+                          data=[],
+                          error=True,
+                          raw=frame)
 
     def _parse_message(self, packet_type, payload_len, frame):
+        dispatch = self.get_dispatch(packet_type)
+        if not dispatch:
+            return
+
         payload = frame[5:payload_len+5]
         # parse interactive commands
-        is_interactive_cmd = INPUT_PACKETS.__contains__(packet_type)
-        if is_interactive_cmd:
-            self._parse_input_packet(packet_type, payload, frame)
+        if dispatch.category == PACKET_CATEGORY.INPUT:
+            self._parse_input_packet(packet_type, payload, frame, dispatch)
         else:
             # consider as output packet, parse output Messages
-            self._parse_output_packet(packet_type, payload, frame)
+            self._parse_output_packet(packet_type, payload, frame, dispatch)
 
-    def _parse_input_packet(self, packet_type, payload, frame):
-        payload_parser = match_command_handler(packet_type)
+    def _parse_input_packet(self, packet_type, payload, frame, dispatch):
+        payload_parser = dispatch.decoder
         if payload_parser:
             data, error = payload_parser(
                 payload, self.properties['userConfiguration'])
@@ -106,13 +87,10 @@ class UartMessageParser(MessageParserBase):
             print('[Warning] Unsupported command {0}'.format(
                 packet_type.encode()))
 
-    def _parse_output_packet(self, packet_type, payload, frame):
+    def _parse_output_packet(self, packet_type, payload, frame, dispatch):
         # check if it is the valid out packet
-        payload_parser = None
-        is_other_output_packet = OTHER_OUTPUT_PACKETS.__contains__(packet_type)
-        if is_other_output_packet:
-            payload_parser = other_output_parser
-            data = payload_parser(payload)
+        if dispatch.category == PACKET_CATEGORY.OTHER_OUTPUT:
+            data = dispatch.decoder(payload)
 
             self.emit('continuous_message',
                   packet_type=packet_type,
@@ -121,12 +99,7 @@ class UartMessageParser(MessageParserBase):
                   raw=frame)
             return
 
-        payload_parser = common_continuous_parser
-
-        output_packet_config = next(
-            (x for x in self.properties['userMessages']['outputPackets']
-                if x['name'] == packet_type), None)
-        data = payload_parser(payload, output_packet_config)
+        data = dispatch.decoder(payload)
 
         if not data:
             # APP_CONTEXT.get_logger().logger.info(
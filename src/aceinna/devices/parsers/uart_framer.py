@@ -0,0 +1,75 @@
+"""
+Frame cutter for the 0x5555 packets received from UART
+"""
+from ...framework.utils import crc
+
+MSG_HEADER = b'UU'
+PACKET_TYPE_INDEX = 2
+PAYLOAD_LEN_INDEX = 4
+PAYLOAD_INDEX = 5
+CRC_LENGTH = 2
+
+
+class UartFramer(object):
+    '''
+    Cut the whole frames (header, packet type, length, payload, crc) out of
+    UART data. Data is kept in a buffer until the frame is completed, the
+    headers are located with bytes find instead of checking byte by byte.
+    When the crc of a frame is failed, it looks for the next header from the
+    byte after the failed header, so a broken frame does not swallow the
+    frames behind it.
+    If packet_types is given, a header followed by other packet type is
+    skipped.
+    '''
+
+    def __init__(self, packet_types=None):
+        self._buffer = bytearray()
+        self._packet_types = None
+        if packet_types:
+            self._packet_types = set(
+                item.encode('latin-1') if isinstance(item, str) else bytes(item)
+                for item in packet_types)
+
+    def reset(self):
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        '''
+        Add data, return a list of (packet_type, frame, crc_passed) of the
+        frames completed by it. packet_type is str, frame is bytes.
+        '''
+        buffer = self._buffer
+        buffer.extend(data)
+        buffer_len = len(buffer)
+        packet_types = self._packet_types
+        frames = []
+        start = 0
+
+        while True:
+            start = buffer.find(MSG_HEADER, start)
+            if start < 0:
+                # the last byte might be the first byte of next header
+                start = buffer_len - 1 if buffer_len and buffer[-1] == 0x55 \
+                    else buffer_len
+                break
+
+            if buffer_len - start < PAYLOAD_INDEX:
+                break
+
+            packet_type = bytes(buffer[start + PACKET_TYPE_INDEX:start + PAYLOAD_LEN_INDEX])
+            if packet_types and packet_type not in packet_types:
+                start += 1
+                continue
+
+            end = start + PAYLOAD_INDEX + buffer[start + PAYLOAD_LEN_INDEX] + CRC_LENGTH
+            if end > buffer_len:
+                break
+
+            frame = bytes(buffer[start:end])
+            crc_passed = crc.crc16_matches(frame[2:-CRC_LENGTH], frame[-CRC_LENGTH:])
+            frames.append((packet_type.decode('latin-1'), frame, crc_passed))
+            start = end if crc_passed else start + 1
+
+        if start > 0:
+            del buffer[:start]
+        return frames
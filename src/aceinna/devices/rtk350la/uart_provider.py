@@ -320,33 +320,8 @@ class Provider(RTKProviderBase):
             return False
 
     def on_read_raw(self, data):
-        for bytedata in data:
-            if bytedata == 0x24:
-                self.nmea_buffer = []
-                self.nmea_sync = 0
-                self.nmea_buffer.append(chr(bytedata))
-            else:
-                self.nmea_buffer.append(chr(bytedata))
-                if self.nmea_sync == 0:
-                    if bytedata == 0x0D:
-                        self.nmea_sync = 1
-                elif self.nmea_sync == 1:
-                    if bytedata == 0x0A:
-                        try:
-                            str_nmea = ''.join(self.nmea_buffer)
-                            cksum, calc_cksum = self.nmea_checksum(
-                                str_nmea)
-                            if cksum == calc_cksum:
-                                if str_nmea.find("$GPGGA") != -1 or str_nmea.find("$GNGGA") != -1:
-                                    if self.ntrip_client:
-                                        self.ntrip_client.send(str_nmea)
-                                APP_CONTEXT.get_print_logger().info(str_nmea.replace('\r\n', ''))
-
-                        except Exception as e:
-                            pass
-                    self.nmea_buffer = []
-                    self.nmea_sync = 0
-
+        # the raw data is logged with the output packets
+        self.handle_nmea(data)
 
     def on_receive_output_packet(self, packet_type, data, *args, **kwargs):
         '''
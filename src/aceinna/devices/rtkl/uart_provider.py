@@ -15,6 +15,9 @@ from ...framework.utils import (
 )
 from ...framework.utils.print import print_red
 
+# the block length of WA is a byte, and the firmware content is aligned to 16
+MAX_FIRMWARE_BLOCK_SIZE = 240
+
 
 class Provider(RTKProviderBase):
     '''
@@ -100,9 +103,12 @@ class Provider(RTKProviderBase):
         if rule == 'rtk':
             rtk_upgrade_worker = FirmwareUpgradeWorker(
                 self.communicator,
+                True,
                 lambda: helper.format_firmware_content(content),
                 self.firmware_write_command_generator,
-                192)
+                192,
+                window_size=self.get_upgrade_window(),
+                max_block_size=MAX_FIRMWARE_BLOCK_SIZE)
             rtk_upgrade_worker.on(
                 UPGRADE_EVENT.FIRST_PACKET, lambda: time.sleep(15))
             rtk_upgrade_worker.on(UPGRADE_EVENT.BEFORE_WRITE,
@@ -112,9 +118,12 @@ class Provider(RTKProviderBase):
         if rule == 'ins':
             ins_upgrade_worker = FirmwareUpgradeWorker(
                 self.communicator,
+                True,
                 lambda: helper.format_firmware_content(content),
                 self.firmware_write_command_generator,
-                192)
+                192,
+                window_size=self.get_upgrade_window(),
+                max_block_size=MAX_FIRMWARE_BLOCK_SIZE)
             ins_upgrade_worker.on(
                 UPGRADE_EVENT.FIRST_PACKET, lambda: time.sleep(15))
             ins_upgrade_worker.on(UPGRADE_EVENT.BEFORE_WRITE,
@@ -221,7 +230,9 @@ class beidouProvider(beidouProviderBase):
                 True,
                 lambda: helper.format_firmware_content(content),
                 self.firmware_write_command_generator,
-                192)
+                192,
+                window_size=self.get_upgrade_window(),
+                max_block_size=MAX_FIRMWARE_BLOCK_SIZE)
             ins_upgrade_worker.name = 'INS'
             ins_upgrade_worker.on(
                 UPGRADE_EVENT.FIRST_PACKET, lambda: time.sleep(15))
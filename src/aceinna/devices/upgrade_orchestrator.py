@@ -0,0 +1,181 @@
+import time
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from .base import EventBase
+from .upgrade_workers import UPGRADE_EVENT
+
+DEFAULT_CONCURRENCY = 4
+# seconds to wait for a device to finish all of its upgrade stages
+UNIT_UPGRADE_TIMEOUT = 1800
+
+
+def _get_firmware_file(params):
+    if isinstance(params, dict):
+        return params['file']
+    if isinstance(params, str):
+        return params
+    return params[1]['file'] if isinstance(params[1], dict) else params[1]
+
+
+class UNIT_STATUS:
+    WAITING = 'waiting'
+    UPGRADING = 'upgrading'
+    SUCCESS = 'success'
+    FAILED = 'failed'
+
+
+class UnitUpgrade(object):
+    '''
+    Upgrade state of a device
+    '''
+
+    def __init__(self, key, provider):
+        self.key = key
+        self.provider = provider
+        self.status = UNIT_STATUS.WAITING
+        self.message = None
+        self.current = 0
+        self.total = 0
+        self.start_time = None
+        self.end_time = None
+        self.done = threading.Event()
+
+    def get_result(self):
+        duration = None
+        if self.start_time and self.end_time:
+            duration = round(self.end_time - self.start_time, 1)
+        return {
+            'status': self.status,
+            'message': self.message,
+            'current': self.current,
+            'total': self.total,
+            'duration': duration
+        }
+
+
+class UpgradeOrchestrator(EventBase):
+    '''
+    Upgrade many devices at once, each device runs the upgrade stages of its
+    own provider. Up to max_concurrency devices are upgraded at the same
+    time. The firmware is read once and the content is shared by the devices.
+    Progress and failure are emitted with the key of device, a failure stops
+    only the device it happens on.
+    '''
+
+    def __init__(self, providers, max_concurrency=DEFAULT_CONCURRENCY,
+                 timeout=UNIT_UPGRADE_TIMEOUT):
+        super(UpgradeOrchestrator, self).__init__()
+        self.units = collections.OrderedDict(
+            (key, UnitUpgrade(key, provider)) for key, provider in providers.items())
+        self.max_concurrency = max(int(max_concurrency or 1), 1)
+        self.timeout = timeout
+        self.start_time = None
+        self.end_time = None
+        self._lock = threading.Lock()
+
+    def run(self, params):
+        '''
+        Upgrade the devices, params is the same as upgrade_framework of
+        provider, as ['upgrade', file, stages...] of 100base-t1, or the file
+        of UART. Return the result after all devices are done.
+        '''
+        file = _get_firmware_file(params)
+        self.start_time = time.time()
+
+        firmware_content = self._read_firmware(file)
+        if firmware_content is None:
+            for unit in self.units.values():
+                self._finish(unit, UNIT_STATUS.FAILED, 'cannot find firmware file')
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+                for unit in self.units.values():
+                    executor.submit(self._upgrade_unit, unit,
+                                    params, file, firmware_content)
+
+        self.end_time = time.time()
+        return self.get_result()
+
+    def _read_firmware(self, file):
+        if not self.units:
+            return None
+        provider = next(iter(self.units.values())).provider
+        can_download, firmware_content = provider.download_firmware(file)
+        if not can_download:
+            return None
+        return firmware_content
+
+    def _upgrade_unit(self, unit, params, file, firmware_content):
+        provider = unit.provider
+        handlers = [
+            ('continous', lambda packet_type, data:
+             self._handle_output_packet(unit, packet_type, data)),
+            ('upgrade_failed', lambda code, message:
+             self._finish(unit, UNIT_STATUS.FAILED, message)),
+            ('upgrade_restart', lambda:
+             self._finish(unit, UNIT_STATUS.SUCCESS))
+        ]
+        for event_type, handler in handlers:
+            provider.on(event_type, handler)
+
+        unit.status = UNIT_STATUS.UPGRADING
+        unit.start_time = time.time()
+        try:
+            if provider.is_upgrading:
+                self._finish(unit, UNIT_STATUS.FAILED, 'The device is upgrading')
+                return
+
+            provider.exclusive_upgrade = False
+            provider.preload_firmware(file, firmware_content)
+            provider.upgrade_framework(params)
+            if not unit.done.wait(self.timeout):
+                self._finish(unit, UNIT_STATUS.FAILED, 'Upgrade timeout')
+        except Exception as ex:  # pylint:disable=broad-except
+            self._finish(unit, UNIT_STATUS.FAILED, str(ex))
+        finally:
+            for event_type, handler in handlers:
+                provider.off(event_type, handler)
+            provider.exclusive_upgrade = True
+            provider.preload_firmware(None, None)
+
+    def _handle_output_packet(self, unit, packet_type, data):
+        if packet_type != 'upgrade_progress':
+            return
+        unit.current = data['addr']
+        unit.total = data['fs_len']
+        self.emit(UPGRADE_EVENT.PROGRESS, unit.key, unit.current, unit.total)
+
+    def _finish(self, unit, status, message=None):
+        with self._lock:
+            if unit.done.is_set():
+                return
+            unit.status = status
+            unit.message = message
+            unit.end_time = time.time()
+            unit.done.set()
+
+        if status == UNIT_STATUS.SUCCESS:
+            self.emit(UPGRADE_EVENT.FINISH, unit.key)
+        else:
+            self.emit(UPGRADE_EVENT.ERROR, unit.key, message)
+
+    def get_result(self):
+        '''
+        Result of each device, and the throughput in devices per hour
+        '''
+        units = dict((key, unit.get_result()) for key, unit in self.units.items())
+        succeeded = len([unit for unit in self.units.values()
+                         if unit.status == UNIT_STATUS.SUCCESS])
+        failed = len([unit for unit in self.units.values()
+                      if unit.status == UNIT_STATUS.FAILED])
+        elapsed = 0
+        if self.start_time:
+            elapsed = (self.end_time or time.time()) - self.start_time
+        units_per_hour = round(succeeded * 3600 / elapsed, 1) if elapsed > 0 else 0
+        return {
+            'units': units,
+            'succeeded': succeeded,
+            'failed': failed,
+            'elapsed': round(elapsed, 1),
+            'units_per_hour': units_per_hour
+        }
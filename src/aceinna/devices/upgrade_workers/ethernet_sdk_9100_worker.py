@@ -1,6 +1,7 @@
 import time
 import math
 import struct
+import zlib
 from ..base.upgrade_worker_base import UpgradeWorkerBase
 from ...framework.utils import helper
 from . import UPGRADE_EVENT
@@ -1788,6 +1789,24 @@ CRC32_TAB = \
         0x2d02ef8d
     ]
 
+
+
+def build_crc32_table(polynomial=0xEDB88320):
+    '''
+    Table of the reflected CRC-32 with polynomial
+    '''
+    table = []
+    for i in range(256):
+        value = i
+        for _ in range(8):
+            value = (value >> 1) ^ polynomial if value & 1 else value >> 1
+        table.append(value)
+    return table
+
+
+# zlib computes the same CRC-32 in C when the table is the standard one
+USE_ZLIB_CRC32 = CRC32_TAB == build_crc32_table()
+
 BLOCK_SIZE = 5120
 
 pG = [0x01, 0xcc]
@@ -1868,6 +1887,10 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
     def sdk_crc(self, crc32val, bytes_hex, data_len):
         '''Calculates CRC per 380 manual
         '''
+        if USE_ZLIB_CRC32:
+            # only whole words are calculated
+            return zlib.crc32(bytes(bytes_hex[:int(data_len/4)*4]), crc32val)
+
         crc32val = crc32val ^ 0xffffffff
         # print(int(len/4))
         for i in range(int(data_len/4)):
@@ -1894,35 +1917,45 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
         value_list[3] = (value >> 24) & 0xff
         return value_list
 
-    def read_until(self, check_data, time_delay):
-        is_match = False
-        time_delay+= self.passthrough_time
-        read_times = int(time_delay/10)
-        while read_times > 0:
-            packet_raw = self._communicator.read()
-            if packet_raw is None:
-                time.sleep(0.01)
-                read_times -= 1
+    def read_packet(self, packet_type, deadline):
+        '''
+        Wait a packet of packet type until deadline, return its payload or
+        None. The communicator wakes up the wait when a packet comes.
+        '''
+        packet_type = bytes(packet_type)
+        while True:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                return None
+            packet_raw = self._communicator.read(timeout=timeout)
+            if packet_raw is None or bytes(packet_raw[2:4]) != packet_type:
                 continue
+            packet_length = struct.unpack('<I', bytes(packet_raw[4:8]))[0]
+            return list(packet_raw[8: 8 + packet_length])
 
-            packet_type = packet_raw[2:4]
-            data_buffer = []
-
-            if packet_type == bytes(WS):
-                packet_length = struct.unpack('<i', packet_raw[4:8])[0]
-                data_buffer = packet_raw[8: 8 + packet_length]
-
-            if len(data_buffer) > 0:
-                is_match = self._match(data_buffer, check_data)
-                if is_match is False:
-                    print(data_buffer)
-
-                break
+    def wait_response(self, packet_type, timeout):
+        '''
+        Wait the response of a command in timeout seconds
+        '''
+        return self.read_packet(packet_type, time.time() + timeout)
 
-            time.sleep(0.01)
-            read_times -= 1
+    def read_until(self, check_data, time_delay):
+        '''
+        Wait the next WS reply in time_delay ms, return if it matches
+        check_data
+        '''
+        deadline = time.time() + (time_delay + self.passthrough_time) / 1000
+        while True:
+            data_buffer = self.read_packet(WS, deadline)
+            if data_buffer is None:
+                return False
+            if len(data_buffer) == 0:
+                continue
 
-        return is_match
+            is_match = self._match(data_buffer, check_data)
+            if is_match is False:
+                print(data_buffer)
+            return is_match
 
     def send_packet(self, data, send_method=[0x07, 0xaa], buffer_size=1024):
         total = len(data)
@@ -1944,11 +1977,12 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
                 split_range.append(total)
                 total = 0
 
+        # the chunks of a block are sent together, the next block waits for
+        # the ack of bootloader
         for actual_size in split_range:
             self.write_wrapper(dst, src, send_method,
                                data[start: start+actual_size])
             start += actual_size
-            time.sleep(0.001)
 
     def send_sdk_cmd_JS(self):
         result = False
@@ -1958,9 +1992,7 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
 
         for i in range(3):
             self.send_packet([], send_method=self.JS)
-            time.sleep(5)
-            response = helper.read_untils_have_data(
-                self._communicator, self.JS, 20, 1000)
+            response = self.wait_response(self.JS, 6)
             if response is not None:
                 result = True
                 break
@@ -1977,9 +2009,7 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
 
         for i in range(6):
             self.send_packet([], send_method=JG)
-            time.sleep(3)
-            response = helper.read_untils_have_data(
-                self._communicator, JG, 10, 1000)
+            response = self.wait_response(JG, 4)
             if response is not None:
                 result = True
                 break
@@ -1996,8 +2026,7 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
 
         for i in range(retry_times):
             self.send_packet(sync)
-            time.sleep(0.05)
-            is_matched = self.read_until([0x3A, 0x54, 0x2C, 0xA6], self.wait_sync)
+            is_matched = self.read_until([0x3A, 0x54, 0x2C, 0xA6], self.wait_sync + 50)
             if is_matched:
                 break
 
@@ -2011,8 +2040,7 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
 
         for i in range(3):
             self.send_packet(change_baud_cmd)
-            time.sleep(1)
-            result = self.read_until(0xCC, 500)
+            result = self.read_until(0xCC, 1500)
             if result:
                 break
         return result
@@ -2120,10 +2148,9 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
         self.send_packet(boot_part2)
 
         for _ in range(3):
-            is_match = self.read_until(0xCC, self.wait_ack)
+            is_match = self.read_until(0xCC, self.wait_ack + 1000)
             if is_match:
                 return True
-            time.sleep(1)
 
         return False
 
@@ -2161,10 +2188,9 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
         self.send_packet(boot_part3)
 
         for _ in range(3):
-            is_match = self.read_until(0xCC, self.wait_ack)
+            is_match = self.read_until(0xCC, self.wait_ack + 1000)
             if is_match:
                 return True
-            time.sleep(1)
 
         return False
 
@@ -2175,8 +2201,7 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
 
         for i in range(3):
             self.send_packet(write_cmd)
-            time.sleep(3)
-            result = self.read_until(0xCC, self.wait_ack)
+            result = self.read_until(0xCC, self.wait_ack + 3000)
             if result:
                 break
 
@@ -2188,8 +2213,7 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
 
         for i in range(3):
             self.send_packet(bin_info_list, buffer_size=512)
-            time.sleep(8)
-            result = self.read_until(0xCC, self.wait_short_ack)
+            result = self.read_until(0xCC, self.wait_short_ack + 8000)
             if result:
                 break
 
@@ -2363,16 +2387,13 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
             self.write_wrapper(
                 bytes([int(x, 16) for x in 'ff:ff:ff:ff:ff:ff'.split(':')]),
                 self._communicator.get_src_mac(), pG, [])
-            time.sleep(1)
-            response = helper.read_untils_have_data(
-                self._communicator, pG, 10, 1000)
+            response = self.wait_response(pG, 2)
             if response:
                 break
 
         if not self.send_sdk_cmd_JS():
             return self._raise_error('Send sdk JS command failed')
-        
-        time.sleep(2)
+
         for i in range(100):
             result = self._communicator.reshake_hand()
             if result:
@@ -2384,9 +2405,7 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
             self.write_wrapper(
                 bytes([int(x, 16) for x in 'ff:ff:ff:ff:ff:ff'.split(':')]),
                 self._communicator.get_src_mac(), pG, [])
-            time.sleep(0.2)
-            response = helper.read_untils_have_data(
-                self._communicator, pG, 10, 1000)
+            response = self.wait_response(pG, 1.2)
             if response is not None:
                 self.firmware_version_check(response)
                 break
@@ -2433,7 +2452,6 @@ class SDKUpgradeWorker(UpgradeWorkerBase):
             return self._raise_error('Write flash failed') 
 
         for i in range(3):
-            time.sleep(1)
             result = self.flash_crc()
             if not result and i == 2:
                 return self._raise_error('CRC check fail')
@@ -1,23 +1,47 @@
-import os
 import time
 import math
+import struct
+import collections
 from ..base.upgrade_worker_base import UpgradeWorkerBase
 from ...framework.utils import helper
 from ...framework.command import Command
 from . import (UPGRADE_EVENT, UPGRADE_GROUP)
 
+# seconds to wait the ack of a block in window mode before sending it again
+ACK_TIMEOUT = 1
+MAX_RETRIES = 3
+# bytes read from communicator for acks, as read_untils_have_data
+ACK_READ_LENGTH = 12
+# adaptive block size grows by BLOCK_SIZE_STEP after BLOCK_GROW_ACKS acks
+# without retransmit, keeps the size of firmware content aligned
+BLOCK_SIZE_STEP = 16
+BLOCK_GROW_ACKS = 32
+
 
 class FirmwareUpgradeWorker(UpgradeWorkerBase):
     '''Firmware upgrade worker
+
+    Blocks are sent one by one and each waits for its ack. With a
+    window_size larger than 1 and ack enabled, up to window_size blocks are
+    sent before their acks, acks are matched by the offset in them and the
+    block timed out is sent again alone. The block size grows up to
+    max_block_size while no block is sent again. A bootloader without the
+    offset in ack falls back to stop-and-wait, from the oldest block
+    without ack.
     '''
 
-    def __init__(self, communicator, ack_enable, file_content, command_generator, block_size=240):
+    def __init__(self, communicator, ack_enable, file_content, command_generator, block_size=240,
+                 window_size=1, max_block_size=None):
         super(FirmwareUpgradeWorker, self).__init__()
         self._communicator = communicator
         self.ack_enable = ack_enable
         self.current = 0
         #self._baudrate = baudrate
         self.max_data_len = block_size  # custom
+        self.window_size = max(int(window_size or 1), 1)
+        self.max_block_size = max(max_block_size or block_size, block_size)
+        self.retransmits = 0
+        self.ordered_acks = False
         self._group = UPGRADE_GROUP.FIRMWARE
 
         self._command_generator = command_generator
@@ -33,15 +57,11 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
     def get_upgrade_content_size(self):
         return self.total
 
-    def write_block(self, data_len, current, data):
+    def build_command(self, data_len, current, data):
         '''
-        Send block to bootloader
+        Build the command of block, return (actual command, payload length
+        format, listen packet)
         '''
-        if not callable(self._command_generator):
-            self.emit(UPGRADE_EVENT.ERROR, self._key,
-                      'There is no command generator for Firmware upgrade worker.')
-            return False
-
         command = self._command_generator(data_len, current, data)
 
         actual_command = None
@@ -56,6 +76,20 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
         if isinstance(command, list):
             actual_command = command
 
+        return actual_command, payload_length_format, listen_packet
+
+    def write_block(self, data_len, current, data):
+        '''
+        Send block to bootloader
+        '''
+        if not callable(self._command_generator):
+            self.emit(UPGRADE_EVENT.ERROR, self._key,
+                      'There is no command generator for Firmware upgrade worker.')
+            return False
+
+        actual_command, payload_length_format, listen_packet = self.build_command(
+            data_len, current, data)
+
         # helper.build_bootloader_input_packet(
         #     'WA', data_len, current, data)
         try:
@@ -71,7 +105,7 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
                 self.emit(UPGRADE_EVENT.ERROR, self._key,
                           'Fail in first packet: {0}'.format(ex))
                 print('Fail in first packet: {0}'.format(ex))
-                os._exit(1)
+                self.exit_on_failure()
                 return False
             time.sleep(5)
 
@@ -83,6 +117,106 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
 
         return True
 
+    def send_block(self, current, data_len):
+        '''
+        Send block without waiting its ack, return the listen packet of ack,
+        None if failed
+        '''
+        data = self._file_content[current:current + data_len]
+        actual_command, _, listen_packet = self.build_command(
+            data_len, current, data)
+        try:
+            self._communicator.write(actual_command, True)
+        except Exception as ex:  # pylint: disable=broad-except
+            return None
+        return listen_packet
+
+    def write_window(self):
+        '''
+        Send the blocks after the first one with a window of blocks waiting
+        for ack, return False if a block is not acknowledged after retries
+        '''
+        # offset -> [data length, send time, retries]
+        inflight = collections.OrderedDict()
+        sent_offsets = set()
+        next_offset = self.current
+        block_size = self.max_data_len
+        clean_acks = 0
+        listen_packet = None
+        data_buffer = []
+
+        while next_offset < self.total or inflight:
+            if self._is_stopped:
+                return True
+
+            while len(inflight) < self.window_size and next_offset < self.total:
+                data_len = min(block_size, self.total - next_offset)
+                listen_packet = self.send_block(next_offset, data_len)
+                if listen_packet is None:
+                    return False
+                inflight[next_offset] = [data_len, time.time(), 0]
+                sent_offsets.add(next_offset)
+                next_offset += data_len
+
+            packets = helper.read_packets(
+                self._communicator, data_buffer, ACK_READ_LENGTH)
+            if not packets:
+                time.sleep(0.001)
+
+            for packet_type, payload in packets:
+                if packet_type != listen_packet or not inflight:
+                    continue
+                # the ack echoes the offset of block. An ack without it
+                # cannot be matched once a block is lost or sent again, so
+                # the blocks from the oldest without ack are sent again
+                # with stop-and-wait
+                offset = None
+                if len(payload) >= 4:
+                    offset = struct.unpack('>I', bytes(payload[0:4]))[0]
+                if offset not in sent_offsets:
+                    self.ordered_acks = True
+                    self.current = next(iter(inflight))
+                    self.drain_acks()
+                    return True
+                if inflight.pop(offset, None) is None:
+                    # ack of a block sent again
+                    continue
+                clean_acks += 1
+                if clean_acks >= BLOCK_GROW_ACKS and block_size < self.max_block_size:
+                    block_size = min(block_size + BLOCK_SIZE_STEP, self.max_block_size)
+                    clean_acks = 0
+
+            acked = next(iter(inflight)) if inflight else next_offset
+            if acked > self.current:
+                self.current = acked
+                self.emit(UPGRADE_EVENT.PROGRESS, self._key,
+                          self.current, self.total)
+
+            now = time.time()
+            for offset, block in inflight.items():
+                if now - block[1] < ACK_TIMEOUT:
+                    continue
+                if block[2] >= MAX_RETRIES:
+                    self.current = offset
+                    return False
+                if self.send_block(offset, block[0]) is None:
+                    return False
+                block[1] = now
+                block[2] += 1
+                self.retransmits += 1
+                block_size = self.max_data_len
+                clean_acks = 0
+
+        return True
+
+    def drain_acks(self):
+        '''
+        Wait for the acks still on the way and drop them, so they are not
+        taken as the acks of the blocks sent after
+        '''
+        time.sleep(ACK_TIMEOUT)
+        self._communicator.reset_buffer()
+
     def work(self):
         '''Upgrades firmware of connected device to file provided in argument
         '''
@@ -91,7 +225,7 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
         if self.current == 0 and self.total == 0:
             self.emit(UPGRADE_EVENT.ERROR, self._key, 'Invalid file content')
             print('Invalid file content')
-            os._exit(1)
+            self.exit_on_failure()
             return
 
         try:
@@ -100,7 +234,7 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
             self.emit(UPGRADE_EVENT.ERROR, self._key,
                       'Fail in before write: {0}'.format(ex))
             print('Fail in before write: {0}'.format(ex))
-            os._exit(1)
+            self.exit_on_failure()
             return
             
         self._communicator.reset_buffer()
@@ -109,6 +243,20 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
             if self._is_stopped:
                 return
 
+            if self.current > 0 and self.ack_enable and self.window_size > 1 \
+                    and not self.ordered_acks:
+                if not self.write_window():
+                    self.emit(UPGRADE_EVENT.ERROR, self._key,
+                              'Write firmware operation failed,  offset length: {0}'.format(self.current))
+                    print('Write firmware operation failed, offset length: {0}'.format(self.current))
+                    self.exit_on_failure()
+                    return
+                if self._is_stopped:
+                    return
+                if not self.ordered_acks:
+                    break
+                continue
+
             packet_data_len = self.max_data_len if (
                 self.total - self.current) > self.max_data_len else (self.total - self.current)
             data = self._file_content[self.current: (
@@ -127,11 +275,14 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
                         write_result = self.write_block(packet_data_len, self.current, data)
                         if write_result:
                             break
+                    # the ack of the block sent before may still come
+                    if write_result and i > 0:
+                        self.drain_acks()
                 if not write_result:
                     self.emit(UPGRADE_EVENT.ERROR, self._key,
                             'Write firmware operation failed,  offset length: {0}'.format(self.current))
                     print('Write firmware operation failed, offset length: {0}'.format(self.current))
-                    os._exit(1)
+                    self.exit_on_failure()
                     return
             else:
                 if self.current == 0:
@@ -142,8 +293,10 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
                     if timeout > 5:
                         time.sleep(timeout - 5)
                     else:
+                        self.emit(UPGRADE_EVENT.ERROR, self._key, 'Fail in erase flash')
                         print('Fail in erase flash')
-                        os._exit(1)
+                        self.exit_on_failure()
+                        return
                 else:
                     for i in range(3):
                         self.write_block(packet_data_len, self.current, data)
@@ -158,7 +311,7 @@ class FirmwareUpgradeWorker(UpgradeWorkerBase):
             self.emit(UPGRADE_EVENT.ERROR, self._key,
                       'Fail in after write: {0}'.format(ex))
             print('Fail in after write: {0}'.format(ex))
-            os._exit(1)
+            self.exit_on_failure()
             return
 
         if self.total > 0 and self.current >= self.total:
@@ -1,6 +1,5 @@
 from array import array
 import time
-import os
 
 from ..base.upgrade_worker_base import UpgradeWorkerBase
 from ...framework.utils import helper
@@ -90,7 +89,14 @@ class JumpBootloaderWorker(UpgradeWorkerBase):
             if isinstance(self._command, list):
                 actual_command = self._command
 
-            self.emit(UPGRADE_EVENT.BEFORE_COMMAND)
+            try:
+                self.emit(UPGRADE_EVENT.BEFORE_COMMAND)
+            except Exception as ex:
+                self.emit(UPGRADE_EVENT.ERROR, self._key,
+                          'Fail in before command: {0}'.format(ex))
+                print('Fail in before command: {0}'.format(ex))
+                self.exit_on_failure()
+                return
             self._communicator.reset_buffer()
             
             if self.ack_enable:
@@ -109,11 +115,19 @@ class JumpBootloaderWorker(UpgradeWorkerBase):
                     self.emit(UPGRADE_EVENT.ERROR, self._key,
                         'jump bootloader fail')
                     print('jump bootloader fail, {0}'.format(self._key))
-                    os._exit(1)
+                    self.exit_on_failure()
+                    return
             else:
                 self._communicator.write(actual_command)
                 time.sleep(10)
 
-            self.emit(UPGRADE_EVENT.AFTER_COMMAND)
+            try:
+                self.emit(UPGRADE_EVENT.AFTER_COMMAND)
+            except Exception as ex:
+                self.emit(UPGRADE_EVENT.ERROR, self._key,
+                          'Fail in after command: {0}'.format(ex))
+                print('Fail in after command: {0}'.format(ex))
+                self.exit_on_failure()
+                return
 
         self.emit(UPGRADE_EVENT.FINISH, self._key)
@@ -1,4 +1,5 @@
 from .ntrip_client import NTRIPClient
+from .rtcm_forwarder import (RTCMForwarder, EthernetRTCMPacker, create_rtcm_forwarder)
 from .odometer_listener import (OdometerListener, CanOptions)
 from .ethernet_data_logger import EthernetDataLogger
 from .ethernet_data_logger import EthernetDebugDataLogger
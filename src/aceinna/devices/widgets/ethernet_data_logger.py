@@ -1,6 +1,29 @@
 import time
 import json
 
+# wait for the communicator to receive when nothing is read
+IDLE_INTERVAL = 0.01
+# seconds a batch read waits for packets
+READ_BATCH_TIMEOUT = 0.05
+
+
+def read_and_write(communicator, log_writer):
+    ''' Move the received packets to log writer, wait on the communicator or
+        sleep when nothing received
+    '''
+    read_batch = getattr(communicator, 'read_batch', None)
+    if read_batch:
+        for item in read_batch(timeout=READ_BATCH_TIMEOUT):
+            log_writer.write(item)
+        return
+
+    read_data = communicator.read()
+    if read_data:
+        log_writer.write(read_data)
+    else:
+        time.sleep(IDLE_INTERVAL)
+
+
 class EthernetDataLogger:
     def __init__(self, properties, communicator, log_writer):
         self.log_writer = log_writer
@@ -13,10 +36,7 @@ class EthernetDataLogger:
 
     def _read_and_write(self):
         while True:
-            read_data = self.communicator.read()
-            if read_data:
-                self.log_writer.write(read_data)
-        pass
+            read_and_write(self.communicator, self.log_writer)
 
 class EthernetDebugDataLogger:
     def __init__(self, properties, communicator, log_writer):
@@ -32,12 +52,9 @@ class EthernetDebugDataLogger:
         # send get configuration
         while True:
             try:
-                read_data = self.communicator.read()
-                if read_data:
-                    self.log_writer.write(read_data)
+                read_and_write(self.communicator, self.log_writer)
             except Exception as e:
                 print('Data Log Failed, exit')
-        pass
 
 
 class EthernetRTCMDataLogger:
@@ -54,9 +71,6 @@ class EthernetRTCMDataLogger:
         print('------------------------------------------------------------')
         while True:
             try:
-                read_data = self.communicator.read()
-                if read_data:
-                    self.log_writer.write(read_data)
+                read_and_write(self.communicator, self.log_writer)
             except Exception as e:
                 print('Data Log Failed, exit')
-        pass
@@ -1,175 +1,390 @@
-from socket import *
+import asyncio
 import concurrent.futures as futures
+import random
+import socket
 import time
 import base64
 
 from ...framework.utils import print as print_helper
-from ...framework.constants import APP_TYPE
 from ...framework.context import APP_CONTEXT
 from ...core.gnss import RTCMParser
 from ...core.event_base import EventBase
 
+RECEIVE_BUFFER_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 3
+RESPONSE_TIMEOUT = 3
+# a caster sends corrections every second, the link is stale without data
+DATA_TIMEOUT = 10
+BACKOFF_INITIAL = 0.05
+BACKOFF_MAX = 5
+# parsed rtcm waiting for device writer, the caster is not read when full
+FORWARD_QUEUE_SIZE = 32
+
+
+class NTRIPCaster(object):
+    '''
+    Settings and health of a caster mountpoint
+    '''
+
+    def __init__(self, ip, port, mount_point, username='', password='',
+                 version=1):
+        self.ip = ip
+        self.port = int(port)
+        self.mount_point = mount_point
+        self.username = username or ''
+        self.password = password or ''
+        self.version = int(version or 1)
+        self.consecutive_failures = 0
+        self.backoff = 0
+        self.next_attempt = 0
+        self.last_error = None
+        self.connected_count = 0
+        self.bytes_received = 0
+
+    @staticmethod
+    def from_settings(settings):
+        return NTRIPCaster(settings['ip'], settings['port'],
+                           settings['mountPoint'], settings.get('username'),
+                           settings.get('password'), settings.get('version'))
+
+    @property
+    def name(self):
+        return '{0}:{1}/{2}'.format(self.ip, self.port, self.mount_point)
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.backoff = 0
+        self.next_attempt = 0
+
+    def record_failure(self, error, backoff_initial, backoff_max):
+        '''
+        Delay next connect with exponential backoff, the jitter spreads the
+        reconnect of many clients after a caster restarts
+        '''
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        self.backoff = min(self.backoff * 2, backoff_max) \
+            if self.backoff else backoff_initial
+        self.next_attempt = time.monotonic() + \
+            self.backoff * random.uniform(1, 1.25)
+
+    def get_status(self):
+        return {
+            'caster': self.name,
+            'consecutive_failures': self.consecutive_failures,
+            'last_error': self.last_error,
+            'connected_count': self.connected_count,
+            'bytes_received': self.bytes_received
+        }
+
+
+def build_casters(ntrip_properties):
+    '''
+    The caster of ip/port/mountPoint, then the backup casters in 'casters'.
+    A backup caster uses the account of the first one if not set.
+    '''
+    settings = dict((item['name'], item['value']) for item in ntrip_properties)
+    backups = settings.pop('casters', None) or []
+    casters = []
+    if settings.get('ip'):
+        casters.append(NTRIPCaster.from_settings(settings))
+    for backup in backups:
+        caster_settings = dict(settings)
+        caster_settings.update(backup)
+        casters.append(NTRIPCaster.from_settings(caster_settings))
+    return casters
+
 
 class NTRIPClient(EventBase):
-    def __init__(self, properties):
+    '''
+    Receive RTCM from a NTRIP caster, and emit the parsed data as 'parsed'.
+    The client switches to the healthiest caster when the link is lost, and
+    reconnects with a backoff from milliseconds. Set 'version' to 2 in the
+    ntrip settings for NTRIP v2 with chunked transfer.
+    '''
+
+    def __init__(self, properties, casters=None):
         super(NTRIPClient, self).__init__()
 
         self.parser = RTCMParser()
         self.parser.on('parsed', self.handle_parsed_data)
         self.is_connected = 0
-        self.tcp_client_socket = None
         self.is_close = False
-        self.append_header_string= None
-
-        for x in properties["initial"]["ntrip"]:
-            if x['name'] == 'ip':
-                self.ip = x["value"]
-            elif x['name'] == 'port':
-                self.port = x["value"]
-            elif x['name'] == 'mountPoint':
-                self.mountPoint = x["value"]
-            elif x['name'] == 'username':
-                self.username = x["value"]
-            elif x['name'] == 'password':
-                self.password = x["value"]
+        self.append_header_string = None
+        self.casters = casters or build_casters(
+            properties["initial"]["ntrip"])
+        self.current_caster = None
+        self.connect_timeout = CONNECT_TIMEOUT
+        self.response_timeout = RESPONSE_TIMEOUT
+        self.data_timeout = DATA_TIMEOUT
+        self.backoff_initial = BACKOFF_INITIAL
+        self.backoff_max = BACKOFF_MAX
+
+        self._loop = None
+        self._closed = None
+        self._writer = None
+        self._forward_queue = None
+        self._parsed_packets = []
+        self._last_position = None
+
+        if self.casters:
+            self.ip = self.casters[0].ip
+            self.port = self.casters[0].port
+            self.mountPoint = self.casters[0].mount_point
+            self.username = self.casters[0].username
+            self.password = self.casters[0].password
 
     def run(self):
         APP_CONTEXT.get_print_logger().info('NTRIP run..')
-        while True:
-            if self.is_close:
-                if self.tcp_client_socket:
-                    self.tcp_client_socket.close()
-                self.is_connected = 0
-                return
-
-            while True:
-                # if self.communicator.can_write():
-                time.sleep(3)
-                self.is_connected = self.doConnect()
-                if self.is_connected == 0:
-                    time.sleep(3)
-                else:
-                    break
-                # else:
-                #    time.sleep(1)
-            recvData = self.recvResponse()
-
-            if recvData != None and recvData.find(b'ICY 200 OK') != -1:
-                print_helper.print_on_console('NTRIP:[request] ok')
-                APP_CONTEXT.get_print_logger().info('NTRIP:[request] ok')
-                self.recv()
-            else:
-                print_helper.print_on_console('NTRIP:[request] fail')
-                APP_CONTEXT.get_print_logger().info('NTRIP:[request] fail')
-                self.tcp_client_socket.close()
+        if not self.casters:
+            self._log('NTRIP:[connect] no caster is set')
+            return
 
-    def set_connect_headers(self, headers:dict):
-        self.append_header_string = ''
-        for key in headers.keys():
-            self.append_header_string += '{0}: {1}\r\n'.format(key, headers[key])
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self.run_async())
+        finally:
+            loop.close()
 
-    def clear_connect_headers(self):
-        self.append_header_string = None
+    async def run_async(self):
+        self._closed = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._forward_queue = asyncio.Queue(FORWARD_QUEUE_SIZE)
+        executor = futures.ThreadPoolExecutor(max_workers=1)
+        forwarder = asyncio.ensure_future(self._forward(executor))
+        closed = asyncio.ensure_future(self._closed.wait())
+        try:
+            while not self.is_close:
+                caster = self._select_caster()
+                delay = caster.next_attempt - time.monotonic()
+                if delay > 0:
+                    await asyncio.wait([closed], timeout=delay)
+                    continue
 
+                session = asyncio.ensure_future(self._session(caster))
+                await asyncio.wait([session, closed],
+                                   return_when=asyncio.FIRST_COMPLETED)
+                if not session.done():
+                    session.cancel()
+                    await asyncio.gather(session, return_exceptions=True)
+        finally:
+            self.is_connected = 0
+            self._loop = None
+            closed.cancel()
+            forwarder.cancel()
+            await asyncio.gather(closed, forwarder, return_exceptions=True)
+            executor.shutdown(wait=False)
 
-    def doConnect(self):
-        self.is_connected = 0
-        self.tcp_client_socket = socket(AF_INET, SOCK_STREAM)
+    def _select_caster(self):
+        '''
+        Prefer a caster ready to connect with the fewest failures, in the
+        order of settings. Otherwise the caster to be ready first.
+        '''
+        now = time.monotonic()
+        ready = [caster for caster in self.casters if caster.next_attempt <= now]
+        if ready:
+            return min(ready, key=lambda caster: caster.consecutive_failures)
+        return min(self.casters, key=lambda caster: caster.next_attempt)
+
+    async def _session(self, caster):
+        self.current_caster = caster
+        writer = None
         try:
-            print_helper.print_on_console('NTRIP:[connect] {0}:{1} start...'.format(
-                self.ip, self.port))
-            APP_CONTEXT.get_print_logger().info(
-                'NTRIP:[connect] {0}:{1} start...'.format(self.ip, self.port))
+            self._log('NTRIP:[connect] {0}:{1} start...'.format(
+                caster.ip, caster.port))
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    caster.ip, caster.port, limit=RECEIVE_BUFFER_SIZE),
+                self.connect_timeout)
+            self._set_receive_buffer(writer)
+            self._log('NTRIP:[connect] ok')
 
-            self.tcp_client_socket.connect((self.ip, self.port))
-            print_helper.print_on_console('NTRIP:[connect] ok')
-            APP_CONTEXT.get_print_logger().info('NTRIP:[connect] ok')
+            writer.write(self._build_request(caster))
+            chunked = await asyncio.wait_for(
+                self._read_response(reader), self.response_timeout)
+            self._log('NTRIP:[request] ok')
 
+            self._writer = writer
             self.is_connected = 1
-        except Exception as e:
-            print_helper.print_on_console('NTRIP:[connect] {0}'.format(e))
-            APP_CONTEXT.get_print_logger().info(
-                'NTRIP:[connect] {0}'.format(e))
+            caster.connected_count += 1
+            # a VRS caster starts the stream after it knows the position
+            if self._last_position:
+                writer.write(self._last_position)
 
-        if self.is_connected == 1:
-            # send ntrip request
-            ntripRequestStr = 'GET /' + self.mountPoint + ' HTTP/1.1\r\n'
-            ntripRequestStr += 'User-Agent: NTRIP PythonDriver/0.1\r\n'
+            await self._receive(caster, reader, chunked)
+        except asyncio.CancelledError:
+            raise
+        except Exception as ex:  # pylint:disable=broad-except
+            error = 'timeout' if isinstance(ex, asyncio.TimeoutError) else ex
+            self._log('NTRIP:[{0}] {1}'.format(caster.name, error))
+            caster.record_failure(error, self.backoff_initial, self.backoff_max)
+        finally:
+            self.is_connected = 0
+            self._writer = None
+            if writer:
+                writer.close()
 
-            if self.append_header_string:
-                ntripRequestStr += self.append_header_string
+    async def _receive(self, caster, reader, chunked):
+        read = self._read_chunk if chunked else self._read_data
+        while not self.is_close:
+            data = await asyncio.wait_for(read(reader), self.data_timeout)
+            if not data:
+                raise ConnectionError('no data error')
 
-            ntripRequestStr += 'Authorization: Basic '
-            apikey = self.username + ':' + self.password
-            apikeyBytes = apikey.encode("utf-8")
-            ntripRequestStr += base64.b64encode(apikeyBytes).decode("utf-8")+'\r\n'
-            ntripRequestStr += '\r\n'
-            # print(ntripRequestStr)
-            self.send(ntripRequestStr)
-        return self.is_connected
+            if caster.consecutive_failures:
+                caster.record_success()
+            caster.bytes_received += len(data)
+            self.parser.receive(data)
 
-    def send(self, data):
-        if self.is_connected:
-            try:
-                if isinstance(data, str):
-                    self.tcp_client_socket.send(data.encode('utf-8'))
-                else:
-                    self.tcp_client_socket.send(bytes(data))
-            except Exception as e:
-                print_helper.print_on_console('NTRIP:[send] error occur {0}'.format(e))
-                APP_CONTEXT.get_print_logger().info(
-                    'NTRIP:[send] {0}'.format(e))
+            packets, self._parsed_packets = self._parsed_packets, []
+            for packet in packets:
+                await self._forward_queue.put(packet)
 
-    def recv(self):
-        self.tcp_client_socket.settimeout(10)
+    async def _read_data(self, reader):
+        return await reader.read(RECEIVE_BUFFER_SIZE)
+
+    async def _read_chunk(self, reader):
+        line = await reader.readline()
+        if not line:
+            return b''
+        size = int(line.split(b';')[0].strip(), 16)
+        if size == 0:
+            return b''
+        data = await reader.readexactly(size)
+        await reader.readexactly(2)
+        return data
+
+    async def _read_response(self, reader):
+        '''
+        Check the response of caster, return if the data is chunked
+        '''
+        status = await reader.readline()
+        if status.startswith(b'ICY 200'):
+            return False
+
+        fields = status.split()
+        if len(fields) < 2 or not fields[0].startswith(b'HTTP/') \
+                or fields[1] != b'200':
+            raise ConnectionError('request fail {0}'.format(
+                status.strip().decode('latin-1') or 'no response'))
+
+        chunked = False
         while True:
-            if self.is_close:
-                return
+            line = await reader.readline()
+            if line.strip() == b'':
+                return chunked
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'transfer-encoding' \
+                    and 'chunked' in value.lower():
+                chunked = True
+
+    def _build_request(self, caster):
+        ntripRequestStr = 'GET /' + caster.mount_point + ' HTTP/1.1\r\n'
+        ntripRequestStr += 'User-Agent: NTRIP PythonDriver/0.1\r\n'
+        if caster.version == 2:
+            ntripRequestStr += 'Host: {0}:{1}\r\n'.format(caster.ip, caster.port)
+            ntripRequestStr += 'Ntrip-Version: Ntrip/2.0\r\n'
+
+        if self.append_header_string:
+            ntripRequestStr += self.append_header_string
+
+        ntripRequestStr += 'Authorization: Basic '
+        apikey = caster.username + ':' + caster.password
+        apikeyBytes = apikey.encode("utf-8")
+        ntripRequestStr += base64.b64encode(apikeyBytes).decode("utf-8")+'\r\n'
+        ntripRequestStr += '\r\n'
+        return ntripRequestStr.encode('utf-8')
+
+    def _set_receive_buffer(self, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is None:
+            return
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF,
+                            RECEIVE_BUFFER_SIZE)
+        except OSError:
+            pass
+
+    async def _forward(self, executor):
+        '''
+        Write the parsed data to device in a thread, so a slow device does
+        not stop the receive. The packets queued meanwhile are written
+        together.
+        '''
+        while True:
+            packets = [await self._forward_queue.get()]
+            while not self._forward_queue.empty():
+                packets.append(self._forward_queue.get_nowait())
             try:
-                data = self.tcp_client_socket.recv(1024)
-                if data:
-                    APP_CONTEXT.get_print_logger().info(
-                        'NTRIP:[recv] rxdata {0}'.format(len(data)))
-                    # print('NTRIP:[recv] rxdata {0}'.format(len(data)))
-                    self.parser.receive(data)
-                    # self.emit('canfd_base', data)
-                else:
-                    print_helper.print_on_console('NTRIP:[recv] no data error')
-                    APP_CONTEXT.get_print_logger().info(
-                        'NTRIP:[recv] no data error')
-                    self.tcp_client_socket.close()
-                    return
-
-            except Exception as e:
-                print_helper.print_on_console('NTRIP:[recv] error occur {0}'.format(e))
+                await self._loop.run_in_executor(
+                    executor, self._emit_parsed, packets)
+            except Exception as ex:  # pylint:disable=broad-except
                 APP_CONTEXT.get_print_logger().info(
-                    'NTRIP:[recv] error occur {0}'.format(e))
-                self.tcp_client_socket.close()
-                return
+                    'NTRIP:[forward] error occur {0}'.format(ex))
 
-    def recvResponse(self):
-        self.tcp_client_socket.settimeout(3)
-        while True:
+    def _emit_parsed(self, packets):
+        for packet in packets:
+            self.emit('canfd_base', packet)
+            self.emit('parsed', packet)
+
+    def _log(self, message):
+        print_helper.print_on_console(message)
+        APP_CONTEXT.get_print_logger().info(message)
+
+    def set_connect_headers(self, headers:dict):
+        self.append_header_string = ''
+        for key in headers.keys():
+            self.append_header_string += '{0}: {1}\r\n'.format(key, headers[key])
+
+    def clear_connect_headers(self):
+        self.append_header_string = None
+
+    def send(self, data):
+        ''' Send data to caster, it is safe to call from other threads
+        '''
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        else:
+            data = bytes(data)
+        self._last_position = data
+
+        loop = self._loop
+        if self.is_connected and loop:
             try:
-                data = self.tcp_client_socket.recv(1024)
-                if not data or len(data) == 0:
-                    print_helper.print_on_console('NTRIP:[recvR] no data')
-                    return None
+                loop.call_soon_threadsafe(self._write, data)
+            except RuntimeError:
+                pass
 
-                return data
-            except Exception as e:
-                APP_CONTEXT.get_print_logger().info(
-                    'NTRIP:[recvR] error occur {0}'.format(e))
-                return None
+    def _write(self, data):
+        writer = self._writer
+        if writer is None or writer.is_closing():
+            return
+        try:
+            writer.write(data)
+        except Exception as e:  # pylint:disable=broad-except
+            print_helper.print_on_console('NTRIP:[send] error occur {0}'.format(e))
+            APP_CONTEXT.get_print_logger().info(
+                'NTRIP:[send] {0}'.format(e))
+
+    def get_statistics(self):
+        return [caster.get_status() for caster in self.casters]
 
     def close(self):
         self.append_header_string = None
         self.is_close = True
-
+        loop = self._loop
+        if loop:
+            try:
+                loop.call_soon_threadsafe(self._closed.set)
+            except RuntimeError:
+                pass
 
     def handle_parsed_data(self, data):
-        combined_data = []
-        for item in data:
-            combined_data += item
-        self.emit('canfd_base', combined_data)
-        self.emit('parsed', combined_data)
+        '''
+        Each RTCM message is emitted alone, the device writer coalesces them
+        to the size of its link
+        '''
+        if self._forward_queue is None:
+            self._emit_parsed(data)
+        else:
+            self._parsed_packets.extend(data)
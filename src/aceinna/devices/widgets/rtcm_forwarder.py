@@ -0,0 +1,172 @@
+import struct
+import threading
+import time
+
+from ...framework.utils import crc
+
+# payload of a 0x020b packet, fits a 1500 bytes ethernet frame with headers
+DEFAULT_MAX_SIZE = 1400
+DEFAULT_MAX_LATENCY = 0.02
+RTCM_PACKET_TYPE = b'\x02\x0b'
+ETHERNET_MIN_PAYLOAD = 46
+
+
+class EthernetRTCMPacker(object):
+    '''
+    Build the 0x020b packets of RTCM on a preallocated header, only the
+    lengths in header are updated for each packet. The packet is the same
+    as helper.build_ethernet_packet.
+    '''
+
+    def __init__(self, dst_mac, src_mac, packet_type=RTCM_PACKET_TYPE):
+        self._header = bytearray(
+            bytes(dst_mac) + bytes(src_mac) + bytes(2) + b'\x55\x55' +
+            bytes(packet_type) + bytes(4))
+        self._header_view = memoryview(self._header)
+
+    def pack(self, payload):
+        header = self._header
+        payload_len = len(header) - 14 + len(payload) + 2
+        struct.pack_into('<H', header, 12, payload_len)
+        struct.pack_into('<I', header, 18, len(payload))
+
+        crc_value = crc.update(crc.update(crc.CRC16_INIT,
+                                          self._header_view[16:]), payload)
+        packet = header + payload + \
+            bytes([(crc_value >> 8) & 0xFF, crc_value & 0xFF])
+        if payload_len < ETHERNET_MIN_PAYLOAD:
+            packet += bytes(ETHERNET_MIN_PAYLOAD - payload_len)
+        return bytes(packet)
+
+
+class RTCMForwarder(object):
+    '''
+    Coalesce RTCM messages into one write to device. The queued messages
+    are written when the next one does not fit in max_size, or max_latency
+    seconds after the first one is queued. A message is never split, a
+    message larger than max_size is written alone. Set max_latency to 0 to
+    write each message at once.
+    '''
+
+    def __init__(self, write, max_size=DEFAULT_MAX_SIZE,
+                 max_latency=DEFAULT_MAX_LATENCY):
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self.bytes_count = 0
+        self.frame_count = 0
+        self.packet_count = 0
+        self.error_count = 0
+        self.last_error = None
+        self._write = write
+        self._pending = bytearray()
+        self._pending_times = []
+        self._deadline = None
+        self._latency_total = 0
+        self._latency_max = 0
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+
+    def put(self, data):
+        '''
+        Queue a complete RTCM message
+        '''
+        with self._condition:
+            if self._pending and len(self._pending) + len(data) > self.max_size:
+                self._flush()
+
+            self._pending.extend(data)
+            self._pending_times.append(time.monotonic())
+
+            if len(self._pending) >= self.max_size or self.max_latency <= 0:
+                self._flush()
+            elif self._deadline is None:
+                self._deadline = self._pending_times[0] + self.max_latency
+                self._start()
+                self._condition.notify()
+
+    def flush(self):
+        with self._condition:
+            self._flush()
+
+    def close(self):
+        with self._condition:
+            self._flush()
+            self._running = False
+            self._condition.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+    def get_statistics(self):
+        with self._condition:
+            average_latency = self._latency_total / self.frame_count \
+                if self.frame_count else 0
+            return {
+                'bytes': self.bytes_count,
+                'frames': self.frame_count,
+                'packets': self.packet_count,
+                'errors': self.error_count,
+                'average_latency_ms': round(average_latency * 1000, 3),
+                'max_latency_ms': round(self._latency_max * 1000, 3)
+            }
+
+    def _start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        with self._condition:
+            while self._running:
+                if self._deadline is None:
+                    self._condition.wait()
+                    continue
+                timeout = self._deadline - time.monotonic()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+                self._flush()
+
+    def _flush(self):
+        '''
+        Write the queued messages, the lock is held so the order of writes is
+        kept between the caller and the timer thread
+        '''
+        self._deadline = None
+        if not self._pending:
+            return
+
+        payload = bytes(self._pending)
+        now = time.monotonic()
+        for put_time in self._pending_times:
+            latency = now - put_time
+            self._latency_total += latency
+            self._latency_max = max(self._latency_max, latency)
+        self.frame_count += len(self._pending_times)
+        self._pending.clear()
+        self._pending_times = []
+
+        try:
+            self._write(payload)
+            self.bytes_count += len(payload)
+            self.packet_count += 1
+        except Exception as ex:  # pylint:disable=broad-except
+            self.error_count += 1
+            self.last_error = str(ex)
+
+
+def create_rtcm_forwarder(write, options=None):
+    '''
+    RTCMForwarder with the packet size and latency(ms) of cli options. The
+    latency is a string in options as replay speed, so '0' is not replaced
+    by the default.
+    '''
+    max_size = getattr(options, 'rtcm_packet_size', None) or DEFAULT_MAX_SIZE
+    latency = getattr(options, 'rtcm_latency', None)
+    max_latency = DEFAULT_MAX_LATENCY if latency in [None, ''] \
+        else float(latency) / 1000
+    return RTCMForwarder(write, max_size, max_latency)
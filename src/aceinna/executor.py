@@ -5,11 +5,13 @@ import os
 import sys
 import signal
 import time
+import multiprocessing
 if os.name == 'nt':
     import numpy #fix:Executable missing Library
 from aceinna.bootstrap import Loader
 from aceinna.framework.decorator import (
     receive_args, handle_application_exception)
+from aceinna.framework import log_writer
 sys.path.append("./framework")
 from aceinna.framework.constants import INTERFACES
 
@@ -19,8 +21,9 @@ IS_LATER_PY_38 = sys.version_info > (3, 8)
 
 
 def kill_app(signal_int, call_back):
-    '''Kill main thread
+    '''Kill main thread, the queued logs are written first
     '''
+    log_writer.close_all()
     os.kill(os.getpid(), signal.SIGTERM)
 
 
@@ -63,6 +66,8 @@ def start_app(**kwargs):
 
 
 if __name__ == '__main__':
+    # the log parser workers are started from the bundled executable
+    multiprocessing.freeze_support()
     signal.signal(signal.SIGINT, kill_app)
     # compatible code for windows python 3.8
     if IS_WINDOWS and IS_LATER_PY_38:
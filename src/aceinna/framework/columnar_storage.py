@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*
+"""
+Record the decoded output packets to .npy files, one file per packet type
+"""
+import os
+import sys
+import time
+import struct
+import datetime
+import threading
+import numpy as np
+from numpy.lib import format as npy_format
+from .utils import resource
+from .context import APP_CONTEXT
+from . import log_writer
+
+# payload type: (struct format, numpy format)
+RECORD_TYPE_FORMATS = {
+    'float': ('f', '<f4'),
+    'uint32': ('I', '<u4'),
+    'int32': ('i', '<i4'),
+    'int16': ('h', '<i2'),
+    'uint16': ('H', '<u2'),
+    'double': ('d', '<f8'),
+    'int64': ('q', '<i8'),
+    'uint64': ('Q', '<u8'),
+    'char': ('c', 'S1'),
+    'uchar': ('B', 'u1'),
+    'uint8': ('B', 'u1')
+}
+
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+# the header is rewritten with the record count, keep space for 20 digits
+MAX_RECORD_COUNT = 10 ** 20 - 1
+# records are kept in memory until the size or the interval is reached
+RECORD_BUFFER_SIZE = 0x40000
+RECORD_FLUSH_INTERVAL = 1
+
+
+def _get_record_fields(output_packet):
+    return [(field['name'], RECORD_TYPE_FORMATS[field['type']])
+            for field in output_packet['payload']
+            if field['type'] in RECORD_TYPE_FORMATS]
+
+
+def build_record_dtype(output_packet):
+    '''
+    Build the packed structured dtype of a packet from its payload
+    definition, the record has the same layout as the payload.
+    '''
+    fields = _get_record_fields(output_packet)
+    return np.dtype({
+        'names': [name for name, _ in fields],
+        'formats': [formats[1] for _, formats in fields]
+    })
+
+
+def _build_header(descr, count, header_size=None):
+    header = "{{'descr': {0!r}, 'fortran_order': False, 'shape': ({1},), }}".format(
+        descr, count)
+    if header_size is None:
+        # the length of magic, header length and header is a multiple of 64
+        header_size = len(header) + 1
+        header_size += -(len(NPY_MAGIC) + 2 + header_size) % 64
+    header = header.ljust(header_size - 1) + '\n'
+    return struct.pack('<H', header_size) + header.encode('latin1')
+
+
+class NpyRecordWriter(object):
+    '''
+    Append the records of an output packet to a .npy file. The header has
+    room for any record count, the shape in it is updated when the buffered
+    records are written, so the file could be loaded with
+    np.load(path, mmap_mode='r') while recording. flush_if_due is called
+    periodically, so the records of a stopped stream are written too.
+    '''
+
+    def __init__(self, path, output_packet):
+        self.path = path
+        self.dtype = build_record_dtype(output_packet)
+        self.names = self.dtype.names
+        self.count = 0
+        self._struct = struct.Struct('<' + ''.join(
+            formats[0] for _, formats in _get_record_fields(output_packet)))
+        self._descr = npy_format.dtype_to_descr(self.dtype)
+        self._header_size = len(
+            _build_header(self._descr, MAX_RECORD_COUNT)) - 2
+        self._records = []
+        self._buffered_size = 0
+        self._last_flush_time = time.time()
+        self._lock = threading.Lock()
+        self._file = open(path, 'wb')
+        self._write_header()
+
+    def append(self, data):
+        record = self._struct.pack(*[data[name] for name in self.names])
+        with self._lock:
+            self._add(record, 1)
+
+    def append_many(self, items):
+        pack = self._struct.pack
+        names = self.names
+        records = b''.join(pack(*[data[name] for name in names])
+                           for data in items)
+        with self._lock:
+            self._add(records, len(items))
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def flush_if_due(self, now=None):
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if self._records and \
+                    now - self._last_flush_time >= RECORD_FLUSH_INTERVAL:
+                self._flush()
+
+    def _flush(self):
+        self._last_flush_time = time.time()
+        if self._records:
+            self._file.write(b''.join(self._records))
+            self._records = []
+            self._buffered_size = 0
+        self._write_header()
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._file.close()
+
+    def _add(self, data, count):
+        self._records.append(data)
+        self._buffered_size += len(data)
+        self.count += count
+        if self._buffered_size >= RECORD_BUFFER_SIZE or \
+                time.time() - self._last_flush_time >= RECORD_FLUSH_INTERVAL:
+            self._flush()
+
+    def _write_header(self):
+        position = self._file.tell()
+        self._file.seek(0)
+        self._file.write(NPY_MAGIC)
+        self._file.write(_build_header(
+            self._descr, self.count, self._header_size))
+        if position:
+            self._file.seek(position)
+        self._file.flush()
+
+
+class ColumnarFileLoger(object):
+    '''
+    Data logger that has the interface of FileLoger and writes the .npy
+    record files instead of CSV
+    '''
+
+    def __init__(self, device_properties):
+        self.device_properties = device_properties
+        self.root_folder = os.path.join(resource.get_executor_path(), r'data')
+        if not os.path.exists(self.root_folder):
+            os.mkdir(self.root_folder)
+        self.output_packets = self.device_properties['userMessages']['outputPackets']
+        self.log_file_names = {}
+        self._writers = {}
+
+    def start_user_log(self, file_name='', ws=False):
+        '''
+        start log.
+        return:
+                0: OK
+                1: exception that has started logging already.
+                2: other exception.
+        '''
+        try:
+            if len(self._writers) > 0:
+                return 1  # has started logging already.
+
+            start_time = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+            current_path = os.path.join(self.root_folder, start_time)
+            if not os.path.exists(current_path):
+                os.mkdir(current_path)
+
+            for packet in self.output_packets:
+                if packet.get('save2file', 1) != 1:
+                    continue
+
+                if file_name == '':
+                    log_file_name = packet['name'] + '.npy'
+                else:
+                    log_file_name = file_name + '_' + packet['name'] + '.npy'
+                self.log_file_names[packet['name']] = log_file_name
+                self._writers[packet['name']] = NpyRecordWriter(
+                    os.path.join(current_path, log_file_name), packet)
+            log_writer.add_periodic_task(self._flush_records)
+            return 0
+        except Exception as e:
+            print('Exception! File:[{0}], Line:[{1}]. Exception:{2}'.format(
+                __file__, sys._getframe().f_lineno, e))
+            return 2
+
+    def stop_user_log(self):
+        '''
+        stop log.
+        return:
+                0: OK
+                1: exception that driver hasn't started logging files yet.
+                2: other exception.
+        '''
+        if len(self._writers) == 0:
+            return 1  # driver hasn't started logging files yet.
+
+        log_writer.remove_periodic_task(self._flush_records)
+        rev = 0
+        for writer in self._writers.values():
+            try:
+                writer.close()
+            except Exception as e:
+                print(e)
+                rev = 2
+        self._writers.clear()
+        self.log_file_names.clear()
+        return rev
+
+    def append(self, packet_type, packet):
+        writer = self._writers.get(packet_type)
+        if writer is None:
+            return
+        try:
+            writer.append(packet)
+        except (KeyError, struct.error) as ex:
+            APP_CONTEXT.get_logger().logger.error(ex)
+
+    def append_many(self, packet_type, packets):
+        writer = self._writers.get(packet_type)
+        if writer is None:
+            return
+        try:
+            writer.append_many(packets)
+        except (KeyError, struct.error) as ex:
+            APP_CONTEXT.get_logger().logger.error(ex)
+
+    def get_log_file_names(self):
+        return self.log_file_names.copy()
+
+    def _flush_records(self, closing):
+        '''
+        Write the records kept longer than RECORD_FLUSH_INTERVAL, or all
+        records when closing. Called by the log writer service.
+        '''
+        for writer in list(self._writers.values()):
+            if closing:
+                writer.flush()
+            else:
+                writer.flush_if_due()
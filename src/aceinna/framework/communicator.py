@@ -23,6 +23,9 @@ class CommunicatorFactory:
         elif method == INTERFACES.ETH_100BASE_T1:
             from .communicators import Ethernet
             return Ethernet(options)
+        elif method == INTERFACES.REPLAY:
+            from .communicators.replay import create_replay
+            return create_replay(options)
         else:
             raise Exception('no matched communicator')
 
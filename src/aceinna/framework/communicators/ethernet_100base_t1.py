@@ -1,11 +1,14 @@
 import time
-import collections
 import os
+import threading
 from scapy.all import sendp, conf, AsyncSniffer
 from ..constants import (BAUDRATE_LIST, INTERFACES)
+from ..context import APP_CONTEXT
 from ..utils.print import (print_red)
 from ..utils import helper
+from ..utils.ring_buffer import (FrameRingBuffer, DEFAULT_CAPACITY, OVERFLOW_POLICY)
 from ..communicator import Communicator
+from .raw_socket import (RawSocketSniffer, mac_to_str)
 
 # Add parameter configuration type to be filtered to resolve timeout issue
 OTHER_FILTER_PACKETS = [b'\x02\xcc', b'\x03\xcc', b'\x04\xcc', b'\x05\xcc', b'\x06\xcc']
@@ -13,6 +16,55 @@ OTHER_FILTER_PACKETS = [b'\x02\xcc', b'\x03\xcc', b'\x04\xcc', b'\x05\xcc', b'\x
 UPGRADE_PACKETS = [b'\x01\xcc', b'\x01\xaa', b'\x02\xaa', b'\x03\xaa', b'\x04\xaa',b'\x05\xaa',
                    b'\x06\xaa', b'\x07\xaa', b'\x08\xaa', b'\x4a\x49', b'\x4a\x41', b'\x57\x41', b'\x0a\xaa']
 
+def list_network_cards(host_mac=None):
+    '''
+    List (name, mac) of the network cards, only the card of host_mac if given
+    '''
+    network_card_info = []
+    for item in conf.ifaces:
+        if conf.ifaces[item].ip == '127.0.0.1' or conf.ifaces[item].mac in ['00:00:00:00:00:00', '']:
+            continue
+        if host_mac and conf.ifaces[item].mac != host_mac:
+            continue
+        network_card_info.append(
+            (conf.ifaces[item].name, conf.ifaces[item].mac))
+    return network_card_info
+
+
+class L2Sender(object):
+    '''
+    Send frames through a layer 2 socket kept open, sendp of scapy opens
+    and closes a socket for each frame
+    '''
+
+    def __init__(self):
+        self._socket = None
+        self._iface = None
+        self._lock = threading.Lock()
+
+    def send(self, data, iface):
+        with self._lock:
+            if self._socket is None or self._iface != iface:
+                self._close()
+                self._socket = conf.L2socket(iface=iface)
+                self._iface = iface
+            try:
+                self._socket.send(data)
+            except Exception:
+                self._close()
+                raise
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._socket:
+            self._socket.close()
+        self._socket = None
+        self._iface = None
+
+
 class Ethernet(Communicator):
     '''Ethernet'''
 
@@ -30,10 +82,11 @@ class Ethernet(Communicator):
         self.config_unit_sn = None
 
         self.iface_confirmed = False
-        self.receive_cache = collections.deque(maxlen=20000)
         self.use_length_as_protocol = True
         self.async_sniffer = None
         self.upgrading_flag = False
+        self.receive_backend = 'scapy'
+        self.l2_sender = L2Sender()
 
         if options and options.device_type != 'auto':
             self.filter_device_type = options.device_type
@@ -47,6 +100,20 @@ class Ethernet(Communicator):
             self.config_unit_sn = options.unit_sn != 'auto'
             self.config_unit_sn = options.unit_sn if self.config_unit_sn else None
 
+        if options and options.eth_backend:
+            self.receive_backend = options.eth_backend
+
+        buffer_size = DEFAULT_CAPACITY
+        overflow_policy = OVERFLOW_POLICY.DROP_OLDEST
+        if options and options.eth_buffer_size:
+            buffer_size = options.eth_buffer_size
+        if options and options.eth_overflow:
+            overflow_policy = options.eth_overflow
+
+        self.receive_cache = FrameRingBuffer(buffer_size, overflow_policy)
+        APP_CONTEXT.statistics.register_buffer(
+            'ethernet_receive', self.receive_cache)
+
     def handle_iface_confirm_packet(self, packet):
         self.iface_confirmed = True
         self.dst_mac = packet.src
@@ -189,18 +256,38 @@ class Ethernet(Communicator):
         filter_exp = 'ether src host {0} or {1}'.format(
             self.dst_mac, hard_code_mac)
 
+        if self.receive_backend == 'raw_socket':
+            try:
+                self.async_sniffer = RawSocketSniffer(
+                    self.iface, self.handle_raw_frame,
+                    src_macs=[self.dst_mac, hard_code_mac])
+                self.async_sniffer.start()
+                time.sleep(0.1)
+                return
+            except (AttributeError, OSError) as ex:
+                # AF_PACKET is only available on linux, and needs CAP_NET_RAW
+                print_red('Raw socket is not available, use scapy. {0}'.format(ex))
+                self.receive_backend = 'scapy'
+
         self.async_sniffer = AsyncSniffer(
             iface=self.iface, prn=self.handle_recive_packet, filter=filter_exp, store=0)
         self.async_sniffer.start()
         time.sleep(0.1)
 
     def handle_recive_packet(self, packet):
-        packet_raw = bytes(packet)[12:]
-        packet_raw_length = packet_raw[0:2]
-        packet_type = packet_raw[4:6]
+        self.handle_raw_frame(bytes(packet))
+
+    def handle_raw_frame(self, frame):
+        '''
+        Cache the 0x5555 packet of an ethernet frame, frame could be bytes
+        or a memoryview from the raw socket
+        '''
+        packet_raw = frame[12:]
+        packet_raw_length = bytes(packet_raw[0:2])
+        packet_type = bytes(packet_raw[4:6])
 
         if packet_type == b'\x01\xcc':
-            self.dst_mac = packet.src
+            self.dst_mac = mac_to_str(frame[6:12])
 
             if packet_raw_length == b'\x00\x00':
                 self.use_length_as_protocol = False
@@ -208,9 +295,9 @@ class Ethernet(Communicator):
         if self.upgrading_flag:
             if UPGRADE_PACKETS.__contains__(packet_type)\
               or OTHER_FILTER_PACKETS.__contains__(packet_type):
-                self.receive_cache.append(packet_raw[2:])
+                self.receive_cache.put(packet_raw[2:])
         else:
-            self.receive_cache.append(packet_raw[2:])
+            self.receive_cache.put(packet_raw[2:])
 
     def open(self):
         '''
@@ -221,6 +308,7 @@ class Ethernet(Communicator):
         '''
         close
         '''
+        self.l2_sender.close()
 
     def can_write(self):
         if self.iface:
@@ -232,21 +320,26 @@ class Ethernet(Communicator):
         write
         '''
         try:
-            sendp(data, iface=self.iface, verbose=0)
-            # print(data)
+            if isinstance(self.async_sniffer, RawSocketSniffer) \
+                    and self.async_sniffer.running:
+                self.async_sniffer.send(data)
+                return
+            self.l2_sender.send(data, self.iface)
         except Exception as e:
             raise
 
-    def read(self, size=100):
+    def read(self, size=100, timeout=0):
         '''
-        read
+        read a cached packet, wait up to timeout seconds if nothing cached
         '''
-        if len(self.receive_cache) == self.receive_cache.maxlen:
-            print('receive cache full.')
+        return self.receive_cache.get(timeout)
 
-        if len(self.receive_cache) > 0:
-            return self.receive_cache.popleft()
-        return None
+    def read_batch(self, max_frames=1000, timeout=0):
+        '''
+        read up to max_frames cached packets, oldest first, wait up to
+        timeout seconds if nothing cached
+        '''
+        return self.receive_cache.get_batch(max_frames, timeout)
 
     def reset_buffer(self):
         '''
@@ -261,15 +354,7 @@ class Ethernet(Communicator):
         return bytes([int(x, 16) for x in self.dst_mac.split(':')])
 
     def get_network_card(self):
-        network_card_info = []
-        for item in conf.ifaces:
-            if conf.ifaces[item].ip == '127.0.0.1' or conf.ifaces[item].mac in ['00:00:00:00:00:00', '']:
-                continue
-            if self.filter_host_mac_assigned and conf.ifaces[item].mac != self.filter_host_mac:
-                continue
-            network_card_info.append(
-                (conf.ifaces[item].name, conf.ifaces[item].mac))
-        return network_card_info
+        return list_network_cards(self.filter_host_mac)
 
     def upgrade(self):
         self.upgrading_flag = True
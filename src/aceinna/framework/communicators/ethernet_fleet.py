@@ -0,0 +1,276 @@
+"""
+Drive many devices on one 100base-t1 network card with a single capture
+"""
+import time
+import threading
+from scapy.all import AsyncSniffer
+from ..constants import INTERFACES
+from ..context import APP_CONTEXT
+from ..utils.print import (print_red)
+from ..utils import helper
+from ..utils.ring_buffer import (FrameRingBuffer, DEFAULT_CAPACITY, OVERFLOW_POLICY)
+from ..communicator import Communicator
+from .raw_socket import (RawSocketSniffer, mac_to_str)
+from .ethernet_100base_t1 import (
+    UPGRADE_PACKETS, OTHER_FILTER_PACKETS, L2Sender, list_network_cards)
+
+PING_PACKET = b'\x01\xcc'
+BROADCAST_MAC = 'ff:ff:ff:ff:ff:ff'
+# seconds to collect the answers of the broadcast ping
+DEFAULT_DISCOVER_TIME = 1
+DISCOVER_RETRIES = 3
+RESHAKE_TIMEOUT = 0.2
+
+
+class EthernetUnit(Communicator):
+    '''
+    A device of the fleet. The fleet puts the frames sent from the mac of
+    device into its own buffer, the frames written are sent by the capture
+    of fleet.
+    '''
+
+    def __init__(self, fleet, mac):
+        super(EthernetUnit, self).__init__()
+        self.type = INTERFACES.ETH_100BASE_T1
+        self.fleet = fleet
+        self.device_key = mac
+        self.dst_mac = mac
+        self.src_mac = fleet.src_mac
+        self.iface = fleet.iface
+        self.filter_device_type = fleet.filter_device_type
+        # the serial number option is for a single device
+        self.config_unit_sn = None
+        self.use_length_as_protocol = True
+        self.upgrading_flag = False
+        self.receive_cache = FrameRingBuffer(
+            fleet.buffer_size, fleet.overflow_policy)
+
+    def put_frame(self, packet):
+        '''
+        Cache a 0x5555 packet of the device
+        '''
+        if self.upgrading_flag:
+            packet_type = bytes(packet[2:4])
+            if packet_type not in UPGRADE_PACKETS and \
+                    packet_type not in OTHER_FILTER_PACKETS:
+                return
+        self.receive_cache.put(packet)
+
+    def find_device(self, callback, retries=0, not_found_handler=None):
+        self.device = None
+        self.reset_buffer()
+
+        for _ in range(retries + 3):
+            self.confirm_device(self, self.filter_device_type)
+            if self.device:
+                callback(self.device)
+                return
+            time.sleep(0.1)
+
+        if not_found_handler:
+            not_found_handler()
+        else:
+            print_red('Cannot confirm the device {0}'.format(self.device_key))
+
+    def reshake_hand(self):
+        '''
+        Ping the device, True if it answers
+        '''
+        self.reset_buffer()
+        command = helper.build_ethernet_packet(
+            self.get_dst_mac(), self.get_src_mac(), PING_PACKET)
+        self.write(command.actual_command)
+
+        deadline = time.time() + RESHAKE_TIMEOUT
+        while True:
+            packet = self.read(timeout=max(deadline - time.time(), 0))
+            if packet is None:
+                return False
+            if bytes(packet[2:4]) == PING_PACKET:
+                return True
+
+    def can_write(self):
+        return self.fleet.running
+
+    def write(self, data, is_flush=False):
+        self.fleet.send(data)
+
+    def read(self, size=100, timeout=0):
+        '''
+        read a cached packet, wait up to timeout seconds if nothing cached
+        '''
+        return self.receive_cache.get(timeout)
+
+    def read_batch(self, max_frames=1000, timeout=0):
+        '''
+        read up to max_frames cached packets, oldest first, wait up to
+        timeout seconds if nothing cached
+        '''
+        return self.receive_cache.get_batch(max_frames, timeout)
+
+    def reset_buffer(self):
+        self.receive_cache.clear()
+
+    def get_src_mac(self):
+        return bytes([int(x, 16) for x in self.src_mac.split(':')])
+
+    def get_dst_mac(self):
+        return bytes([int(x, 16) for x in self.dst_mac.split(':')])
+
+    def upgrade(self):
+        self.upgrading_flag = True
+
+
+class EthernetFleet(object):
+    '''
+    One capture of a network card, the frames are demultiplexed by source
+    mac to the units. A unit is added when it answers the broadcast ping of
+    discover. The devices should use length as protocol, the bootloader
+    sending from 04:00:00:00:00:04 cannot be told apart.
+    '''
+
+    def __init__(self, options=None, sniffer_factory=None, send_method=None):
+        self.iface = None
+        self.src_mac = None
+        self.filter_device_type = None
+        self.filter_host_mac = None
+        self.receive_backend = 'scapy'
+        self.buffer_size = DEFAULT_CAPACITY
+        self.overflow_policy = OVERFLOW_POLICY.DROP_OLDEST
+        self.units = {}
+        self.unknown_count = 0
+        self._units_by_mac = {}
+        self._discovering = False
+        self._lock = threading.Lock()
+        self._sniffer = None
+        self._sniffer_factory = sniffer_factory
+        self._send_method = send_method
+        self._l2_sender = L2Sender()
+
+        if options and options.device_type not in [None, 'auto']:
+            self.filter_device_type = options.device_type
+        if options and options.host_mac not in [None, 'auto']:
+            self.filter_host_mac = options.host_mac
+        if options and options.eth_backend:
+            self.receive_backend = options.eth_backend
+        if options and options.eth_buffer_size:
+            self.buffer_size = options.eth_buffer_size
+        # a full unit must not stall the capture of others, so never block
+        if options and options.eth_overflow and \
+                options.eth_overflow != OVERFLOW_POLICY.BLOCK:
+            self.overflow_policy = options.eth_overflow
+
+    @property
+    def running(self):
+        return self._sniffer is not None and self._sniffer.running
+
+    def discover(self, discover_time=DEFAULT_DISCOVER_TIME):
+        '''
+        Broadcast ping on the network cards, until a card has devices
+        answered. Return the units.
+        '''
+        if self.running:
+            self._ping_all(discover_time)
+            return list(self.units.values())
+
+        for _ in range(DISCOVER_RETRIES):
+            for iface, mac in list_network_cards(self.filter_host_mac):
+                self.start(iface, mac)
+                self._ping_all(discover_time)
+                if self.units:
+                    print('[NetworkCard]', self.iface, 'MAC:', self.src_mac)
+                    APP_CONTEXT.get_logger().logger.info(
+                        'Found {0} devices on {1}'.format(
+                            len(self.units), self.iface))
+                    return list(self.units.values())
+                self.stop()
+        return []
+
+    def start(self, iface, src_mac):
+        self.iface = iface
+        self.src_mac = src_mac
+
+        if self._sniffer_factory:
+            self._sniffer = self._sniffer_factory(iface, self.handle_raw_frame)
+            self._sniffer.start()
+            return
+
+        if self.receive_backend == 'raw_socket':
+            try:
+                # no kernel filter, the devices are not known before discover
+                self._sniffer = RawSocketSniffer(iface, self.handle_raw_frame)
+                self._sniffer.start()
+                return
+            except (AttributeError, OSError) as ex:
+                print_red('Raw socket is not available, use scapy. {0}'.format(ex))
+                self.receive_backend = 'scapy'
+
+        self._sniffer = AsyncSniffer(
+            iface=iface, prn=self.handle_recive_packet,
+            filter='ether dst host {0} or ether dst host {1}'.format(
+                src_mac, BROADCAST_MAC),
+            store=0)
+        self._sniffer.start()
+        time.sleep(0.1)
+
+    def stop(self):
+        if self._sniffer and self._sniffer.running:
+            self._sniffer.stop()
+        self._sniffer = None
+
+    def close(self):
+        self.stop()
+        self._l2_sender.close()
+
+    def _ping_all(self, discover_time):
+        with self._lock:
+            self._discovering = True
+        command = helper.build_ethernet_packet(
+            bytes([int(x, 16) for x in BROADCAST_MAC.split(':')]),
+            bytes([int(x, 16) for x in self.src_mac.split(':')]),
+            PING_PACKET)
+        self.send(command.actual_command)
+        time.sleep(discover_time)
+        with self._lock:
+            self._discovering = False
+
+    def send(self, data):
+        if self._send_method:
+            self._send_method(data)
+            return
+        if isinstance(self._sniffer, RawSocketSniffer) and self._sniffer.running:
+            self._sniffer.send(data)
+            return
+        self._l2_sender.send(data, self.iface)
+
+    def handle_recive_packet(self, packet):
+        self.handle_raw_frame(bytes(packet))
+
+    def handle_raw_frame(self, frame):
+        '''
+        Put the 0x5555 packet of an ethernet frame to the unit of its source
+        mac, frame could be bytes or a memoryview from the raw socket
+        '''
+        unit = self._units_by_mac.get(bytes(frame[6:12]))
+        if unit is not None:
+            unit.put_frame(frame[14:])
+            return
+
+        if self._discovering and bytes(frame[16:18]) == PING_PACKET \
+                and bytes(frame[12:14]) != b'\x00\x00':
+            self._add_unit(frame)
+            return
+
+        self.unknown_count += 1
+
+    def _add_unit(self, frame):
+        mac_bytes = bytes(frame[6:12])
+        with self._lock:
+            if mac_bytes in self._units_by_mac:
+                return
+            unit = EthernetUnit(self, mac_to_str(mac_bytes))
+            self.units[unit.device_key] = unit
+            self._units_by_mac[mac_bytes] = unit
+
+    def get_unit(self, mac):
+        return self.units.get(mac.lower())
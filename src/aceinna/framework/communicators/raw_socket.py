@@ -0,0 +1,149 @@
+"""
+Linux AF_PACKET receiver for the 100base-t1 communicator
+"""
+import ctypes
+import socket
+import struct
+import threading
+
+ETH_P_ALL = 0x0003
+SO_ATTACH_FILTER = 26
+
+# classic BPF opcodes, see linux/filter.h
+BPF_LD_W_ABS = 0x20
+BPF_LD_H_ABS = 0x28
+BPF_JEQ_K = 0x15
+BPF_RET_K = 0x06
+
+BPF_ACCEPT_LENGTH = 0x40000
+
+MAX_FRAME_SIZE = 0x10000
+DEFAULT_CHUNK_SIZE = 0x100000
+
+
+def mac_to_bytes(mac):
+    return bytes([int(x, 16) for x in mac.split(':')])
+
+
+def mac_to_str(mac_bytes):
+    return ':'.join('{0:02x}'.format(x) for x in bytes(mac_bytes))
+
+
+def build_src_mac_filter(mac_list):
+    '''
+    Build a classic BPF program that accepts the frames sent from one of the
+    mac addresses, as `ether src host A or B` does in tcpdump.
+    Return a list of (code, jt, jf, k).
+    '''
+    instructions = []
+    mac_count = len(mac_list)
+    for i, mac in enumerate(mac_list):
+        mac_bytes = mac_to_bytes(mac) if isinstance(mac, str) else bytes(mac)
+        high = struct.unpack('>H', mac_bytes[0:2])[0]
+        low = struct.unpack('>I', mac_bytes[2:6])[0]
+        # instructions left after the 4 of this mac, before the 2 returns
+        left = (mac_count - i - 1) * 4
+        instructions.append((BPF_LD_W_ABS, 0, 0, 8))
+        instructions.append((BPF_JEQ_K, 0, 2, low))
+        instructions.append((BPF_LD_H_ABS, 0, 0, 6))
+        instructions.append((BPF_JEQ_K, left + 1, 0, high))
+
+    instructions.append((BPF_RET_K, 0, 0, 0))
+    instructions.append((BPF_RET_K, 0, 0, BPF_ACCEPT_LENGTH))
+    return instructions
+
+
+def attach_filter(sock, instructions):
+    '''
+    Attach the BPF program to socket. The returned buffer must be kept
+    alive as long as the socket.
+    '''
+    program = b''.join(struct.pack('HBBI', *item) for item in instructions)
+    program_buffer = ctypes.create_string_buffer(program)
+    fprog = struct.pack('HL', len(instructions),
+                        ctypes.addressof(program_buffer))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+    return program_buffer
+
+
+def _create_socket(iface):
+    sock = socket.socket(
+        socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+    sock.bind((iface, ETH_P_ALL))
+    return sock
+
+
+class RawSocketSniffer(object):
+    '''
+    Receive ethernet frames from AF_PACKET socket in a thread, and pass each
+    frame to prn as a memoryview. Frames are received into large chunks, so
+    there is no copy after the kernel, and the frames of a chunk stay valid
+    until they are released. It has the start/stop/running interface of
+    scapy AsyncSniffer.
+    '''
+
+    def __init__(self, iface, prn, src_macs=None,
+                 socket_factory=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.iface = iface
+        self.prn = prn
+        self.src_macs = src_macs or []
+        self.received_count = 0
+        self._socket_factory = socket_factory or _create_socket
+        self._chunk_size = max(chunk_size, MAX_FRAME_SIZE)
+        self._socket = None
+        self._filter_buffer = None
+        self._thread = None
+        self._running = False
+
+    @property
+    def running(self):
+        return self._running
+
+    def start(self):
+        self._socket = self._socket_factory(self.iface)
+        if self.src_macs:
+            self._filter_buffer = attach_filter(
+                self._socket, build_src_mac_filter(self.src_macs))
+        self._socket.settimeout(0.1)
+
+        self._running = True
+        self._thread = threading.Thread(target=self._receive)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, join=True):
+        self._running = False
+        if join and self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        if self._socket:
+            self._socket.close()
+            self._socket = None
+
+    def send(self, data):
+        self._socket.send(data)
+
+    def _receive(self):
+        chunk = memoryview(bytearray(self._chunk_size))
+        offset = 0
+        while self._running:
+            if self._chunk_size - offset < MAX_FRAME_SIZE:
+                chunk = memoryview(bytearray(self._chunk_size))
+                offset = 0
+
+            try:
+                size = self._socket.recv_into(
+                    chunk[offset:], MAX_FRAME_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                if not self._running:
+                    return
+                raise
+
+            if size == 0:
+                continue
+
+            frame = chunk[offset:offset + size]
+            offset += size
+            self.received_count += 1
+            self.prn(frame)
@@ -0,0 +1,363 @@
+import time
+import json
+import struct
+import threading
+import collections
+from ..constants import INTERFACES
+from ..context import APP_CONTEXT
+from ..utils import crc
+from ..utils.print import print_red
+from ..communicator import Communicator
+from ...devices.parsers.ins401_log_index import (FrameIndex, NO_TIME)
+from ...devices.parsers.ins401_log_decoder import (
+    iter_frames, PAYLOAD_INDEX, CRC_LENGTH)
+
+ETHERNET_HEADER_LENGTH = 14
+DEFAULT_UART_BAUDRATE = 460800
+# bytes of a UART character, with start and stop bits
+UART_BITS_PER_BYTE = 10
+REPLAY_MAC = '04:00:00:00:00:04'
+REPLAY_SPEED_MAX = 'max'
+# bytes read from the start of file to tell an ethernet log from UART
+PROBE_SIZE = 1024 * 1024
+
+# answers of the commands sent while connecting, used when no profile given
+DEFAULT_ETHERNET_PROFILE = {
+    'device_type': 'INS401',
+    'responses': {
+        '01,cc': 'INS401 5020-4007-01 2179000000 Hardware v2.0 RTK_INS App v28.05 '
+                 'Bootloader v01.02 IMU330NL FW v27.00.05 STA9100 FW v5.10.17'
+    }
+}
+
+DEFAULT_UART_PROFILE = {
+    'device_type': 'RTKL',
+    'responses': {
+        'pG': 'RTK330L 5020-3021-01 2178000000',
+        'gV': 'RTK_INS App v24.01.01',
+        'gA': []
+    }
+}
+
+
+def load_profile(path, default_profile):
+    '''
+    Load the device profile of replay. responses maps packet type, as
+    "01,cc" for ethernet or "pG" for UART, to the payload of response, a
+    string or a list of byte values. The commands not in responses are
+    answered with an empty payload.
+    '''
+    if not path:
+        return default_profile
+    with open(path) as json_data:
+        profile = json.load(json_data)
+    profile.setdefault('device_type', default_profile['device_type'])
+    profile.setdefault('responses', {})
+    return profile
+
+
+def _encode_payload(value):
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return bytes(value)
+
+
+class ReplayBase(Communicator):
+    '''
+    Communicator serves a recorded log as if it is received from a device.
+    Data is paced by speed: 1 is real time, N is N times faster, 0 ('max' in
+    options) is as fast as possible. The commands written are answered from a device profile,
+    the answers are read before the recorded data. The recorded data is held
+    until start_replay is called, after the provider is set up and has
+    opened its logs.
+    '''
+
+    def __init__(self, options=None):
+        super(ReplayBase, self).__init__()
+        self.file_path = options.replay_file if options else None
+        self.speed = 1
+        if options and options.replay_speed:
+            self.speed = 0 if options.replay_speed == REPLAY_SPEED_MAX \
+                else float(options.replay_speed)
+        self.profile_path = options.replay_profile if options else None
+        self.filter_device_type = None
+        self.upgrading_flag = False
+        self.finished = False
+        self.replayed_size = 0
+        self._responses = collections.deque()
+        self._lock = threading.Lock()
+        # notified when a response is put
+        self._condition = threading.Condition(self._lock)
+        self._start_time = None
+        self._replaying = False
+
+    def find_device(self, callback, retries=0, not_found_handler=None):
+        self.device = None
+        self.reset_buffer()
+        self.confirm_device(self, self.filter_device_type)
+        if self.device:
+            callback(self.device)
+        elif not_found_handler:
+            not_found_handler()
+        else:
+            print_red('Cannot confirm the device of replay file {0}'.format(
+                self.file_path))
+
+    def start_replay(self):
+        '''
+        Serve the recorded data from now on
+        '''
+        with self._condition:
+            self._replaying = True
+            self._condition.notify_all()
+
+    def can_write(self):
+        return True
+
+    def reset_buffer(self):
+        with self._lock:
+            self._responses.clear()
+
+    def upgrade(self):
+        self.upgrading_flag = True
+
+    def restart(self):
+        '''
+        Replay from the beginning of file
+        '''
+        with self._lock:
+            self._start_time = None
+            self.finished = False
+            self.replayed_size = 0
+            self._rewind()
+
+    def _get_device_type(self, options):
+        if options and options.device_type not in [None, 'auto']:
+            return options.device_type
+        return self.profile['device_type']
+
+    def _get_response(self, packet_type):
+        value = self.profile['responses'].get(packet_type)
+        if value is None:
+            return None
+        return _encode_payload(value)
+
+    def _put_response(self, response):
+        with self._condition:
+            self._responses.append(response)
+            self._condition.notify_all()
+
+    def _take_responses(self, max_count=None):
+        with self._lock:
+            if max_count is None or max_count >= len(self._responses):
+                responses = list(self._responses)
+                self._responses.clear()
+            else:
+                responses = [self._responses.popleft() for _ in range(max_count)]
+        return responses
+
+    def _elapsed(self, now):
+        if self._start_time is None:
+            self._start_time = now
+        return (now - self._start_time) * self.speed
+
+    def _rewind(self):
+        pass
+
+
+class EthernetReplay(ReplayBase):
+    '''
+    Replay the 0x5555 frames of a user_*.bin recorded from 100base-t1. Frames
+    are paced by the GPS time in them.
+    '''
+
+    def __init__(self, options=None, index=None):
+        super(EthernetReplay, self).__init__(options)
+        self.type = INTERFACES.ETH_100BASE_T1
+        self.src_mac = REPLAY_MAC
+        self.dst_mac = REPLAY_MAC
+        self.use_length_as_protocol = True
+        self.config_unit_sn = None
+        self.profile = load_profile(self.profile_path, DEFAULT_ETHERNET_PROFILE)
+        self.filter_device_type = self._get_device_type(options)
+        self._index = index or FrameIndex(self.file_path)
+        self._offsets = self._index.offsets.tolist()
+        # ms since the first frame, frames without time follow the last one
+        time_keys = self._index.time_keys
+        timed = time_keys[time_keys != NO_TIME]
+        first_time = int(timed[0]) if len(timed) else 0
+        self._frame_times = []
+        last_time = 0
+        for time_key in time_keys.tolist():
+            if time_key != NO_TIME:
+                last_time = max(time_key - first_time, last_time)
+            self._frame_times.append(last_time)
+        self._position = 0
+
+    def close(self):
+        self._index.close()
+
+    def write(self, data, is_flush=False):
+        '''
+        Answer the command, data is an ethernet frame
+        '''
+        data = bytes(data)
+        packet_type = data[ETHERNET_HEADER_LENGTH + 2:ETHERNET_HEADER_LENGTH + 4]
+        name = '{0:02x},{1:02x}'.format(*packet_type)
+        payload = self._get_response(name)
+        if payload is None:
+            # acknowledge the commands not in profile with an empty payload
+            payload = b''
+        body = packet_type + struct.pack('<I', len(payload)) + payload
+        self._put_response(b'UU' + body + crc.crc16_bytes(body))
+
+    def read(self, size=100, timeout=0):
+        frames = self.read_batch(1, timeout)
+        return frames[0] if frames else None
+
+    def read_batch(self, max_frames=1000, timeout=0):
+        '''
+        Read the responses and the recorded frames due, wait up to timeout
+        seconds for a response or the time of next frame if none
+        '''
+        deadline = time.time() + timeout
+        while True:
+            frames = self._read_frames(max_frames)
+            wait = deadline - time.time()
+            if frames or wait <= 0:
+                return frames
+            with self._condition:
+                if not self._responses:
+                    self._condition.wait(min(wait, self._next_frame_wait()))
+
+    def _next_frame_wait(self):
+        '''
+        Seconds to the time of next frame, called with the lock held
+        '''
+        if not self._replaying or self.upgrading_flag or self.finished:
+            return float('inf')
+        if self.speed == 0 or self._position >= len(self._frame_times):
+            return 0
+        elapsed = self._elapsed(time.time()) * 1000
+        return max(self._frame_times[self._position] - elapsed, 0) / 1000 / self.speed
+
+    def _read_frames(self, max_frames):
+        frames = self._take_responses(max_frames)
+        if not self._replaying or self.upgrading_flag or self.finished:
+            return frames
+
+        with self._lock:
+            elapsed = self._elapsed(time.time()) * 1000
+            offsets = self._offsets
+            frame_times = self._frame_times
+            position = self._position
+            end = min(position + max_frames - len(frames), len(offsets))
+            while position < end and \
+                    (self.speed == 0 or frame_times[position] <= elapsed):
+                frame = bytes(self._index.get_frame(offsets[position]))
+                frames.append(frame)
+                self.replayed_size += len(frame)
+                position += 1
+            self._position = position
+            if position == len(offsets):
+                self.finished = True
+        return frames
+
+    def get_src_mac(self):
+        return bytes([int(x, 16) for x in self.src_mac.split(':')])
+
+    def get_dst_mac(self):
+        return bytes([int(x, 16) for x in self.dst_mac.split(':')])
+
+    def _rewind(self):
+        self._position = 0
+
+
+class UartReplay(ReplayBase):
+    '''
+    Replay a capture of UART, the bytes are paced by the baudrate
+    '''
+
+    def __init__(self, options=None):
+        super(UartReplay, self).__init__(options)
+        self.type = INTERFACES.UART
+        self.serial_port = None
+        self.baudrate = DEFAULT_UART_BAUDRATE
+        if options and options.baudrate not in [None, 'auto']:
+            self.baudrate = int(options.baudrate)
+        self.profile = load_profile(self.profile_path, DEFAULT_UART_PROFILE)
+        self.filter_device_type = self._get_device_type(options)
+        with open(self.file_path, 'rb') as capture:
+            self._data = capture.read()
+        self._position = 0
+
+    def write(self, data, is_flush=False):
+        '''
+        Answer the command, data is a 0x5555 UART packet
+        '''
+        data = bytes(data)
+        if data[0:2] != b'UU' or len(data) < 5:
+            return
+        packet_type = data[2:4]
+        payload = self._get_response(packet_type.decode('latin-1'))
+        if payload is None:
+            payload = b''
+        body = packet_type + bytes([len(payload)]) + payload
+        self._put_response(b'UU' + body + crc.crc16_bytes(body))
+
+    def read(self, size=100):
+        responses = self._take_responses()
+        if responses:
+            return b''.join(responses)
+        if not self._replaying or self.upgrading_flag or self.finished:
+            return b''
+
+        with self._lock:
+            position = self._position
+            end = min(position + size, len(self._data))
+            if self.speed != 0:
+                elapsed_bytes = int(self._elapsed(time.time()) *
+                                    self.baudrate / UART_BITS_PER_BYTE)
+                end = min(end, elapsed_bytes)
+            if end <= position:
+                return b''
+            data = self._data[position:end]
+            self._position = end
+            self.replayed_size += len(data)
+            if end == len(self._data):
+                self.finished = True
+        return data
+
+    def _rewind(self):
+        self._position = 0
+
+
+def create_replay(options):
+    '''
+    Create the replay communicator of the file. A file made of the ethernet
+    frames is replayed as 100base-t1, others as UART.
+    '''
+    if not options or not options.replay_file:
+        raise ValueError('Parameter replay file should have a value')
+
+    if is_ethernet_log(options.replay_file):
+        index = FrameIndex(options.replay_file)
+        APP_CONTEXT.get_logger().logger.info(
+            'Replay {0} ethernet frames of {1}'.format(
+                index.count(), options.replay_file))
+        return EthernetReplay(options, index)
+
+    return UartReplay(options)
+
+
+def is_ethernet_log(path):
+    '''
+    Probe the start of file, headers in UART data may pass the crc by
+    chance, but the ethernet frames should cover the most of an ethernet log
+    '''
+    with open(path, 'rb') as log_file:
+        data = log_file.read(PROBE_SIZE)
+    frame_size = 0
+    for _, _, payload_len in iter_frames(data):
+        frame_size += PAYLOAD_INDEX + payload_len + CRC_LENGTH
+    return frame_size > 0 and frame_size * 2 >= len(data)
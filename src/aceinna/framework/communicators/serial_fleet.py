@@ -0,0 +1,48 @@
+"""
+Drive many devices on several serial ports, one port per device
+"""
+import copy
+from .serialport import SerialPort
+
+
+def parse_com_ports(com_port):
+    '''
+    Ports of the option, as "COM3,COM4" or "/dev/ttyUSB0,/dev/ttyUSB1"
+    '''
+    if not com_port or com_port == 'auto':
+        return []
+    return [port.strip() for port in com_port.split(',') if port.strip()]
+
+
+class SerialFleet(object):
+    '''
+    The devices on the serial ports of --com-port. Each port is a unit with
+    its own SerialPort communicator, the port is the key of device.
+    '''
+
+    def __init__(self, options=None):
+        self._options = options
+        self.units = {}
+
+    def discover(self):
+        '''
+        Create the communicator of each port, the device on it is found by
+        find_device of the unit
+        '''
+        ports = parse_com_ports(self._options and self._options.com_port)
+        for port in ports:
+            if port in self.units:
+                continue
+            options = copy.copy(self._options)
+            options.com_port = port
+            unit = SerialPort(options)
+            unit.device_key = port
+            self.units[port] = unit
+        return list(self.units.values())
+
+    def get_unit(self, port):
+        return self.units.get(port)
+
+    def close(self):
+        for unit in self.units.values():
+            unit.close()
@@ -17,5 +17,6 @@ class INTERFACES(object):
     ETH_100BASE_T1 = '100base-t1'
     BOARD = 'beidou'
     CANFD = 'canfd'
+    REPLAY = 'replay'
     def list():
-        return [INTERFACES.UART, INTERFACES.ETH_100BASE_T1, INTERFACES.CANFD]
+        return [INTERFACES.UART, INTERFACES.ETH_100BASE_T1, INTERFACES.CANFD, INTERFACES.REPLAY]
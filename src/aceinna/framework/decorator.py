@@ -9,6 +9,8 @@ from typing import TypeVar
 from .constants import (DEVICE_TYPES, BAUDRATE_LIST, INTERFACES)
 from .utils.print import print_red
 from .utils.resource import is_dev_mode
+from .utils.ring_buffer import OVERFLOW_POLICIES
+from . import log_writer
 
 
 T = TypeVar('T')
@@ -17,6 +19,9 @@ INTERFACE_LIST = INTERFACES.list()
 MODES = ['default', 'cli', 'receiver']
 TYPES_OF_LOG = ['rtkl', 'rtk350la', 'ins401', 'beidou', 'ins401c', 'ins402', 'ins502']
 KML_RATES = [1, 2, 5, 10]
+ETH_BACKENDS = ['scapy', 'raw_socket']
+DATA_LOG_FORMATS = ['csv', 'npy']
+PARSE_BACKENDS = ['auto', 'native', 'python']
 
 def _uppercase_string(s):
     return s.upper()
@@ -37,7 +42,7 @@ def _build_args():
     parser.add_argument("-b", "--baudrate", dest="baudrate", type=int, metavar='',
                         help="Baudrate for uart. Allowed one of values: {0}".format(BAUDRATE_LIST), choices=BAUDRATE_LIST)
     parser.add_argument("-c", "--com-port", dest="com_port", metavar='', type=str,
-                        help="COM Port")
+                        help="COM Port, several ports separated by comma with --fleet")
     parser.add_argument("-s", "--set-user-para", dest='set_user_para', action='store_true',
                         help="Set user parameters", default=False)
     parser.add_argument("--para-path", dest="para_path", type=str,
@@ -52,6 +57,36 @@ def _build_args():
                         help="The mac address for listen device data")
     parser.add_argument("-sn", dest='unit_sn', metavar='', type=str,
                         help="set the unit serial number")
+    parser.add_argument("--command-window", dest='command_window', metavar='', type=int,
+                        help="Max number of commands waiting for response at the same time", default=1)
+    parser.add_argument("--upgrade-window", dest='upgrade_window', metavar='', type=int,
+                        help="Max number of firmware blocks waiting for ack at the same time when upgrading", default=1)
+    parser.add_argument("--fleet", dest='fleet', action='store_true',
+                        help="Drive all the devices found on the 100base-t1 network card, or on the ports of --com-port with uart", default=False)
+    parser.add_argument("--upgrade-concurrency", dest='upgrade_concurrency', metavar='', type=int,
+                        help="Max number of devices upgraded at the same time with --fleet", default=4)
+    parser.add_argument("--rtcm-packet-size", dest='rtcm_packet_size', metavar='', type=int,
+                        help="Max bytes of RTCM messages written to device at once, 1 writes each message alone", default=1400)
+    parser.add_argument("--rtcm-latency", dest='rtcm_latency', metavar='', type=str,
+                        help="Max time(ms) a RTCM message waits to be written with the following messages, 0 writes each message at once", default='20')
+    parser.add_argument("--eth-backend", dest='eth_backend', metavar='', type=str,
+                        help="Receiver of 100base-t1. Allowed one of values: {0}".format(ETH_BACKENDS), default='scapy', choices=ETH_BACKENDS)
+    parser.add_argument("--eth-buffer-size", dest='eth_buffer_size', metavar='', type=int,
+                        help="Max number of 100base-t1 packets buffered before reading", default=20000)
+    parser.add_argument("--eth-overflow", dest='eth_overflow', metavar='', type=str,
+                        help="What to do when the 100base-t1 buffer is full. Allowed one of values: {0}".format(OVERFLOW_POLICIES), default='drop_oldest', choices=OVERFLOW_POLICIES)
+    parser.add_argument("--log-rotate-size", dest='log_rotate_size', metavar='', type=int,
+                        help="Start a new log file when the file reaches the size(MB), 0 means never", default=0)
+    parser.add_argument("--log-rotate-interval", dest='log_rotate_interval', metavar='', type=int,
+                        help="Start a new log file every interval(minutes), 0 means never", default=0)
+    parser.add_argument("--file", dest='replay_file', metavar='', type=str,
+                        help="The recorded log to replay, when the interface is replay")
+    parser.add_argument("--replay-speed", dest='replay_speed', metavar='', type=str,
+                        help="Speed of replay, 1 is real time, N is N times faster, max is as fast as possible", default='1')
+    parser.add_argument("--replay-profile", dest='replay_profile', metavar='', type=str,
+                        help="Json file of the device info and command answers used by replay")
+    parser.add_argument("--data-log-format", dest='data_log_format', metavar='', type=str,
+                        help="File format of the decoded output packets. Allowed one of values: {0}".format(DATA_LOG_FORMATS), default='csv', choices=DATA_LOG_FORMATS)
     '''
     parser.add_argument("-board", dest='board', metavar='', type=str,
                         help="RTK330LA beidou")
@@ -70,6 +105,11 @@ def _build_args():
         "-i", type=int, help="Ins kml rate(hz). Allowed one of values: {0}".format(KML_RATES), default=1, metavar='', dest="kml_rate", choices=KML_RATES)
     parse_log_action.add_argument(
         "-d", type=str, help="", default='false', dest="powerdr", choices=['false', 'true'])
+    parse_log_action.add_argument(
+        "--backend", type=str, help="Decoder of logs, auto uses the native lib if it exists. Allowed one of values: {0}".format(PARSE_BACKENDS),
+        default='auto', metavar='', dest="backend", choices=PARSE_BACKENDS)
+    parse_log_action.add_argument(
+        "-w", "--workers", type=int, help="Count of parse processes, 0 is the count of cpu", default=0, metavar='', dest="workers")
 
     return parser.parse_args()
 
@@ -97,6 +137,7 @@ def handle_application_exception(func):
         except KeyboardInterrupt:  # response for KeyboardInterrupt such as Ctrl+C
             print('User stop this program by KeyboardInterrupt! File:[{0}], Line:[{1}]'.format(
                 __file__, sys._getframe().f_lineno))
+            log_writer.close_all()
             os.kill(os.getpid(), signal.SIGTERM)
             sys.exit()
         except Exception as ex:  # pylint: disable=bare-except
@@ -5,6 +5,8 @@ import time
 import datetime
 import json
 import threading
+import functools
+from operator import itemgetter
 import requests
 from azure.storage.blob import AppendBlobService
 from azure.storage.blob import ContentSettings
@@ -12,6 +14,118 @@ from .utils import resource
 from .configuration import get_config
 from .ans_platform_api import AnsPlatformAPI
 from .context import APP_CONTEXT
+from . import log_writer
+
+
+INTEGER_TYPES = ['uint32', 'int32', 'uint16', 'int16', 'uint64', 'int64']
+CHAR_TYPES = ['uchar', 'char', 'string']
+
+# rows are kept in memory until the size or the interval is reached
+ROW_BUFFER_SIZE = 0x10000
+ROW_FLUSH_INTERVAL = 1
+
+
+def _get_value_format(field):
+    field_type = field['type']
+    if field.__contains__('scaling') or field_type in INTEGER_TYPES:
+        return '{}'
+    if field_type == 'double':
+        return '{:0.8f}'  # 15.12
+    if field_type == 'float':
+        return '{:0.4f}'  # 12.8
+    if field_type == 'uint8':
+        return '{:d}'
+    if field_type in CHAR_TYPES:
+        return '{:}'
+    return '{:3.5f}'
+
+
+def _get_label(field):
+    if field['unit'] == '':
+        return '{0:s}'.format(field['name'])
+    return '{0:s} ({1:s})'.format(field['name'], field['unit'])
+
+
+class CsvRowWriter(object):
+    ''' Format the rows of an output packet with the template built from
+        the types of payload, and pass the buffered rows to write_rows when
+        ROW_BUFFER_SIZE or ROW_FLUSH_INTERVAL is reached. flush_if_due is
+        called periodically, so the rows of a stopped stream are written too.
+    '''
+
+    def __init__(self, output_packet, write_rows):
+        fields = output_packet['payload']
+        self.fields = fields
+        self.names = [field['name'] for field in fields]
+        self.template = ','.join(
+            _get_value_format(field) for field in fields) + '\n'
+        self._value_formats = dict(
+            (field['name'], _get_value_format(field)) for field in fields)
+        self._get_values = itemgetter(*self.names) if len(self.names) > 1 \
+            else lambda data: (data[self.names[0]],)
+        self._write_rows = write_rows
+        self._rows = []
+        self._size = 0
+        self._has_header = False
+        self._last_flush_time = time.time()
+        self._lock = threading.Lock()
+
+    def format_row(self, data):
+        try:
+            return self.template.format(*self._get_values(data))
+        except KeyError:
+            # keep the fields of configuration that are in data
+            return ','.join(
+                self._value_formats[k].format(v) for k, v in data.items()
+                if k in self._value_formats) + '\n'
+
+    def format_header(self, data):
+        return ','.join(
+            _get_label(field) for field in self.fields
+            if field['name'] in data) + '\n'
+
+    def append(self, data):
+        with self._lock:
+            if not self._has_header:
+                self._add(self.format_header(data))
+                self._has_header = True
+            self._add(self.format_row(data))
+
+    def append_many(self, items):
+        if not items:
+            return
+        with self._lock:
+            if not self._has_header:
+                self._add(self.format_header(items[0]))
+                self._has_header = True
+            self._add(''.join(self.format_row(data) for data in items))
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def flush_if_due(self, now=None):
+        if now is None:
+            now = time.time()
+        with self._lock:
+            if now - self._last_flush_time >= ROW_FLUSH_INTERVAL:
+                self._flush()
+
+    def _flush(self):
+        if not self._rows:
+            return
+        text = ''.join(self._rows)
+        self._rows = []
+        self._size = 0
+        self._last_flush_time = time.time()
+        self._write_rows(text)
+
+    def _add(self, text):
+        self._rows.append(text)
+        self._size += len(text)
+        if self._size >= ROW_BUFFER_SIZE or \
+                time.time() - self._last_flush_time >= ROW_FLUSH_INTERVAL:
+            self._flush()
 
 
 class FileLoger():
@@ -32,6 +146,7 @@ class FileLoger():
         self.log_file_names = {}
         self.log_files_obj = {}
         self.log_files = {}
+        self._row_writers = {}
         self.user_file_name = ''  # the prefix of log file name.
         self.msgs_need_to_log = []
         self.ws = False
@@ -95,6 +210,9 @@ class FileLoger():
 
                 self.log_files_obj[packet['name']] = open(
                     current_path + '/' + self.log_file_names[packet['name']], 'w')
+                self._row_writers[packet['name']] = CsvRowWriter(
+                    packet, functools.partial(self._write_rows, packet['name']))
+            log_writer.add_periodic_task(self._flush_rows)
 
             if self.ws:
                 self.get_sas_token()
@@ -121,8 +239,12 @@ class FileLoger():
         try:
             if len(self.log_file_rows) == 0:
                 return 1  # driver hasn't started logging files yet.
+            log_writer.remove_periodic_task(self._flush_rows)
+            for row_writer in self._row_writers.values():
+                row_writer.flush()
             for i, (k, v) in enumerate(self.log_files_obj.items()):
                 v.close()
+            self._row_writers.clear()
             self.log_file_rows.clear()
             self.log_file_names.clear()
             self.log_files_obj.clear()
@@ -243,6 +365,16 @@ class FileLoger():
         if packet_type in self.msgs_need_to_log:
             self.log(packet_type, packet)
 
+    def append_many(self, packet_type, packets):
+        ''' Log the items of a list packet
+        '''
+        if len(self.log_file_rows) == 0:  # if hasn't started logging.
+            return
+
+        if packet_type in self.msgs_need_to_log:
+            self._row_writers[packet_type].append_many(packets)
+            self.log_file_rows[packet_type] += len(packets)
+
     def get_log_file_names(self):
         return self.log_file_names.copy()
 
@@ -251,75 +383,22 @@ class FileLoger():
             the json properties file to create a header and specify the precision
             of the data in the resulting data file.
         '''
-        output_packet = next(
-            (x for x in self.output_packets if x['name'] == packet_type), None)
-
-        fields = [field['name'] for field in output_packet['payload']]
-        '''Write row of CSV file based on data received.  Uses dictionary keys for column titles
-        '''
-        if self.log_file_rows[packet_type] == 0:
-            # Loop through each item in the data dictionary and create a header from the json
-            #   properties that correspond to the items in the dictionary
-            labels = ''
-            # for key in data:
-            for i, (k, v) in enumerate(data.items()):
-                '''dataStr = output_packet['payload'][i]['name'] + \
-                          ' [' + \
-                          output_packet['payload'][i]['unit'] + \
-                          ']'''
-                if not fields.__contains__(k):
-                    continue
-                data_str = output_packet['payload'][i]['name']
-                unit_str = output_packet['payload'][i]['unit']
-                if unit_str == '':
-                    labels = labels + '{0:s},'.format(data_str)
-                else:
-                    labels = labels + \
-                        '{0:s} ({1:s}),'.format(data_str, unit_str)
-
-            # Remove the comma at the end of the string and append a new-line character
-            labels = labels[:-1]
-            header = labels + '\n'
-        else:
-            header = ''
-
+        self._row_writers[packet_type].append(data)
         self.log_file_rows[packet_type] += 1
 
-        # Loop through the items in the data dictionary and append to an output string
-        #   (with precision based on the data type defined in the json properties file)
-        write_str = ''
-        for i, (k, v) in enumerate(data.items()):
-            if not fields.__contains__(k):
-                continue
-            output_packet_type = output_packet['payload'][i]['type']
-
-            if output_packet['payload'][i].__contains__('scaling'):
-                write_str += '{0},'.format(v)
+    def _flush_rows(self, closing):
+        ''' Write the rows kept longer than ROW_FLUSH_INTERVAL, or all rows
+            when closing. Called by the log writer service.
+        '''
+        for row_writer in list(self._row_writers.values()):
+            if closing:
+                row_writer.flush()
             else:
-                if output_packet_type == 'uint32' or output_packet_type == 'int32' or \
-                        output_packet_type == 'uint16' or output_packet_type == 'int16' or \
-                        output_packet_type == 'uint64' or output_packet_type == 'int64':
-                    # integers and unsigned integers
-                    write_str += '{0},'.format(v)
-                elif output_packet_type == 'double':
-                    # double
-                    write_str += '{0:0.8f},'.format(v)  # 15.12
-                elif output_packet_type == 'float':
-                    write_str += '{0:0.4f},'.format(v)  # 12.8
-                elif output_packet_type == 'uint8':
-                    # byte
-                    write_str += '{0:d},'.format(v)
-                elif output_packet_type == 'uchar' or output_packet_type == 'char' or output_packet_type == 'string':
-                    # character
-                    write_str += '{:},'.format(v)
-                else:
-                    # unknown
-                    write_str += '{0:3.5f},'.format(v)
-        #
-        write_str = header + write_str[:-1] + '\n'
+                row_writer.flush_if_due()
 
+    def _write_rows(self, packet_type, text):
         try:
-            self.log_files_obj[packet_type].write(write_str)
+            self.log_files_obj[packet_type].write(text)
             self.log_files_obj[packet_type].flush()
         except ValueError:
             APP_CONTEXT.get_logger().logger.error(
@@ -330,7 +409,7 @@ class FileLoger():
         if self.ws:
             self.data_lock.acquire()
             self.data_dict[self.log_files[packet_type]
-                           ] = self.data_dict[self.log_files[packet_type]] + write_str
+                           ] = self.data_dict[self.log_files[packet_type]] + text
             self.data_lock.release()
 
     def set_info(self, info):
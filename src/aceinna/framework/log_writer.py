@@ -0,0 +1,308 @@
+"""
+Binary log files written by a background thread
+"""
+import os
+import time
+import atexit
+import threading
+from .context import APP_CONTEXT
+
+DEFAULT_BUFFER_SIZE = 0x100000
+DEFAULT_FLUSH_INTERVAL = 1
+# data queued beyond it is dropped while the disk cannot be written
+DEFAULT_MAX_PENDING_SIZE = 64 * DEFAULT_BUFFER_SIZE
+
+
+def _rotated_path(path, index):
+    if index == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return '{0}_{1:03d}{2}'.format(root, index, ext)
+
+
+class BinaryLogWriter(object):
+    '''
+    A file like object for the binary logs. write() only queues the data,
+    the writer thread joins the queued data into large blocks and writes
+    them when buffer_size is reached or every flush_interval seconds.
+    If rotate_size (bytes) or rotate_interval (seconds) is set, the file is
+    closed with fsync and a new one named path_001, path_002... is opened.
+    A failed write is reported to the logger and the data is dropped, at
+    most max_pending_size bytes are queued while writes keep failing.
+    '''
+
+    def __init__(self, service, path, buffer_size=DEFAULT_BUFFER_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 rotate_size=0, rotate_interval=0,
+                 max_pending_size=DEFAULT_MAX_PENDING_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.max_pending_size = max(max_pending_size, buffer_size)
+        self.written_size = 0
+        self.dropped_size = 0
+        self.last_error = None
+        self._service = service
+        self._pending = []
+        self._pending_size = 0
+        self._pending_lock = threading.Lock()
+        self._flush_requested = False
+        self._closed = False
+        self._file_index = 0
+        self._file_size = 0
+        self._file_open_time = time.monotonic()
+        self._last_flush_time = self._file_open_time
+        self._file = open(path, 'wb')
+
+    @property
+    def current_path(self):
+        return _rotated_path(self.path, self._file_index)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def write(self, data):
+        '''
+        Queue data, it never blocks for the disk
+        '''
+        if self._closed or not data:
+            return
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        with self._pending_lock:
+            if self._pending_size + len(data) > self.max_pending_size:
+                self.dropped_size += len(data)
+                return
+            self._pending.append(data)
+            self._pending_size += len(data)
+            is_full = self._pending_size >= self.buffer_size
+        if is_full:
+            self._service.wake_up()
+
+    def flush(self):
+        '''
+        Ask the writer thread to write the queued data soon
+        '''
+        self._flush_requested = True
+        self._service.wake_up()
+
+    def close(self):
+        self._service.close_writer(self)
+
+    def _is_due(self, now):
+        return self._flush_requested or \
+            self._pending_size >= self.buffer_size or \
+            now - self._last_flush_time >= self.flush_interval
+
+    def _take_pending(self):
+        with self._pending_lock:
+            chunks = self._pending
+            self._pending = []
+            self._pending_size = 0
+        return b''.join(chunks)
+
+    def _write_pending(self, now):
+        '''
+        Called in the writer thread
+        '''
+        self._flush_requested = False
+        self._last_flush_time = now
+        data = self._take_pending()
+        if not data:
+            return
+
+        try:
+            self._write_file(data, now)
+        except Exception as ex:  # pylint: disable=broad-except
+            self.dropped_size += len(data)
+            self._report_error(ex)
+            return
+        if self.last_error is not None:
+            APP_CONTEXT.get_print_logger().info(
+                'Log {0} is written again'.format(self.current_path))
+            self.last_error = None
+
+    def _write_file(self, data, now):
+        # the file is closed if a rotation failed to open the next one
+        if self._file.closed:
+            self._file = open(self.current_path, 'ab')
+
+        # rotate before writing, so there is no empty file at the end
+        if self._file_size and (
+                (self.rotate_size and self._file_size >= self.rotate_size) or
+                (self.rotate_interval and
+                 now - self._file_open_time >= self.rotate_interval)):
+            self._rotate(now)
+
+        self._file.write(data)
+        self._file.flush()
+        self._file_size += len(data)
+        self.written_size += len(data)
+
+    def _report_error(self, ex):
+        '''
+        Report the first error of a failure, the errors after it are the
+        same until a write succeeds
+        '''
+        if self.last_error is None:
+            APP_CONTEXT.get_print_logger().error(
+                'Fail to write log {0}: {1}'.format(self.current_path, ex))
+        self.last_error = str(ex)
+
+    def _sync_and_close_file(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def _rotate(self, now):
+        self._sync_and_close_file()
+        self._file_index += 1
+        self._file_size = 0
+        self._file_open_time = now
+        self._file = open(self.current_path, 'wb')
+
+    def _close(self):
+        '''
+        Called in the writer thread, or after the thread is stopped
+        '''
+        if self._closed:
+            return
+        self._write_pending(time.monotonic())
+        self._closed = True
+        try:
+            self._sync_and_close_file()
+        except Exception as ex:  # pylint: disable=broad-except
+            self._report_error(ex)
+        if self.dropped_size:
+            APP_CONTEXT.get_print_logger().error(
+                'Log {0} dropped {1} bytes'.format(self.path, self.dropped_size))
+
+
+class LogWriterService(object):
+    '''
+    Own the writer thread of all the opened BinaryLogWriter. The periodic
+    tasks are called as task(False) in the thread after the writers, at
+    least every DEFAULT_FLUSH_INTERVAL seconds, and as task(True) by
+    close_all, to write all that they keep.
+    '''
+
+    def __init__(self):
+        self._writers = []
+        self._tasks = []
+        self._lock = threading.Lock()
+        self._wake_up_event = threading.Event()
+        self._thread = None
+
+    def open(self, path, **kwargs):
+        writer = BinaryLogWriter(self, path, **kwargs)
+        with self._lock:
+            self._writers.append(writer)
+            self._start()
+        return writer
+
+    def add_periodic_task(self, task):
+        with self._lock:
+            if task not in self._tasks:
+                self._tasks.append(task)
+            self._start()
+
+    def remove_periodic_task(self, task):
+        '''
+        The task is not running when it returns
+        '''
+        with self._lock:
+            if task in self._tasks:
+                self._tasks.remove(task)
+
+    def wake_up(self):
+        self._wake_up_event.set()
+
+    def close_writer(self, writer):
+        with self._lock:
+            if writer in self._writers:
+                self._writers.remove(writer)
+            writer._close()
+
+    def close_all(self):
+        with self._lock:
+            self._run_tasks(True)
+            writers = self._writers
+            self._writers = []
+            for writer in writers:
+                try:
+                    writer._close()
+                except Exception as ex:  # pylint: disable=broad-except
+                    writer._report_error(ex)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                writers = list(self._writers)
+            timeout = min([writer.flush_interval for writer in writers] or
+                          [DEFAULT_FLUSH_INTERVAL])
+            self._wake_up_event.wait(timeout)
+            self._wake_up_event.clear()
+
+            now = time.monotonic()
+            with self._lock:
+                for writer in self._writers:
+                    # a failed writer must not stop the others
+                    try:
+                        if writer._is_due(now):
+                            writer._write_pending(now)
+                    except Exception as ex:  # pylint: disable=broad-except
+                        writer._report_error(ex)
+                self._run_tasks(False)
+
+    def _run_tasks(self, closing):
+        '''
+        Called with the lock held
+        '''
+        for task in self._tasks:
+            try:
+                task(closing)
+            except Exception as ex:  # pylint: disable=broad-except
+                APP_CONTEXT.get_print_logger().error(
+                    'Periodic task of log writer failed: {0}'.format(ex))
+
+
+_SERVICE = LogWriterService()
+
+
+def open_log(path, **kwargs):
+    '''
+    Open a binary log file written by the shared writer thread
+    '''
+    return _SERVICE.open(path, **kwargs)
+
+
+def add_periodic_task(task):
+    '''
+    Call task(closing) in the shared writer thread periodically, and with
+    closing set when the logs are closed
+    '''
+    _SERVICE.add_periodic_task(task)
+
+
+def remove_periodic_task(task):
+    _SERVICE.remove_periodic_task(task)
+
+
+def close_all():
+    '''
+    Write the queued data and close all the log files. It is called at exit,
+    the handler of a signal which kills the process should call it first.
+    '''
+    _SERVICE.close_all()
+
+
+atexit.register(close_all)
@@ -0,0 +1,68 @@
+"""
+CRC
+"""
+import binascii
+
+CRC16_INIT = 0x1D0F
+CRC16_POLY = 0x1021
+
+
+def _build_crc16_table():
+    table = []
+    for i in range(256):
+        crc = i << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ CRC16_POLY) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+        table.append(crc)
+    return tuple(table)
+
+
+CRC16_TABLE = _build_crc16_table()
+
+
+def _update_by_table(state, chunk):
+    table = CRC16_TABLE
+    for byte_data in chunk:
+        state = ((state << 8) & 0xFF00) ^ table[(state >> 8) ^ byte_data]
+    return state
+
+
+def update(state, chunk):
+    '''
+    Feed a chunk into a running CRC-CCITT state and return the new state.
+    bytes, bytearray and memoryview go through the C implementation in
+    binascii, other sequences of byte values fall back to the lookup table.
+    '''
+    if isinstance(chunk, (bytes, bytearray, memoryview)):
+        return binascii.crc_hqx(chunk, state)
+
+    try:
+        return binascii.crc_hqx(bytes(chunk), state)
+    except (TypeError, ValueError):
+        return _update_by_table(state, chunk)
+
+
+def crc16(data, state=CRC16_INIT):
+    '''
+    Calculates 16-bit CRC-CCITT FALSE as int
+    '''
+    return update(state, data)
+
+
+def crc16_bytes(data, state=CRC16_INIT):
+    '''
+    Calculates 16-bit CRC-CCITT FALSE as 2 bytes, msb first
+    '''
+    crc = update(state, data)
+    return bytes([(crc >> 8) & 0xFF, crc & 0xFF])
+
+
+def crc16_matches(data, expected):
+    '''
+    Check the CRC of data against the 2 bytes (msb first) that follow it
+    '''
+    crc = update(CRC16_INIT, data)
+    return ((crc >> 8) & 0xFF) == expected[0] and (crc & 0xFF) == expected[1]
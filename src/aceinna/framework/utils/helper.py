@@ -8,11 +8,7 @@ import time
 from .dict_extend import Dict
 from ..constants import INTERFACES
 from ..command import Command
-
-if sys.version_info[0] > 2:
-    from queue import Queue
-else:
-    from Queue import Queue
+from . import crc
 
 COMMAND_START = [0x55, 0x55]
 PACKET_FOUND_INIT_STATE = 0
@@ -248,20 +244,9 @@ def calc_crc(payload):
     '''
     Calculates 16-bit CRC-CCITT FALSE
     '''
-    crc = 0x1D0F
-    for bytedata in payload:
-        crc = crc ^ (bytedata << 8)
-        i = 0
-        while i < 8:
-            if crc & 0x8000:
-                crc = (crc << 1) ^ 0x1021
-            else:
-                crc = crc << 1
-            i += 1
-        crc = crc & 0xffff
-
-    crc_msb = ((crc >> 8) & 0xFF)
-    crc_lsb = (crc & 0xFF)
+    crc_value = crc.crc16(payload)
+    crc_msb = ((crc_value >> 8) & 0xFF)
+    crc_lsb = (crc_value & 0xFF)
     return [crc_msb, crc_lsb]
 
 def clear_elements(list_instance):
@@ -315,64 +300,27 @@ def _parse_buffer(data_buffer):
         'parsed_end_index': 0,
         'result': []
     }
-    data_queue = Queue()
-    data_queue.queue.extend(data_buffer)
+    data = bytes(data_buffer)
+    data_len = len(data)
+    start = data.find(b'UU')
 
-    command_start = [0x55, 0x55]
-    parsed_data = []
-    is_header_found = False
-    packet_type = ''
-    data_buffer_len = len(data_buffer)
-
-    while not data_queue.empty():
-        if is_header_found:
-            # if matched packet, is_header_found = False, parsed_data = []
-            if not data_queue.empty():
-                packet_type_start = data_queue.get()
-            else:
-                break
-
-            if not data_queue.empty():
-                packet_type_end = data_queue.get()
-            else:
-                break
-
-            if not data_queue.empty():
-                packet_len = data_queue.get()
-                packet_type = ''.join(
-                    ["%c" % x for x in [packet_type_start, packet_type_end]])
-                packet_data = []
-
-                if data_queue.qsize() >= packet_len:
-                    # take packet
-                    for _ in range(packet_len):
-                        packet_data.append(data_queue.get())
-                else:
-                    break
-                # update response
-                response['parsed'] = True
-                response['result'].append({
-                    'type': packet_type,
-                    'data': packet_data
-                })
-                response['parsed_end_index'] += data_buffer_len - \
-                    data_queue.qsize()
-                data_buffer_len = data_queue.qsize()
-                parsed_data = []
-                is_header_found = False
-            else:
-                break
-        else:
-            byte_item = data_queue.get()
-            parsed_data.append(byte_item)
+    while start >= 0:
+        payload_start = start + 5
+        if payload_start > data_len:
+            break
 
-            if len(parsed_data) > 2:
-                parsed_data = parsed_data[-2:]
+        payload_end = payload_start + data[start + 4]
+        if payload_end > data_len:
+            break
 
-            if parsed_data == command_start:
-                # find message start
-                is_header_found = True
-                parsed_data = []
+        # update response
+        response['parsed'] = True
+        response['result'].append({
+            'type': data[start + 2:start + 4].decode('latin-1'),
+            'data': list(data[payload_start:payload_end])
+        })
+        response['parsed_end_index'] = payload_end
+        start = data.find(b'UU', payload_end)
 
     return response
 
@@ -396,9 +344,9 @@ def _parse_eth_100base_t1_buffer(data_buffer):
         packet_type = data_buffer[PACKET_TYPE_INDEX:PAYLOAD_LEN_INDEX]
  
         if len(data_buffer) >= PAYLOAD_INDEX + payload_len + 2:
-            crc = calc_crc(data_buffer[2:8+payload_len])   
-
-            if crc[0] == data_buffer[PAYLOAD_INDEX + payload_len] and crc[1] == data_buffer[PAYLOAD_INDEX + payload_len + 1]:
+            crc_end = PAYLOAD_INDEX + payload_len
+            if crc.crc16_matches(bytes(data_buffer[2:crc_end]),
+                                 data_buffer[crc_end:crc_end + 2]):
                 response['parsed'] = True
                 response['result'].append({
                     'type': packet_type,
@@ -451,6 +399,28 @@ def read_untils_have_data(communicator,
     return result
 
 
+def read_packets(communicator, data_buffer, read_length=200):
+    '''
+    Read once, return the packets parsed from data_buffer as a list of
+    (packet type, payload). The parsed bytes are removed from data_buffer,
+    an incomplete packet is kept for the next read.
+    '''
+    read_data = communicator.read(read_length)
+    if not read_data:
+        return []
+
+    data_buffer.extend(bytearray(read_data))
+    if hasattr(communicator, 'type') and communicator.type == INTERFACES.ETH_100BASE_T1:
+        # a read returns a whole frame
+        response = _parse_eth_100base_t1_buffer(data_buffer)
+        del data_buffer[:]
+    else:
+        response = _parse_buffer(data_buffer)
+        del data_buffer[:response['parsed_end_index']]
+
+    return [(packet['type'], packet['data']) for packet in response['result']]
+
+
 def collection_to_dict(collection, key):
     '''
     Convet a collection to dict
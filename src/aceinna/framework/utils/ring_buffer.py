@@ -0,0 +1,148 @@
+"""
+Bounded frame buffer between a receiver thread and its reader
+"""
+import threading
+
+
+class OVERFLOW_POLICY:
+    '''
+    What to do when a frame comes and the buffer is full
+    '''
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    BLOCK = 'block'
+
+
+OVERFLOW_POLICIES = [OVERFLOW_POLICY.DROP_OLDEST,
+                     OVERFLOW_POLICY.DROP_NEWEST,
+                     OVERFLOW_POLICY.BLOCK]
+
+DEFAULT_CAPACITY = 20000
+DEFAULT_BLOCK_TIMEOUT = 1
+
+
+class FrameRingBuffer(object):
+    '''
+    Fixed capacity ring of frames. The slots are allocated once, put and
+    get only move the indexes.
+    With the block policy, put waits for the reader to free a slot. It gives
+    up after block_timeout seconds and drops the frame, so a receiver could
+    not hang when nobody reads. get could wait for a frame in a timeout.
+    The dropped frames and the high watermark are counted.
+    '''
+
+    def __init__(self, capacity=DEFAULT_CAPACITY,
+                 overflow_policy=OVERFLOW_POLICY.DROP_OLDEST,
+                 block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        if capacity < 1:
+            raise ValueError('capacity should be greater than 0')
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                'overflow policy should be one of {0}'.format(OVERFLOW_POLICIES))
+
+        self.capacity = capacity
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.dropped_count = 0
+        self.high_watermark = 0
+        self._slots = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._not_empty = threading.Condition(self._lock)
+
+    def __len__(self):
+        return self._size
+
+    def is_full(self):
+        return self._size == self.capacity
+
+    def put(self, frame):
+        '''
+        Add a frame, return False if the frame is dropped
+        '''
+        with self._not_full:
+            if self._size == self.capacity:
+                if self.overflow_policy == OVERFLOW_POLICY.DROP_OLDEST:
+                    self._slots[self._head] = None
+                    self._head = (self._head + 1) % self.capacity
+                    self._size -= 1
+                    self.dropped_count += 1
+                elif self.overflow_policy == OVERFLOW_POLICY.DROP_NEWEST \
+                        or not self._not_full.wait_for(
+                            lambda: self._size < self.capacity,
+                            self.block_timeout):
+                    self.dropped_count += 1
+                    return False
+
+            self._slots[(self._head + self._size) % self.capacity] = frame
+            self._size += 1
+            if self._size > self.high_watermark:
+                self.high_watermark = self._size
+            self._not_empty.notify()
+            return True
+
+    def get(self, timeout=0):
+        '''
+        Take the oldest frame, wait up to timeout seconds for a frame if
+        buffer is empty, return None if no frame comes
+        '''
+        with self._not_full:
+            if self._size == 0 and (timeout <= 0 or not self._not_empty.wait_for(
+                    lambda: self._size > 0, timeout)):
+                return None
+            frame = self._take(1)[0]
+            self._not_full.notify()
+            return frame
+
+    def get_batch(self, max_frames, timeout=0):
+        '''
+        Take up to max_frames frames in one call, oldest first, wait up to
+        timeout seconds for a frame if buffer is empty
+        '''
+        with self._not_full:
+            if self._size == 0 and (timeout <= 0 or not self._not_empty.wait_for(
+                    lambda: self._size > 0, timeout)):
+                return []
+            frames = self._take(min(max_frames, self._size))
+            if frames:
+                self._not_full.notify_all()
+            return frames
+
+    def clear(self):
+        with self._not_full:
+            self._slots = [None] * self.capacity
+            self._head = 0
+            self._size = 0
+            self._not_full.notify_all()
+
+    def reset_counters(self):
+        with self._not_full:
+            self.dropped_count = 0
+            self.high_watermark = self._size
+
+    def get_counters(self):
+        return {
+            'capacity': self.capacity,
+            'policy': self.overflow_policy,
+            'size': self._size,
+            'dropped': self.dropped_count,
+            'high_watermark': self.high_watermark
+        }
+
+    def _take(self, count):
+        head = self._head
+        end = head + count
+        if end <= self.capacity:
+            frames = self._slots[head:end]
+            self._slots[head:end] = [None] * count
+        else:
+            end -= self.capacity
+            frames = self._slots[head:] + self._slots[:end]
+            self._slots[head:] = [None] * (self.capacity - head)
+            self._slots[:end] = [None] * end
+
+        self._head = end % self.capacity
+        self._size -= count
+        return frames
@@ -45,7 +45,22 @@ class WebserverArgs(KeyValuesArgumentBase):
         'use_cli':False,
         'para_path': None,
         'host_mac': 'auto',
-        'unit_sn': 'auto'
+        'unit_sn': 'auto',
+        'command_window': 1,
+        'upgrade_window': 1,
+        'fleet': False,
+        'upgrade_concurrency': 4,
+        'rtcm_packet_size': 1400,
+        'rtcm_latency': '20',
+        'eth_backend': 'scapy',
+        'eth_buffer_size': 20000,
+        'eth_overflow': 'drop_oldest',
+        'log_rotate_size': 0,
+        'log_rotate_interval': 0,
+        'data_log_format': 'csv',
+        'replay_file': None,
+        'replay_speed': '1',
+        'replay_profile': None
     }
 
 
@@ -68,6 +83,8 @@ class LogParserArgs(KeyValuesArgumentBase):
         'log_type': 'openrtk',
         'path': '.',
         'kml_rate': 1,
-        'powerdr': 'false'
+        'powerdr': 'false',
+        'backend': 'auto',
+        'workers': 0
     }
 
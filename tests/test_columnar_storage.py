@@ -0,0 +1,75 @@
+import sys
+import os
+import json
+import time
+import random
+import tempfile
+import numpy as np
+
+try:
+    from aceinna.framework.columnar_storage import (
+        NpyRecordWriter, RECORD_FLUSH_INTERVAL)
+    from aceinna.devices.parsers.packet_decoder import get_output_decoder
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.columnar_storage import (
+        NpyRecordWriter, RECORD_FLUSH_INTERVAL)
+    from aceinna.devices.parsers.packet_decoder import get_output_decoder
+
+SETTING_FILE = os.path.join(
+    os.path.dirname(__file__), '..', 'src', 'aceinna', 'setting',
+    'INS401', 'RTK_INS', 'ins401.json')
+
+
+def load_output_packets():
+    with open(SETTING_FILE) as json_data:
+        return json.load(json_data)['userMessages']['outputPackets']
+
+
+def random_payload(decoder, count, rand):
+    # keep the exponent of float values away from NaN
+    return bytes(rand.getrandbits(6) for _ in range(decoder.size * count))
+
+
+def test_records_are_same_as_payload():
+    rand = random.Random(13)
+    with tempfile.TemporaryDirectory() as folder:
+        for output_packet in load_output_packets():
+            decoder = get_output_decoder(output_packet)
+            path = os.path.join(folder, output_packet['name'] + '.npy')
+            writer = NpyRecordWriter(path, output_packet)
+            payload = random_payload(decoder, 10, rand)
+            rows = [decoder.decode(payload[i * decoder.size:(i + 1) * decoder.size])
+                    for i in range(10)]
+
+            writer.append(rows[0])
+            writer.append_many(rows[1:5])
+            writer.flush()
+            assert len(np.load(path, mmap_mode='r')) == 5
+
+            writer.append_many(rows[5:])
+            writer.close()
+
+            records = np.load(path, mmap_mode='r')
+            assert records.dtype.itemsize == decoder.size
+            assert records.tobytes() == payload
+            for name in decoder.fields:
+                assert records[name][3] == rows[3][name]
+
+
+def test_records_flushed_when_due():
+    output_packet = load_output_packets()[0]
+    decoder = get_output_decoder(output_packet)
+    payload = random_payload(decoder, 1, random.Random(3))
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, output_packet['name'] + '.npy')
+        writer = NpyRecordWriter(path, output_packet)
+        writer.append(decoder.decode(payload))
+
+        writer.flush_if_due()
+        assert len(np.load(path, mmap_mode='r')) == 0
+        # no more record comes, the periodic call writes the kept records
+        writer.flush_if_due(time.time() + RECORD_FLUSH_INTERVAL)
+        assert np.load(path, mmap_mode='r').tobytes() == payload
+        writer.close()
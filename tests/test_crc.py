@@ -0,0 +1,50 @@
+import sys
+import os
+
+try:
+    from aceinna.framework.utils import (helper, crc)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils import (helper, crc)
+
+
+def bitwise_crc(payload):
+    crc_value = 0x1D0F
+    for bytedata in payload:
+        crc_value = crc_value ^ (bytedata << 8)
+        for _ in range(8):
+            if crc_value & 0x8000:
+                crc_value = (crc_value << 1) ^ 0x1021
+            else:
+                crc_value = crc_value << 1
+        crc_value = crc_value & 0xffff
+    return crc_value
+
+
+def test_crc16_matches_bitwise_reference():
+    for size in [0, 1, 2, 7, 64, 513]:
+        payload = os.urandom(size)
+        expected = bitwise_crc(payload)
+        assert crc.crc16(payload) == expected
+        assert crc.crc16(bytearray(payload)) == expected
+        assert crc.crc16(memoryview(payload)) == expected
+        assert crc.crc16(list(payload)) == expected
+        assert crc._update_by_table(crc.CRC16_INIT, payload) == expected
+
+
+def test_incremental_update():
+    payload = os.urandom(1000)
+    state = crc.CRC16_INIT
+    for start in range(0, len(payload), 37):
+        state = crc.update(state, payload[start:start + 37])
+    assert state == crc.crc16(payload)
+
+
+def test_calc_crc_and_matches():
+    payload = [0x70, 0x47, 0x00]
+    expected = bitwise_crc(payload)
+    assert helper.calc_crc(payload) == [expected >> 8, expected & 0xFF]
+    assert crc.crc16_bytes(payload) == bytes([expected >> 8, expected & 0xFF])
+    assert crc.crc16_matches(bytes(payload), [expected >> 8, expected & 0xFF])
+    assert not crc.crc16_matches(bytes(payload), [expected >> 8, 0x00 if expected & 0xFF else 0x01])
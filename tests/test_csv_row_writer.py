@@ -0,0 +1,123 @@
+import sys
+import os
+import json
+import time
+import random
+
+try:
+    from aceinna.framework.file_storage import (CsvRowWriter, ROW_FLUSH_INTERVAL)
+    from aceinna.devices.parsers.packet_decoder import get_output_decoder
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.file_storage import (CsvRowWriter, ROW_FLUSH_INTERVAL)
+    from aceinna.devices.parsers.packet_decoder import get_output_decoder
+
+SETTING_FOLDER = os.path.join(
+    os.path.dirname(__file__), '..', 'src', 'aceinna', 'setting')
+SETTING_FILES = [
+    os.path.join(SETTING_FOLDER, 'INS401', 'RTK_INS', 'ins401.json'),
+    os.path.join(SETTING_FOLDER, 'RTK330L', 'RTK_INS', 'RTK330L.json')]
+
+
+def load_output_packets():
+    output_packets = []
+    for setting_file in SETTING_FILES:
+        with open(setting_file) as json_data:
+            output_packets.extend(
+                json.load(json_data)['userMessages']['outputPackets'])
+    return output_packets
+
+
+def reference_log(output_packet, data, with_header):
+    '''
+    The former row building of FileLoger.log
+    '''
+    fields = [field['name'] for field in output_packet['payload']]
+    header = ''
+    if with_header:
+        labels = ''
+        for i, (k, v) in enumerate(data.items()):
+            if not fields.__contains__(k):
+                continue
+            data_str = output_packet['payload'][i]['name']
+            unit_str = output_packet['payload'][i]['unit']
+            if unit_str == '':
+                labels = labels + '{0:s},'.format(data_str)
+            else:
+                labels = labels + '{0:s} ({1:s}),'.format(data_str, unit_str)
+        header = labels[:-1] + '\n'
+
+    write_str = ''
+    for i, (k, v) in enumerate(data.items()):
+        if not fields.__contains__(k):
+            continue
+        field = output_packet['payload'][i]
+        output_packet_type = field['type']
+        if field.__contains__('scaling'):
+            write_str += '{0},'.format(v)
+        elif output_packet_type in ['uint32', 'int32', 'uint16', 'int16', 'uint64', 'int64']:
+            write_str += '{0},'.format(v)
+        elif output_packet_type == 'double':
+            write_str += '{0:0.8f},'.format(v)
+        elif output_packet_type == 'float':
+            write_str += '{0:0.4f},'.format(v)
+        elif output_packet_type == 'uint8':
+            write_str += '{0:d},'.format(v)
+        elif output_packet_type in ['uchar', 'char', 'string']:
+            write_str += '{:},'.format(v)
+        else:
+            write_str += '{0:3.5f},'.format(v)
+    return header + write_str[:-1] + '\n'
+
+
+def random_rows(decoder, count, rand):
+    payload = bytes(rand.getrandbits(8) for _ in range(decoder.size * count))
+    if decoder.is_list:
+        return decoder.decode(payload)
+    return [decoder.decode(payload[i * decoder.size:(i + 1) * decoder.size])
+            for i in range(count)]
+
+
+def test_rows_match_former_format():
+    rand = random.Random(12)
+    for output_packet in load_output_packets():
+        decoder = get_output_decoder(output_packet)
+        rows = random_rows(decoder, 5, rand)
+        written = []
+        row_writer = CsvRowWriter(output_packet, written.append)
+
+        row_writer.append(rows[0])
+        row_writer.append_many(rows[1:])
+        row_writer.flush()
+
+        expected = reference_log(output_packet, rows[0], True) + ''.join(
+            reference_log(output_packet, row, False) for row in rows[1:])
+        assert ''.join(written) == expected
+
+
+def test_rows_are_buffered():
+    output_packet = load_output_packets()[0]
+    decoder = get_output_decoder(output_packet)
+    written = []
+    row_writer = CsvRowWriter(output_packet, written.append)
+    for row in random_rows(decoder, 10, random.Random(1)):
+        row_writer.append(row)
+
+    assert written == []
+    row_writer.flush()
+    assert len(''.join(written).splitlines()) == 11
+
+
+def test_rows_flushed_when_due():
+    output_packet = load_output_packets()[0]
+    decoder = get_output_decoder(output_packet)
+    written = []
+    row_writer = CsvRowWriter(output_packet, written.append)
+    row_writer.append(random_rows(decoder, 1, random.Random(2))[0])
+
+    row_writer.flush_if_due()
+    assert written == []
+    # no more row comes, the periodic call writes the kept rows
+    row_writer.flush_if_due(time.time() + ROW_FLUSH_INTERVAL)
+    assert len(''.join(written).splitlines()) == 2
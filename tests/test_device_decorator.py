@@ -0,0 +1,95 @@
+import sys
+import time
+import struct
+import threading
+
+try:
+    from aceinna.devices.decorator import with_device_message
+    from test_message_center import (
+        SilentCommunicator, build_message_center, uart_frame)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    sys.path.append('./tests')
+    from aceinna.devices.decorator import with_device_message
+    from test_message_center import (
+        SilentCommunicator, build_message_center, uart_frame)
+
+
+class EchoCommunicator(SilentCommunicator):
+    '''
+    Answer each gP command with value = param id * 10
+    '''
+
+    def __init__(self):
+        super(EchoCommunicator, self).__init__()
+        self._lock = threading.Lock()
+        self._replies = bytearray()
+
+    def read(self, size=100):  # pylint: disable=unused-argument
+        with self._lock:
+            data = bytes(self._replies)
+            self._replies.clear()
+        return data
+
+    def write(self, data, is_flush=False):  # pylint: disable=unused-argument
+        param_id = struct.unpack('<I', bytes(data[5:9]))[0]
+        with self._lock:
+            self._replies.extend(uart_frame(
+                b'gP', struct.pack('<II', param_id, param_id * 10)))
+
+
+class FakeProvider(object):
+    def __init__(self, message_center):
+        self._message_center = message_center
+
+    def _build(self, param_id, timeout=1):
+        return self._message_center.build(
+            command=uart_frame(b'gP', struct.pack('<I', param_id)),
+            timeout=timeout, packet_type='gP', match_id=param_id)
+
+    @with_device_message
+    def get_param(self, param_id):
+        result = yield self._build(param_id)
+        yield {'packetType': 'inputParam', 'data': result['data']}
+
+    @with_device_message(deadline=0.2)
+    def get_param_with_deadline(self, param_id):
+        result = yield self._build(param_id, timeout=5)
+        yield {'packetType': 'inputParam', 'data': result['data']}
+
+
+def test_concurrent_calls_get_their_own_result():
+    message_center = build_message_center(EchoCommunicator())
+    provider = FakeProvider(message_center)
+    results = {}
+
+    def run(param_id):
+        for _ in range(5):
+            result = provider.get_param(param_id)
+            results.setdefault(param_id, []).append(result['data']['value'])
+
+    try:
+        threads = [threading.Thread(target=run, args=(param_id,))
+                   for param_id in range(1, 5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        for param_id in range(1, 5):
+            assert results[param_id] == [param_id * 10] * 5
+    finally:
+        message_center.stop()
+
+
+def test_deadline_returns_no_response():
+    message_center = build_message_center()
+    provider = FakeProvider(message_center)
+    try:
+        start = time.monotonic()
+        result = provider.get_param_with_deadline(1)
+        assert time.monotonic() - start < 1
+        assert result == {'packetType': 'error', 'data': 'No Response'}
+    finally:
+        message_center.stop()
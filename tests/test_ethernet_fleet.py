@@ -0,0 +1,171 @@
+import sys
+import os
+import struct
+import tempfile
+
+try:
+    from aceinna.framework.utils import crc
+    from aceinna.framework.communicators import raw_socket
+    from aceinna.framework.communicators.ethernet_fleet import EthernetFleet
+    from aceinna.core.fleet_driver import FleetDriver
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils import crc
+    from aceinna.framework.communicators import raw_socket
+    from aceinna.framework.communicators.ethernet_fleet import EthernetFleet
+    from aceinna.core.fleet_driver import FleetDriver
+
+HOST_MAC = 'a0:b1:c2:d3:e4:f5'
+UNIT_MACS = ['00:11:22:33:44:01', '00:11:22:33:44:02', '00:11:22:33:44:03']
+
+
+def ethernet_frame(src_mac, packet_type, payload=b''):
+    body = packet_type + struct.pack('<I', len(payload)) + payload
+    packet = b'UU' + body + crc.crc16_bytes(body)
+    return raw_socket.mac_to_bytes(HOST_MAC) + raw_socket.mac_to_bytes(src_mac) + \
+        struct.pack('>H', len(packet)) + packet
+
+
+class FakeSniffer(object):
+    def __init__(self, iface, prn):
+        self.prn = prn
+        self.running = False
+
+    def start(self):
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+
+class FakeNetwork(object):
+    '''
+    Devices answer the ping sent to broadcast or to their mac
+    '''
+
+    def __init__(self, macs):
+        self.macs = macs
+        self.sniffer = None
+        self.sent = []
+
+    def create_sniffer(self, iface, prn):
+        self.sniffer = FakeSniffer(iface, prn)
+        return self.sniffer
+
+    def send(self, data):
+        data = bytes(data)
+        self.sent.append(data)
+        dst_mac = raw_socket.mac_to_str(data[0:6])
+        for mac in self.macs:
+            if data[16:18] == b'\x01\xcc' and dst_mac in [mac, 'ff:ff:ff:ff:ff:ff']:
+                self.sniffer.prn(ethernet_frame(mac, b'\x01\xcc', b'INS401'))
+
+
+def create_fleet(network):
+    fleet = EthernetFleet(sniffer_factory=network.create_sniffer,
+                          send_method=network.send)
+    fleet.start('eth0', HOST_MAC)
+    fleet.discover(discover_time=0)
+    return fleet
+
+
+def test_discover_units():
+    network = FakeNetwork(UNIT_MACS)
+    fleet = create_fleet(network)
+
+    assert sorted(fleet.units.keys()) == UNIT_MACS
+    for mac in UNIT_MACS:
+        assert fleet.get_unit(mac.upper()).get_dst_mac() == \
+            raw_socket.mac_to_bytes(mac)
+
+
+def test_frames_demultiplexed_by_mac():
+    network = FakeNetwork(UNIT_MACS)
+    fleet = create_fleet(network)
+    for index in range(10):
+        for mac in UNIT_MACS:
+            network.sniffer.prn(ethernet_frame(
+                mac, b'\x01\x0a', bytes([index]) + mac.encode()))
+    # a device powered on after discover is not added
+    network.sniffer.prn(ethernet_frame('00:11:22:33:44:99', b'\x01\x0a'))
+
+    assert fleet.unknown_count == 1
+    for mac in UNIT_MACS:
+        packets = fleet.get_unit(mac).read_batch()
+        assert len(packets) == 10
+        assert all(bytes(packet[8:-2]).endswith(mac.encode()) for packet in packets)
+        assert [packet[8] for packet in packets] == list(range(10))
+
+
+def test_unit_commands_addressed_by_mac():
+    network = FakeNetwork(UNIT_MACS)
+    fleet = create_fleet(network)
+    unit = fleet.get_unit(UNIT_MACS[1])
+
+    assert unit.reshake_hand()
+    assert network.sent[-1][0:6] == raw_socket.mac_to_bytes(UNIT_MACS[1])
+    assert fleet.get_unit(UNIT_MACS[0]).read_batch() == []
+
+
+def test_upgrading_unit_filters_output_packets():
+    network = FakeNetwork(UNIT_MACS)
+    fleet = create_fleet(network)
+    upgrading = fleet.get_unit(UNIT_MACS[0])
+    upgrading.upgrade()
+
+    for mac in UNIT_MACS:
+        network.sniffer.prn(ethernet_frame(mac, b'\x01\x0a'))
+        network.sniffer.prn(ethernet_frame(mac, b'\x57\x41'))
+
+    assert [bytes(packet[2:4]) for packet in upgrading.read_batch()] == [b'\x57\x41']
+    assert len(fleet.get_unit(UNIT_MACS[1]).read_batch()) == 2
+
+
+class FakeProvider(object):
+    def __init__(self, mac):
+        self.mac = mac
+
+    def get_params(self, parameters):
+        return {'packetType': 'inputParams', 'data': self.mac}
+
+
+def test_execute_addressed_by_mac():
+    driver = FleetDriver(None)
+    driver._providers = dict((mac, FakeProvider(mac)) for mac in UNIT_MACS)
+
+    result = driver.execute('get_params', {'mac': UNIT_MACS[2].upper()})
+    assert result['data'] == UNIT_MACS[2]
+    assert driver.execute('get_params', {})['packetType'] == 'error'
+
+
+class FakeUnitProvider(object):
+    def __init__(self, data_folder):
+        self.data_folder = data_folder
+        self.statistics = None
+        self.setup_count = 0
+
+    def setup(self, options):
+        self.setup_count += 1
+
+    def on(self, event, handler):
+        pass
+
+
+def test_reconnected_unit_keeps_folder_and_counters():
+    network = FakeNetwork(UNIT_MACS)
+    fleet = create_fleet(network)
+    unit = fleet.get_unit(UNIT_MACS[0])
+    driver = FleetDriver(None, fleet)
+    with tempfile.TemporaryDirectory() as folder:
+        provider = FakeUnitProvider(folder)
+        driver._device_discover_handler(unit, provider)
+        statistics = provider.statistics
+        statistics.collect('continuous', b'\x01\n', 1)
+
+        # the device manager gives the same provider after reconnect
+        driver._device_discover_handler(unit, provider)
+
+        assert provider.data_folder == os.path.join(folder, '001122334401')
+        assert provider.statistics is statistics
+        assert provider.setup_count == 2
@@ -0,0 +1,71 @@
+import sys
+import time
+import struct
+import threading
+
+try:
+    from aceinna.framework.utils.ring_buffer import FrameRingBuffer
+    from aceinna.devices.upgrade_workers import ethernet_sdk_9100_worker
+    from aceinna.devices.upgrade_workers.ethernet_sdk_9100_worker import (
+        SDKUpgradeWorker, CRC32_TAB, WS)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils.ring_buffer import FrameRingBuffer
+    from aceinna.devices.upgrade_workers import ethernet_sdk_9100_worker
+    from aceinna.devices.upgrade_workers.ethernet_sdk_9100_worker import (
+        SDKUpgradeWorker, CRC32_TAB, WS)
+
+
+class FakeCommunicator(object):
+    def __init__(self):
+        self.receive_cache = FrameRingBuffer(100)
+
+    def read(self, size=100, timeout=0):
+        return self.receive_cache.get(timeout)
+
+    def reply(self, packet_type, payload):
+        self.receive_cache.put(
+            b'UU' + bytes(packet_type) + struct.pack('<I', len(payload)) + bytes(payload) + b'\x00\x00')
+
+
+def table_crc(crc32val, bytes_hex, data_len):
+    crc32val = crc32val ^ 0xffffffff
+    for i in range(int(data_len/4) * 4):
+        crc32val = CRC32_TAB[(crc32val ^ bytes_hex[i]) & 0xff] ^ (crc32val >> 8)
+    return crc32val ^ 0xffffffff
+
+
+def test_sdk_crc_matches_table():
+    assert ethernet_sdk_9100_worker.USE_ZLIB_CRC32
+    worker = SDKUpgradeWorker(FakeCommunicator(), b'')
+    content = bytes(index * 7 % 256 for index in range(10003))
+
+    crc = worker.sdk_crc(0, [3, 0, 0, 0], 4)
+    assert crc == table_crc(0, [3, 0, 0, 0], 4)
+    assert worker.sdk_crc(crc, content, len(content)) == \
+        table_crc(crc, content, len(content))
+    assert worker.sdk_crc(crc, list(content[:6]), 6) == \
+        table_crc(crc, list(content[:6]), 6)
+
+
+def test_read_until_wakes_up_on_reply():
+    communicator = FakeCommunicator()
+    worker = SDKUpgradeWorker(communicator, b'')
+
+    def reply_later():
+        time.sleep(0.05)
+        communicator.reply([0x01, 0xcc], b'INS401')
+        communicator.reply(WS, [])
+        communicator.reply(WS, [0xcc])
+
+    replier = threading.Thread(target=reply_later)
+    start = time.time()
+    replier.start()
+    assert worker.read_until(0xCC, 3000)
+    replier.join()
+    assert time.time() - start < 1
+
+    start = time.time()
+    assert not worker.read_until(0xCC, 50)
+    assert time.time() - start < 1
@@ -0,0 +1,162 @@
+import sys
+import time
+import struct
+
+try:
+    from aceinna.framework.utils import helper
+    from aceinna.framework.constants import INTERFACES
+    from aceinna.devices.upgrade_workers import (FirmwareUpgradeWorker, UPGRADE_EVENT)
+    from aceinna.devices.upgrade_workers import firmware_worker
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils import helper
+    from aceinna.framework.constants import INTERFACES
+    from aceinna.devices.upgrade_workers import (FirmwareUpgradeWorker, UPGRADE_EVENT)
+    from aceinna.devices.upgrade_workers import firmware_worker
+
+
+class FakeBootloader(object):
+    '''
+    Bootloader on UART, acknowledges WA with the offset and length of block.
+    A lost block is not written, a delayed ack comes when the block is sent
+    again, before the ack of the block sent again.
+    '''
+
+    def __init__(self, size, lost_acks=None, echo_offset=True,
+                 lost_blocks=None, delayed_acks=None):
+        self.type = INTERFACES.UART
+        self.content = bytearray(size)
+        self.lost_acks = set(lost_acks or [])
+        self.lost_blocks = set(lost_blocks or [])
+        self.delayed_acks = set(delayed_acks or [])
+        self.echo_offset = echo_offset
+        self._delayed = {}
+        self.writes = 0
+        self.block_sizes = set()
+        self._output = bytearray()
+
+    def write(self, data, is_flush=False):
+        data = bytes(data)
+        payload = data[5:5 + data[4]]
+        offset = struct.unpack('>I', payload[0:4])[0]
+        data_len = payload[4]
+        self.writes += 1
+        if offset in self.lost_blocks:
+            self.lost_blocks.remove(offset)
+            return
+        self.content[offset:offset + data_len] = payload[5:5 + data_len]
+        self.block_sizes.add(data_len)
+        if offset in self.lost_acks:
+            self.lost_acks.remove(offset)
+            return
+        ack = list(payload[0:5]) if self.echo_offset else []
+        if offset in self.delayed_acks:
+            self.delayed_acks.remove(offset)
+            self._delayed[offset] = helper.build_packet('WA', ack)
+            return
+        if offset in self._delayed:
+            self._output.extend(self._delayed.pop(offset))
+        self._output.extend(helper.build_packet('WA', ack))
+
+    def read(self, size=100):
+        data = bytes(self._output[:size])
+        del self._output[:size]
+        return data
+
+    def reset_buffer(self):
+        self._output.clear()
+
+
+def build_command(data_len, current, data):
+    message_bytes = []
+    message_bytes.extend(struct.pack('>I', current))
+    message_bytes.extend(struct.pack('B', data_len))
+    message_bytes.extend(data)
+    return helper.build_packet('WA', message_bytes)
+
+
+def run_worker(monkeypatch, bootloader, content, **kwargs):
+    # skip the waits of erasing flash after the first block
+    monkeypatch.setattr(firmware_worker.time, 'sleep', lambda seconds: None)
+    # long enough not to resend a block on a busy machine
+    monkeypatch.setattr(firmware_worker, 'ACK_TIMEOUT', 0.2)
+    worker = FirmwareUpgradeWorker(
+        bootloader, True, content, build_command, 192, **kwargs)
+    finished = []
+    worker.on(UPGRADE_EVENT.FINISH, lambda key: finished.append(key))
+    worker.work()
+    return worker, finished
+
+
+def build_content(size):
+    return bytes(index % 251 for index in range(size))
+
+
+def test_stop_and_wait(monkeypatch):
+    content = build_content(192 * 10 + 64)
+    bootloader = FakeBootloader(len(content))
+    worker, finished = run_worker(monkeypatch, bootloader, content)
+
+    assert finished
+    assert bytes(bootloader.content) == content
+    assert bootloader.writes == 11
+    assert worker.retransmits == 0
+
+
+def test_window_resends_lost_block(monkeypatch):
+    content = build_content(192 * 40)
+    bootloader = FakeBootloader(len(content), lost_acks=[192 * 5, 192 * 17])
+    worker, finished = run_worker(
+        monkeypatch, bootloader, content, window_size=8)
+
+    assert finished
+    assert bytes(bootloader.content) == content
+    assert worker.retransmits == 2
+    assert bootloader.writes == 42
+
+
+def test_window_without_offset_in_ack(monkeypatch):
+    content = build_content(192 * 20 + 16)
+    bootloader = FakeBootloader(len(content), echo_offset=False)
+    worker, finished = run_worker(
+        monkeypatch, bootloader, content, window_size=4)
+
+    assert finished
+    assert bytes(bootloader.content) == content
+    assert worker.current == len(content)
+
+
+def test_window_without_offset_delayed_ack_and_lost_block(monkeypatch):
+    content = build_content(192 * 20)
+    bootloader = FakeBootloader(
+        len(content), echo_offset=False,
+        delayed_acks=[192 * 5], lost_blocks=[192 * 6])
+    worker, finished = run_worker(
+        monkeypatch, bootloader, content, window_size=4)
+
+    # the late ack of block 5 must not be taken as the ack of block 6
+    assert finished
+    assert bytes(bootloader.content) == content
+
+
+def test_window_with_offset_delayed_ack_and_lost_block(monkeypatch):
+    content = build_content(192 * 20)
+    bootloader = FakeBootloader(
+        len(content), delayed_acks=[192 * 5], lost_blocks=[192 * 6])
+    worker, finished = run_worker(
+        monkeypatch, bootloader, content, window_size=4)
+
+    assert finished
+    assert bytes(bootloader.content) == content
+    assert worker.retransmits == 2
+
+
+def test_window_grows_block_size(monkeypatch):
+    content = build_content(192 * 200)
+    bootloader = FakeBootloader(len(content))
+    run_worker(monkeypatch, bootloader, content,
+               window_size=4, max_block_size=240)
+
+    assert bytes(bootloader.content) == content
+    assert max(bootloader.block_sizes) == 240
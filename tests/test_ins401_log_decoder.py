@@ -0,0 +1,87 @@
+import sys
+import os
+import struct
+import random
+import tempfile
+
+try:
+    from aceinna.bootstrap.log_parser import do_parse
+    from aceinna.devices.parsers.ins401_log_decoder import (
+        UserLogDecoder, load_output_packets)
+    from aceinna.framework.utils import crc
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.bootstrap.log_parser import do_parse
+    from aceinna.devices.parsers.ins401_log_decoder import (
+        UserLogDecoder, load_output_packets)
+    from aceinna.framework.utils import crc
+
+
+def build_frame(packet_type, payload):
+    body = packet_type + struct.pack('<I', len(payload)) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def build_log(rand, count):
+    decoder = UserLogDecoder()
+    packet_types = list(decoder.layouts.keys())
+    log = b''
+    expected = dict((packet_type, []) for packet_type in packet_types)
+    for _ in range(count):
+        choice = rand.random()
+        if choice < 0.05:
+            # garbage with headers inside
+            log += b'UU' + bytes(rand.getrandbits(8) for _ in range(rand.randint(0, 20)))
+            continue
+        if choice < 0.1:
+            log += build_frame(b'\x07\n', bytes(30))
+            continue
+        packet_type = rand.choice(packet_types)
+        # keep the exponent of float values away from NaN
+        payload = bytes(rand.getrandbits(6) for _ in range(
+            decoder.layouts[packet_type].size))
+        log += build_frame(packet_type, payload)
+        expected[packet_type].append(payload)
+    return log, expected
+
+
+def test_decode_chunks():
+    rand = random.Random(14)
+    log, expected = build_log(rand, 2000)
+    decoder = UserLogDecoder(load_output_packets())
+
+    chunk_size = 997
+    decoded = dict((packet_type, b'') for packet_type in expected)
+    for start in range(0, len(log), chunk_size):
+        end = min(start + chunk_size, len(log))
+        for packet_type, records in decoder.decode(log[start:], 0, end - start).items():
+            decoded[packet_type] += records.tobytes()
+
+    for packet_type, payloads in expected.items():
+        assert decoded[packet_type] == b''.join(payloads)
+
+
+def test_parse_folder_in_processes():
+    rand = random.Random(41)
+    with tempfile.TemporaryDirectory() as folder:
+        for index in range(3):
+            log, _ = build_log(rand, 500)
+            with open(os.path.join(folder, 'user_{0}.bin'.format(index)), 'wb') as log_file:
+                log_file.write(log)
+
+        do_parse('ins401', folder, 1, 'false', backend='python', workers=1)
+        serial_output = {}
+        for root, _, file_names in os.walk(folder):
+            for file_name in file_names:
+                if file_name.endswith('.csv'):
+                    with open(os.path.join(root, file_name)) as csv_file:
+                        serial_output[file_name, root] = csv_file.read()
+
+        do_parse('ins401', folder, 1, 'false', backend='python', workers=2,
+                 chunk_size=4096)
+        for (file_name, root), content in serial_output.items():
+            with open(os.path.join(root, file_name)) as csv_file:
+                assert csv_file.read() == content
+
+        assert len(serial_output) == 3 * 5
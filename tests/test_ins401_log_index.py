@@ -0,0 +1,79 @@
+import sys
+import os
+import struct
+import tempfile
+
+try:
+    from aceinna.devices.parsers.ins401_log_index import (
+        FrameIndex, get_index_path)
+    from aceinna.framework.utils import crc
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.devices.parsers.ins401_log_index import (
+        FrameIndex, get_index_path)
+    from aceinna.framework.utils import crc
+
+
+def build_frame(packet_type, payload):
+    body = packet_type + struct.pack('<I', len(payload)) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def imu_frame(week, time_of_week):
+    return build_frame(b'\x01\n', struct.pack('<HI6f', week, time_of_week, *range(6)))
+
+
+def ins_frame(week, time_of_week):
+    return build_frame(b'\x03\n', struct.pack('<HI', week, time_of_week) + bytes(92))
+
+
+def test_index_and_read():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'user_1.bin')
+        with open(path, 'wb') as log_file:
+            frames = []
+            for i in range(100):
+                time_of_week = 1000 + i * 10
+                frames.append(imu_frame(2200, time_of_week))
+                if i % 10 == 0:
+                    frames.append(ins_frame(2200, time_of_week))
+                    frames.append(build_frame(b'\x07\n', bytes(5)))
+            for frame in frames:
+                log_file.write(frame)
+                # broken frame is skipped
+                log_file.write(b'UU\x01\n\xff')
+
+        with FrameIndex(path) as index:
+            assert index.count() == 120
+            assert index.count('iN') == 10
+            assert index.count(b'\x01\n') == 100
+            assert index.count('07,0a') == 10
+            try:
+                index.count('sT')
+                assert False, 'sT is not a packet of the log'
+            except ValueError:
+                pass
+
+            ins_frames = [bytes(frame) for frame in index.iter_type('iN')]
+            assert ins_frames == [frame for frame in frames if frame[2:4] == b'\x03\n']
+            assert all(isinstance(frame, memoryview) for frame in index.iter_type('iN'))
+
+            offset = index.seek_time(2200, 1505)
+            frame = index.get_frame(offset)
+            assert bytes(frame) == imu_frame(2200, 1510)
+            next_ins = next(index.iter_type('iN', offset))
+            assert struct.unpack_from('<HI', next_ins, 8) == (2200, 1600)
+            assert index.seek_time(2200, 999) == 0
+            assert index.seek_time(2201, 0) is None
+            del frame, next_ins
+
+        assert os.path.isfile(get_index_path(path))
+        with FrameIndex(path) as index:
+            assert index.count('s1') == 100
+
+        # the index is rebuilt when the log is changed
+        with open(path, 'ab') as log_file:
+            log_file.write(imu_frame(2200, 2000))
+        with FrameIndex(path) as index:
+            assert index.count('s1') == 101
@@ -0,0 +1,164 @@
+import sys
+import os
+import time
+import signal
+import tempfile
+import subprocess
+
+try:
+    from aceinna.framework.log_writer import LogWriterService
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.log_writer import LogWriterService
+
+
+def wait_until(check, timeout=2):
+    end_time = time.monotonic() + timeout
+    while time.monotonic() < end_time:
+        if check():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_write_is_flushed_by_interval_and_close():
+    service = LogWriterService()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'user.bin')
+        writer = service.open(path, flush_interval=0.05)
+        for i in range(100):
+            writer.write(bytes([i]) * 10)
+        writer.write(memoryview(b'end'))
+
+        assert wait_until(lambda: os.path.getsize(path) == 1003)
+
+        writer.write(b'tail')
+        writer.close()
+        writer.write(b'ignored')
+        with open(path, 'rb') as log_file:
+            content = log_file.read()
+        assert content.endswith(b'endtail')
+        assert writer.closed
+
+
+def test_rotate_by_size():
+    service = LogWriterService()
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'rtcm.bin')
+        writer = service.open(path, buffer_size=100, rotate_size=100)
+        for i in range(5):
+            writer.write(bytes([i]) * 100)
+            assert wait_until(lambda: writer.written_size == (i + 1) * 100)
+        service.close_all()
+
+        names = sorted(os.listdir(folder))
+        assert names == ['rtcm.bin', 'rtcm_001.bin', 'rtcm_002.bin',
+                         'rtcm_003.bin', 'rtcm_004.bin']
+        with open(os.path.join(folder, 'rtcm_002.bin'), 'rb') as log_file:
+            assert log_file.read() == bytes([2]) * 100
+
+
+class FailingFile(object):
+    '''
+    A file on a removed drive
+    '''
+    closed = False
+
+    def write(self, data):
+        raise OSError(28, 'No space left on device')
+
+    def flush(self):
+        pass
+
+
+def test_failed_writer_does_not_stop_others():
+    service = LogWriterService()
+    with tempfile.TemporaryDirectory() as folder:
+        failed = service.open(os.path.join(folder, 'debug.bin'),
+                              flush_interval=0.02, buffer_size=100,
+                              max_pending_size=300)
+        failed._file.close()
+        failed._file = FailingFile()
+        path = os.path.join(folder, 'user.bin')
+        writer = service.open(path, flush_interval=0.02)
+
+        failed.write(b'lost')
+        assert wait_until(lambda: failed.last_error is not None)
+        writer.write(b'user data')
+        assert wait_until(lambda: os.path.getsize(path) == 9)
+
+        # queued data is bounded while the writes keep failing
+        service._lock.acquire()
+        try:
+            for _ in range(10):
+                failed.write(bytes(100))
+            assert failed._pending_size == 300
+        finally:
+            service._lock.release()
+        assert wait_until(lambda: failed.dropped_size == 4 + 1000)
+        assert 'No space left' in failed.last_error
+        writer.close()
+
+
+def test_periodic_task_runs_in_writer_thread():
+    service = LogWriterService()
+    calls = []
+
+    def failing_task(closing):
+        raise IOError('disk full')
+
+    def task(closing):
+        calls.append(closing)
+
+    # a failed task must not stop the others
+    service.add_periodic_task(failing_task)
+    service.add_periodic_task(task)
+    with tempfile.TemporaryDirectory() as folder:
+        # the writer with a short interval wakes the thread often
+        writer = service.open(os.path.join(folder, 'user.bin'), flush_interval=0.05)
+        assert wait_until(lambda: len(calls) >= 2)
+        service.remove_periodic_task(task)
+        count = len(calls)
+        time.sleep(0.15)
+        assert len(calls) == count
+        writer.close()
+
+    # all that a task keeps is written when the logs are closed
+    service.remove_periodic_task(failing_task)
+    service.add_periodic_task(task)
+    service.close_all()
+    assert calls[-1] is True
+
+
+# a process logging as the executor does, killed by Ctrl+C
+SIGINT_SCRIPT = '''
+import sys
+import time
+import signal
+sys.path.append('./src')
+from aceinna.executor import kill_app
+from aceinna.framework import log_writer
+signal.signal(signal.SIGINT, kill_app)
+writer = log_writer.open_log(sys.argv[1], flush_interval=60)
+writer.write(bytes(1000))
+print('ready', flush=True)
+while True:
+    time.sleep(10)
+'''
+
+
+def test_queued_data_written_on_sigint():
+    if os.name == 'nt':
+        return
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'user.bin')
+        process = subprocess.Popen(
+            [sys.executable, '-c', SIGINT_SCRIPT, path],
+            stdout=subprocess.PIPE)
+        assert process.stdout.readline().strip() == b'ready'
+        process.send_signal(signal.SIGINT)
+        process.wait(10)
+        process.stdout.close()
+
+        assert os.path.getsize(path) == 1000
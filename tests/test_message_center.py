@@ -0,0 +1,138 @@
+import sys
+import struct
+import threading
+
+try:
+    from aceinna.framework.utils import crc
+    from aceinna.devices.message_center import DeviceMessageCenter
+    from aceinna.devices.parsers.rtk330l_message_parser import UartMessageParser
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils import crc
+    from aceinna.devices.message_center import DeviceMessageCenter
+    from aceinna.devices.parsers.rtk330l_message_parser import UartMessageParser
+
+CONFIGURATION = {
+    'userConfiguration': [
+        {'paramId': i, 'name': 'param{0}'.format(i), 'type': 'uint32'}
+        for i in range(1, 5)],
+    'userMessages': {'inputPackets': [], 'outputPackets': []}
+}
+
+
+def uart_frame(packet_type, payload):
+    body = packet_type + bytes([len(payload)]) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+class SilentCommunicator(object):
+    type = 'fake'
+
+    def __init__(self):
+        self.written = []
+
+    def read(self, size=100):  # pylint: disable=unused-argument
+        return None
+
+    def write(self, data, is_flush=False):  # pylint: disable=unused-argument
+        self.written.append(data)
+
+
+class ReorderingCommunicator(SilentCommunicator):
+    '''
+    Answer the gP commands only when 4 of them are pending, in reverse order
+    '''
+
+    def __init__(self):
+        super(ReorderingCommunicator, self).__init__()
+        self._lock = threading.Lock()
+        self._pending = []
+        self._replies = bytearray()
+
+    def read(self, size=100):  # pylint: disable=unused-argument
+        with self._lock:
+            data = bytes(self._replies)
+            self._replies.clear()
+        return data
+
+    def write(self, data, is_flush=False):  # pylint: disable=unused-argument
+        self.written.append(data)
+        param_id = struct.unpack('<I', bytes(data[5:9]))[0]
+        with self._lock:
+            self._pending.append(param_id)
+            if len(self._pending) < 4:
+                return
+            for pending_id in reversed(self._pending):
+                self._replies.extend(uart_frame(
+                    b'gP', struct.pack('<II', pending_id, pending_id * 10)))
+            self._pending = []
+
+
+def build_message_center(communicator=None):
+    message_center = DeviceMessageCenter(communicator or SilentCommunicator())
+    message_center.set_parser(UartMessageParser(CONFIGURATION))
+    message_center.setup()
+    return message_center
+
+
+def test_command_timeout_runs_next_message():
+    message_center = build_message_center()
+    results = []
+    finished = threading.Event()
+
+    def on_finished(**kwargs):
+        results.append(kwargs)
+        if len(results) == 2:
+            finished.set()
+
+    try:
+        for command in [[0x55, 0x55, 0x70, 0x47, 0x00, 0x5d, 0x5f],
+                        [0x55, 0x55, 0x67, 0x41, 0x00, 0x31, 0x0a]]:
+            message = message_center.build(command=command, timeout=0.1)
+            message.on('finished', on_finished)
+            message.send()
+
+        assert finished.wait(2)
+        assert [result['error'] for result in results] == ['Timeout', 'Timeout']
+        assert [result['packet_type'] for result in results] == ['pG', 'gA']
+    finally:
+        message_center.stop()
+
+
+def test_stop_wakes_up_threads():
+    message_center = build_message_center()
+    message_center.stop()
+    for thread in message_center.threads:
+        thread.join(1)
+        assert not thread.is_alive()
+
+
+def test_pipelined_messages_match_response_by_param_id():
+    message_center = build_message_center(ReorderingCommunicator())
+    message_center.set_pipeline_window(4)
+    results = {}
+    finished = threading.Event()
+
+    def build_on_finished(param_id):
+        def on_finished(**kwargs):
+            results[param_id] = kwargs
+            if len(results) == 4:
+                finished.set()
+        return on_finished
+
+    try:
+        for param_id in range(1, 5):
+            command = uart_frame(b'gP', struct.pack('<I', param_id))
+            message = message_center.build(
+                command=command, timeout=1, packet_type='gP', match_id=param_id)
+            message.on('finished', build_on_finished(param_id))
+            message.send()
+
+        assert finished.wait(2)
+        for param_id in range(1, 5):
+            assert not results[param_id]['error']
+            assert results[param_id]['data']['paramId'] == param_id
+            assert results[param_id]['data']['value'] == param_id * 10
+    finally:
+        message_center.stop()
@@ -0,0 +1,96 @@
+import sys
+import struct
+
+try:
+    from aceinna.framework.utils import crc
+    from aceinna.devices.base.message_parser_base import PACKET_CATEGORY
+    from aceinna.devices.parsers.rtk330l_message_parser import UartMessageParser
+    from aceinna.devices.parsers.ins401_message_parser import EthernetMessageParser
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils import crc
+    from aceinna.devices.base.message_parser_base import PACKET_CATEGORY
+    from aceinna.devices.parsers.rtk330l_message_parser import UartMessageParser
+    from aceinna.devices.parsers.ins401_message_parser import EthernetMessageParser
+
+
+def build_configuration():
+    return {
+        'userConfiguration': [],
+        'userMessages': {
+            'inputPackets': [{'name': 'pG'}],
+            'outputPackets': [{
+                'name': 'zT',
+                'payload': [
+                    {'type': 'uint32', 'name': 'time'},
+                    {'type': 'float', 'name': 'value'}
+                ]
+            }]
+        }
+    }
+
+
+def uart_frame(packet_type, payload):
+    body = packet_type + bytes([len(payload)]) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def ethernet_frame(packet_type, payload):
+    body = packet_type + struct.pack('<I', len(payload)) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def collect(parser, event_type):
+    messages = []
+    parser.on(event_type, lambda **kwargs: messages.append(kwargs))
+    return messages
+
+
+def test_dispatch_table_categories():
+    parser = UartMessageParser(build_configuration())
+    assert parser.get_dispatch('zT').category == PACKET_CATEGORY.OUTPUT
+    assert parser.get_dispatch('s1').category == PACKET_CATEGORY.OTHER_OUTPUT
+    assert parser.get_dispatch('pG').category == PACKET_CATEGORY.INPUT
+    assert parser.get_dispatch('pG').configuration == {'name': 'pG'}
+    assert parser.get_dispatch('xx') is None
+
+
+def test_dispatch_table_rebuilt_on_configuration_change():
+    configuration = build_configuration()
+    parser = UartMessageParser(configuration)
+    table = parser._dispatch_table  # pylint: disable=protected-access
+
+    parser.set_configuration(configuration)
+    assert parser._dispatch_table is table  # pylint: disable=protected-access
+
+    configuration = build_configuration()
+    configuration['userMessages']['outputPackets'][0]['name'] = 'zU'
+    parser.set_configuration(configuration)
+    assert parser.get_dispatch('zT') is None
+    assert parser.get_dispatch('zU').category == PACKET_CATEGORY.OUTPUT
+
+
+def test_uart_output_packet_is_decoded():
+    parser = UartMessageParser(build_configuration())
+    messages = collect(parser, 'continuous_message')
+
+    parser.analyse(b'\x00' + uart_frame(b'zT', struct.pack('<If', 100, 1.5)))
+    parser.analyse(uart_frame(b's1', b'\x00' * 4))
+    parser.analyse(uart_frame(b'xx', b'\x00' * 4))
+
+    assert len(messages) == 1
+    assert messages[0]['packet_type'] == 'zT'
+    assert list(messages[0]['data'].items()) == [('time', 100), ('value', 1.5)]
+
+
+def test_ethernet_other_output_packet_keeps_raw_payload():
+    parser = EthernetMessageParser(build_configuration())
+    messages = collect(parser, 'continuous_message')
+
+    frame = ethernet_frame(b'\x01\n', b'\x01\x02\x03')
+    parser.analyse(frame)
+
+    assert len(messages) == 1
+    assert messages[0]['packet_type'] == b'\x01\n'
+    assert bytes(messages[0]['data']) == b'\x01\x02\x03'
@@ -0,0 +1,82 @@
+import sys
+from functools import reduce
+
+try:
+    from aceinna.core.gnss import (NMEAParser, nmea_checksum, unicore_crc32)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.core.gnss import (NMEAParser, nmea_checksum, unicore_crc32)
+
+
+def bitwise_unicore_crc32(data):
+    crc = 0
+    for byte_data in data:
+        crc ^= byte_data
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0xEDB88320 if crc & 1 else crc >> 1
+    return crc
+
+
+def nmea(body):
+    checksum = reduce(lambda x, y: x ^ y, body.encode(), 0)
+    return '${0}*{1:02X}\r\n'.format(body, checksum).encode()
+
+
+def unicore(body):
+    return '#{0}*{1:08x}\r\n'.format(
+        body, bitwise_unicore_crc32(body.encode())).encode()
+
+
+GGA = nmea('GNGGA,080319.00,3130.4858508,N,12024.0998832,E,4,25,0.5,12.459,M,0.000,M,2.0,')
+RMC = nmea('GPRMC,080319.00,A,3130.4858508,N,12024.0998832,E,0.01,0.0,150321,,,D')
+HEADING = unicore('HEADINGA,COM1,0,66.5,FINE,2151,399993.000,0,0,18,0,0;'
+                  'SOL_COMPUTED,NARROW_INT,0.9623,291.4379,-0.1312,0.0,0.5,0.5,"999",19,13,13,13,3,01,0,f3')
+
+
+def test_checksums():
+    for size in [1, 2, 3, 7, 64, 81]:
+        data = bytes(range(size))
+        assert nmea_checksum(data) == reduce(lambda x, y: x ^ y, data, 0)
+    assert nmea_checksum(b'') == 0
+    data = bytes(range(256)) * 3
+    assert unicore_crc32(data) == bitwise_unicore_crc32(data)
+
+
+def test_sentences_split_across_blocks():
+    parser = NMEAParser()
+    stream = b'\x00garbage' + GGA + HEADING + RMC
+    sentences = []
+    for index in range(0, len(stream), 17):
+        sentences.extend(parser.receive(stream[index:index + 17]))
+
+    assert [(item.talker, item.sentence_type) for item in sentences] == \
+        [('GN', 'GGA'), ('', 'HEADINGA'), ('GP', 'RMC')]
+    assert all(item.checksum_passed for item in sentences)
+    assert sentences[0].raw == GGA
+    assert sentences[0].text == GGA[:-2].decode()
+    assert sentences[0].fields[5] == '4'
+    assert sentences[1].is_unicore
+
+
+def test_checksum_failure_and_restart():
+    parser = NMEAParser()
+    broken = bytearray(GGA)
+    broken[10] ^= 0x01
+    # a sentence cut by a new start is dropped
+    sentences = parser.receive(bytes(broken) + b'$GNZDA,0803' + RMC)
+
+    assert [item.checksum_passed for item in sentences] == [False, True]
+    assert sentences[1].raw == RMC
+    assert parser.checksum_failed_count == 1
+
+
+def test_emit_by_sentence_type():
+    parser = NMEAParser()
+    forwarded = []
+    parser.on('GGA', lambda sentence: forwarded.append(sentence.raw))
+
+    parser.receive(RMC + GGA + GGA[:20])
+    parser.receive(GGA[20:])
+
+    assert forwarded == [GGA, GGA]
@@ -0,0 +1,177 @@
+import sys
+import time
+import socket
+import threading
+
+try:
+    from aceinna.core.gnss import calc_crc
+    from aceinna.devices.widgets.ntrip_client import (NTRIPClient, NTRIPCaster)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.core.gnss import calc_crc
+    from aceinna.devices.widgets.ntrip_client import (NTRIPClient, NTRIPCaster)
+
+GGA = b'$GPGGA,080319.00,3130.4858508,N,12024.0998832,E,4,25,0.5,12.459,M,0.000,M,2.0,*6A\r\n'
+
+
+def rtcm_frame(payload):
+    header = bytes([0xD3, len(payload) >> 8, len(payload) & 0xFF])
+    crc_value = calc_crc(header + payload, len(header + payload))
+    return header + payload + crc_value.to_bytes(3, 'big')
+
+
+class StandInCaster(object):
+    '''
+    A local caster accepts the request, then sends the frames. The
+    connection is closed after the frames if drop is set.
+    '''
+
+    def __init__(self, frames, version=1, drop=False):
+        self.frames = frames
+        self.version = version
+        self.drop = drop
+        self.requests = []
+        self.received = []
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(5)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        request = b''
+        while b'\r\n\r\n' not in request:
+            request += conn.recv(1024)
+        self.requests.append(request)
+
+        if self.version == 2:
+            conn.sendall(b'HTTP/1.1 200 OK\r\nContent-Type: gnss/data\r\n'
+                         b'Transfer-Encoding: chunked\r\n\r\n')
+        else:
+            conn.sendall(b'ICY 200 OK\r\n')
+        conn.settimeout(0.2)
+        for frame in self.frames:
+            if self.version == 2:
+                frame = '{0:x}\r\n'.format(len(frame)).encode() + frame + b'\r\n'
+            conn.sendall(frame)
+            try:
+                self.received.append(conn.recv(1024))
+            except socket.timeout:
+                pass
+        if not self.drop:
+            time.sleep(5)
+        conn.close()
+
+    def close(self):
+        self.server.close()
+
+
+def unused_port():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def start_client(casters, count):
+    client = NTRIPClient(None, casters)
+    client.set_connect_headers({'Ntrip-Sn': '2179000001'})
+    packets = []
+    done = threading.Event()
+
+    def handle_parsed(data):
+        packets.append(bytes(data))
+        if len(packets) >= count:
+            done.set()
+
+    client.on('parsed', handle_parsed)
+    client.on('parsed', lambda data: client.send(GGA))
+    threading.Thread(target=client.run, daemon=True).start()
+    return client, packets, done
+
+
+def test_receive_and_send_position():
+    frames = [rtcm_frame(bytes([0x43, 0x50, index])) for index in range(5)]
+    caster = StandInCaster(frames)
+    client, packets, done = start_client(
+        [NTRIPCaster('127.0.0.1', caster.port, 'WX02', 'user', 'pass')], 5)
+
+    assert done.wait(3)
+    client.close()
+    caster.close()
+
+    assert packets == frames
+    assert caster.requests[0].startswith(b'GET /WX02 HTTP/1.1\r\n')
+    assert b'Ntrip-Sn: 2179000001\r\n' in caster.requests[0]
+    assert b'Authorization: Basic dXNlcjpwYXNz\r\n' in caster.requests[0]
+    assert GGA in caster.received
+
+
+def test_failover_to_backup_caster():
+    frames = [rtcm_frame(bytes([0x43, 0x50, index])) for index in range(3)]
+    backup = StandInCaster(frames, version=2)
+    down = NTRIPCaster('127.0.0.1', unused_port(), 'WX02')
+    client, packets, done = start_client(
+        [down, NTRIPCaster('127.0.0.1', backup.port, 'WX03', version=2)], 3)
+
+    assert done.wait(3)
+    client.close()
+    backup.close()
+
+    assert packets == frames
+    assert b'Ntrip-Version: Ntrip/2.0\r\n' in backup.requests[0]
+    status = client.get_statistics()
+    assert status[0]['consecutive_failures'] >= 1
+    assert status[1]['consecutive_failures'] == 0
+
+
+def test_reconnect_after_drop():
+    frames = [rtcm_frame(bytes([0x43, 0x50, index])) for index in range(2)]
+    caster = StandInCaster(frames, drop=True)
+    client, packets, done = start_client(
+        [NTRIPCaster('127.0.0.1', caster.port, 'WX02')], 6)
+
+    start = time.time()
+    assert done.wait(3)
+    elapsed = time.time() - start
+    client.close()
+    caster.close()
+
+    # dropped twice, reconnected in milliseconds rather than seconds
+    assert len(caster.requests) >= 3
+    assert elapsed < 2
+    # the last position is sent again after reconnect
+    assert caster.received.count(GGA) >= 2
+
+
+def test_close_stops_run():
+    client = NTRIPClient(None, [NTRIPCaster('127.0.0.1', unused_port(), 'WX02')])
+    thread = threading.Thread(target=client.run, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    client.close()
+    thread.join(2)
+
+    assert not thread.is_alive()
+
+
+def test_messages_of_one_read_emitted_alone():
+    client = NTRIPClient(None, [NTRIPCaster('127.0.0.1', unused_port(), 'WX02')])
+    packets = []
+    client.on('parsed', lambda data: packets.append(bytes(data)))
+    frames = [rtcm_frame(bytes([0x43, 0x50]) + bytes(500)) for _ in range(40)]
+
+    client.parser.receive(b''.join(frames))
+
+    # a 64 KiB read must not become one packet larger than the link MTU
+    assert packets == frames
@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+import math
+import struct
+import collections
+
+try:
+    from aceinna.devices.parsers import packet_decoder
+    from aceinna.devices.parsers.ins401_packet_parser import common_continuous_parser
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.devices.parsers import packet_decoder
+    from aceinna.devices.parsers.ins401_packet_parser import common_continuous_parser
+
+SETTING_FILE = os.path.join(
+    os.path.dirname(__file__), '..', 'src', 'aceinna', 'setting',
+    'INS401', 'RTK_INS', 'ins401.json')
+
+
+def load_output_packets():
+    with open(SETTING_FILE) as json_data:
+        return json.load(json_data)['userMessages']['outputPackets']
+
+
+def reference_parse(payload, configuration):
+    '''
+    The former pack/unpack implementation of common_continuous_parser
+    '''
+    pack_fmt = '<' + ''.join(
+        packet_decoder.PAYLOAD_TYPE_FORMATS[value['type']]
+        for value in configuration['payload'])
+    length = struct.calcsize(pack_fmt)
+    names = [value['name'] for value in configuration['payload']]
+
+    if configuration.get('isList', 0) == 1:
+        data = []
+        for i in range(len(payload) // length):
+            item = struct.unpack(pack_fmt, bytes(payload[i*length:(i+1)*length]))
+            data.append(collections.OrderedDict(zip(names, item)))
+        return data
+
+    try:
+        item = struct.unpack(pack_fmt, bytes(payload))
+    except struct.error:
+        return None
+    return collections.OrderedDict(
+        (name, 0 if isinstance(value, float) and math.isnan(value) else value)
+        for name, value in zip(names, item))
+
+
+def test_decode_matches_reference():
+    for configuration in load_output_packets():
+        decoder = packet_decoder.get_output_decoder(configuration)
+        count = 3 if decoder.is_list else 1
+        for _ in range(20):
+            payload = list(os.urandom(decoder.size * count))
+            expected = reference_parse(payload, configuration)
+            actual = common_continuous_parser(payload, configuration)
+            # compare through repr so NaN in list packets compares equal
+            assert repr(actual) == repr(expected)
+
+
+def test_decode_filters_nan_and_rejects_bad_length():
+    configuration = {
+        'name': 'tT',
+        'payload': [
+            {'type': 'uint16', 'name': 'week'},
+            {'type': 'double', 'name': 'value'}
+        ]
+    }
+    decoder = packet_decoder.OutputPacketDecoder(configuration)
+    payload = struct.pack('<Hd', 7, float('nan'))
+
+    data = decoder.decode(payload)
+    assert list(data.items()) == [('week', 7), ('value', 0)]
+    assert decoder.decode_from(b'\x00' + payload, 1, len(payload)) == data
+    assert decoder.decode(payload[:-1]) is None
+    assert packet_decoder.get_output_decoder(configuration) is \
+        packet_decoder.get_output_decoder(configuration)
@@ -0,0 +1,111 @@
+import sys
+import time
+
+try:
+    from aceinna.core.packet_statistics import (
+        PacketStatistics, RateCounter, LatencyHistogram)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.core.packet_statistics import (
+        PacketStatistics, RateCounter, LatencyHistogram)
+
+
+def test_instances_are_independent():
+    first = PacketStatistics()
+    second = PacketStatistics()
+    first.collect('success', 'pS', 100.0)
+
+    assert first.get_result()['pS']['received'] == 1
+    assert second.get_result() is None
+
+
+def test_rate_windows():
+    counter = RateCounter()
+    # 100 Hz for 30 seconds, then 10 Hz for 30 seconds
+    for index in range(3000):
+        counter.add(1000.005 + index * 0.01)
+    for index in range(300):
+        counter.add(1030.05 + index * 0.1)
+
+    rate_1s, rate_10s, rate_60s = counter.get_rates(1059.99)
+    assert rate_1s == 10
+    assert rate_10s == 10
+    assert rate_60s == 55
+
+
+def test_rate_drops_to_zero_when_idle():
+    counter = RateCounter()
+    for index in range(100):
+        counter.add(0.005 + index * 0.01)
+
+    assert counter.get_rates(0.999) == [100, 100, 100]
+    # a window not filled is divided by the time passed
+    assert counter.get_rates(5.05) == [0, 19.6, 19.6]
+    assert counter.get_rates(120) == [0, 0, 0]
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for value in range(1, 10001):
+        histogram.record(value)
+
+    result = histogram.get_result()
+    assert result['count'] == 10000
+    assert result['min'] == 1
+    assert result['max'] == 10000
+    assert abs(result['p50'] - 5000) <= 5000 * 0.07
+    assert abs(result['p99'] - 9900) <= 9900 * 0.07
+
+
+def test_gap_detection():
+    statistics = PacketStatistics()
+    event_time = 100.0
+    for _ in range(200):
+        event_time += 0.01
+        statistics.collect('success', 'iN', event_time)
+    # lose 9 packets
+    event_time += 0.1
+    statistics.collect('success', 'iN', event_time)
+
+    result = statistics.get_result()['iN']
+    assert result['gaps'] == 1
+    assert result['missing'] == 9
+    assert abs(result['interval_us']['p50'] - 10000) <= 10000 * 0.07
+
+
+def test_sequence_drops_and_resets():
+    statistics = PacketStatistics()
+    for sequence in [1000, 1010, 1020, 1050, 1060, 0, 10]:
+        statistics.collect('success', 's1', 100.0, sequence=sequence)
+
+    result = statistics.get_result()['s1']
+    assert result['sequence_drops'] == 2
+    assert result['sequence_resets'] == 1
+
+
+def test_latency_and_failures():
+    statistics = PacketStatistics()
+    statistics.collect('success', 'gN', 100.0, latency=0.002)
+    statistics.collect('fail', 'gN', 100.0)
+
+    result = statistics.get_result()['gN']
+    assert result['failures'] == 1
+    assert result['latency_us']['max'] == 2000
+
+    assert statistics.get_result() is None
+    statistics.reset()
+    assert statistics.get_result()['gN']['received'] == 0
+
+
+def test_rate_of_stopped_stream_drops_without_now():
+    statistics = PacketStatistics()
+    start = time.time() - 30
+    for index in range(100):
+        statistics.collect('success', 'pS', start + index * 0.01)
+
+    # nothing received for about 29 seconds
+    rates = statistics.get_result()['pS']['rates']
+    assert rates['1s'] == 0
+    assert rates['10s'] == 0
+    assert 0 < rates['60s'] < 100
@@ -0,0 +1,111 @@
+import sys
+import time
+import socket
+import struct
+import threading
+
+try:
+    from aceinna.framework.utils import crc
+    from aceinna.framework.communicators import raw_socket
+    from aceinna.framework.communicators.ethernet_100base_t1 import Ethernet
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils import crc
+    from aceinna.framework.communicators import raw_socket
+    from aceinna.framework.communicators.ethernet_100base_t1 import Ethernet
+
+DEVICE_MAC = '04:00:00:00:00:04'
+HOST_MAC = 'a0:b1:c2:d3:e4:f5'
+
+
+def run_filter(instructions, frame):
+    '''
+    Minimal classic BPF interpreter for the opcodes used by the filter
+    '''
+    pc = 0
+    acc = 0
+    while True:
+        code, jt, jf, k = instructions[pc]
+        pc += 1
+        if code == raw_socket.BPF_LD_W_ABS:
+            acc = struct.unpack('>I', frame[k:k + 4])[0]
+        elif code == raw_socket.BPF_LD_H_ABS:
+            acc = struct.unpack('>H', frame[k:k + 2])[0]
+        elif code == raw_socket.BPF_JEQ_K:
+            pc += jt if acc == k else jf
+        elif code == raw_socket.BPF_RET_K:
+            return k
+        else:
+            raise ValueError('unexpected opcode')
+
+
+def ethernet_frame(src_mac, packet_type, payload=b''):
+    body = packet_type + struct.pack('<I', len(payload)) + payload
+    packet = b'UU' + body + crc.crc16_bytes(body)
+    return raw_socket.mac_to_bytes(HOST_MAC) + raw_socket.mac_to_bytes(src_mac) + \
+        struct.pack('<H', len(packet)) + packet
+
+
+class FakeSocket(object):
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.options = []
+        self.sent = []
+
+    def setsockopt(self, *args):
+        self.options.append(args)
+
+    def settimeout(self, value):
+        pass
+
+    def recv_into(self, buffer, nbytes):
+        if not self.frames:
+            time.sleep(0.01)
+            raise socket.timeout()
+        frame = self.frames.pop(0)
+        buffer[:len(frame)] = frame
+        return len(frame)
+
+    def send(self, data):
+        self.sent.append(bytes(data))
+
+    def close(self):
+        pass
+
+
+def test_src_mac_filter():
+    macs = [DEVICE_MAC, '11:22:33:44:55:66']
+    instructions = raw_socket.build_src_mac_filter(macs)
+    for mac in macs:
+        assert run_filter(instructions, ethernet_frame(mac, b'\x01\n')) > 0
+    assert run_filter(instructions, ethernet_frame('04:00:00:00:00:05', b'\x01\n')) == 0
+    assert run_filter(instructions, ethernet_frame('14:00:00:00:00:04', b'\x01\n')) == 0
+
+
+def test_sniffer_passes_memoryview_frames_to_ethernet():
+    frames = [ethernet_frame(DEVICE_MAC, b'\x01\n', bytes([i] * 10))
+              for i in range(50)]
+    fake_socket = FakeSocket(frames)
+    ethernet = Ethernet()
+    received = threading.Event()
+
+    def handle_frame(frame):
+        ethernet.handle_raw_frame(frame)
+        if len(ethernet.receive_cache) == len(frames):
+            received.set()
+
+    sniffer = raw_socket.RawSocketSniffer(
+        'veth0', handle_frame, src_macs=[DEVICE_MAC],
+        socket_factory=lambda iface: fake_socket, chunk_size=4096)
+    sniffer.start()
+    try:
+        assert received.wait(2)
+    finally:
+        sniffer.stop()
+
+    assert len(fake_socket.options) == 1
+    for frame in frames:
+        cached = ethernet.read()
+        assert isinstance(cached, memoryview)
+        assert bytes(cached) == frame[14:]
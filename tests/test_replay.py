@@ -0,0 +1,148 @@
+import sys
+import os
+import glob
+import time
+import struct
+import tempfile
+
+try:
+    from aceinna.models import WebserverArgs
+    from aceinna.core.driver import Driver
+    from aceinna.framework import log_writer
+    from aceinna.framework.utils import resource
+    from aceinna.framework.communicator import CommunicatorFactory
+    from aceinna.framework.communicators.replay import (EthernetReplay, UartReplay)
+    from aceinna.framework.utils import (crc, helper)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.models import WebserverArgs
+    from aceinna.core.driver import Driver
+    from aceinna.framework import log_writer
+    from aceinna.framework.utils import resource
+    from aceinna.framework.communicator import CommunicatorFactory
+    from aceinna.framework.communicators.replay import (EthernetReplay, UartReplay)
+    from aceinna.framework.utils import (crc, helper)
+
+
+def build_frame(packet_type, payload):
+    body = packet_type + struct.pack('<I', len(payload)) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def imu_frame(time_of_week):
+    return build_frame(b'\x01\n', struct.pack('<HI6f', 2200, time_of_week, *range(6)))
+
+
+def create_replay(path, speed):
+    options = WebserverArgs(interface='replay', replay_file=path, replay_speed=speed)
+    return CommunicatorFactory.create('replay', options)
+
+
+def test_ethernet_replay():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'user_1.bin')
+        frames = [imu_frame(1000 + i * 10) for i in range(200)]
+        with open(path, 'wb') as log_file:
+            log_file.write(b''.join(frames))
+
+        replay = create_replay(path, 'max')
+        assert isinstance(replay, EthernetReplay)
+
+        # the ping is answered from the profile, no recorded data before
+        # the device is confirmed
+        command = helper.build_ethernet_packet(
+            replay.get_dst_mac(), replay.get_src_mac(), [0x01, 0xcc])
+        replay.write(command.actual_command)
+        response = replay.read_batch()
+        assert len(response) == 1 and response[0][2:4] == b'\x01\xcc'
+        assert response[0][8:-2].startswith(b'INS401')
+        assert replay.read_batch() == []
+
+        replay.start_replay()
+        replay.write(command.actual_command)
+        received = replay.read_batch(50)
+        assert received[0][2:4] == b'\x01\xcc'
+        assert received[1:] == frames[:49]
+        received = replay.read_batch(1000)
+        assert received == frames[49:]
+        assert replay.finished
+
+        replay.close()
+
+
+def test_ethernet_replay_in_real_time():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'user_1.bin')
+        with open(path, 'wb') as log_file:
+            for i in range(100):
+                log_file.write(imu_frame(1000 + i * 1000))
+
+        replay = create_replay(path, '1')
+        replay.start_replay()
+        # frames of the first second
+        assert len(replay.read_batch()) == 1
+        assert not replay.finished
+        # the read waits for the time of next frame
+        start = time.time()
+        frame = replay.read(timeout=2)
+        assert frame is not None and 0.5 < time.time() - start < 1.5
+        replay.close()
+
+
+def test_uart_replay():
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, 'user_1.bin')
+        data = b''
+        for i in range(100):
+            body = b's1' + bytes([10]) + bytes([i]) * 10
+            data += b'UU' + body + crc.crc16_bytes(body)
+        with open(path, 'wb') as log_file:
+            log_file.write(data)
+
+        replay = create_replay(path, 'max')
+        assert isinstance(replay, UartReplay)
+        assert os.listdir(folder) == ['user_1.bin']
+
+        replay.write(helper.build_input_packet('pG'))
+        response = replay.read(1000)
+        assert response[2:4] == b'pG' and response[5:-2].startswith(b'RTK330L')
+
+        # the commands not in profile are answered with an empty payload
+        replay.write(helper.build_input_packet('gA'))
+        replay.write(helper.build_input_packet('xx'))
+        response = replay.read(1000)
+        assert response[2:5] == b'gA\x00' and response[9:12] == b'xx\x00'
+
+        replay.start_replay()
+        received = b''
+        while not replay.finished:
+            received += replay.read(100)
+        assert received == data
+
+
+def test_replay_logged_by_provider(monkeypatch):
+    with tempfile.TemporaryDirectory() as folder:
+        monkeypatch.setattr(resource, 'get_executor_path', lambda: folder)
+        path = os.path.join(folder, 'user_1.bin')
+        data = b''.join(imu_frame(1000 + i * 10) for i in range(500))
+        with open(path, 'wb') as log_file:
+            log_file.write(data)
+
+        options = WebserverArgs(interface='replay', replay_file=path,
+                                replay_speed='max', use_cli=True)
+        driver = Driver(options)
+        driver.detect()
+        user_log = driver._device_provider.user_logf
+        end_time = time.time() + 10
+        while user_log.written_size < len(data) and time.time() < end_time:
+            user_log.flush()
+            time.sleep(0.05)
+        driver._device_provider.close()
+        log_writer.close_all()
+
+        # no recorded data is read before the provider opens its logs
+        logs = glob.glob(os.path.join(folder, 'data', '*', 'user_*.bin'))
+        assert len(logs) == 1
+        with open(logs[0], 'rb') as log_file:
+            assert log_file.read() == data
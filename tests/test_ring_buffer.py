@@ -0,0 +1,126 @@
+import sys
+import time
+import threading
+
+try:
+    from aceinna.framework.utils.ring_buffer import (
+        FrameRingBuffer, OVERFLOW_POLICY)
+    from aceinna.framework.communicators.ethernet_100base_t1 import Ethernet
+    from aceinna.framework.context import APP_CONTEXT
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils.ring_buffer import (
+        FrameRingBuffer, OVERFLOW_POLICY)
+    from aceinna.framework.communicators.ethernet_100base_t1 import Ethernet
+    from aceinna.framework.context import APP_CONTEXT
+
+
+def test_batch_read_wraps_around():
+    buffer = FrameRingBuffer(4)
+    for i in range(3):
+        buffer.put(i)
+    assert buffer.get_batch(2) == [0, 1]
+    for i in range(3, 6):
+        buffer.put(i)
+    assert buffer.get_batch(10) == [2, 3, 4, 5]
+    assert buffer.get() is None
+    assert buffer.get_batch(10) == []
+    assert buffer.high_watermark == 4
+    assert buffer.dropped_count == 0
+
+
+def test_drop_oldest_and_drop_newest():
+    oldest = FrameRingBuffer(3, OVERFLOW_POLICY.DROP_OLDEST)
+    newest = FrameRingBuffer(3, OVERFLOW_POLICY.DROP_NEWEST)
+    for i in range(5):
+        oldest.put(i)
+        newest.put(i)
+
+    assert oldest.get_batch(10) == [2, 3, 4]
+    assert newest.get_batch(10) == [0, 1, 2]
+    assert oldest.dropped_count == 2
+    assert newest.dropped_count == 2
+
+
+def test_block_waits_for_reader():
+    buffer = FrameRingBuffer(2, OVERFLOW_POLICY.BLOCK, block_timeout=2)
+    buffer.put(0)
+    buffer.put(1)
+
+    def read_later():
+        time.sleep(0.1)
+        buffer.get()
+
+    reader = threading.Thread(target=read_later)
+    reader.start()
+    assert buffer.put(2)
+    reader.join()
+    assert buffer.get_batch(10) == [1, 2]
+    assert buffer.dropped_count == 0
+
+    buffer = FrameRingBuffer(1, OVERFLOW_POLICY.BLOCK, block_timeout=0.05)
+    buffer.put(0)
+    assert not buffer.put(1)
+    assert buffer.dropped_count == 1
+
+
+def test_get_waits_for_frame():
+    buffer = FrameRingBuffer(2)
+
+    def write_later():
+        time.sleep(0.1)
+        buffer.put(0)
+
+    writer = threading.Thread(target=write_later)
+    start = time.time()
+    writer.start()
+    assert buffer.get(2) == 0
+    writer.join()
+    assert time.time() - start < 1
+
+    start = time.time()
+    assert buffer.get(0.05) is None
+    assert time.time() - start >= 0.05
+
+
+def test_get_batch_waits_for_frame():
+    buffer = FrameRingBuffer(4)
+    assert buffer.get_batch(10) == []
+
+    def write_later():
+        time.sleep(0.1)
+        buffer.put(0)
+
+    writer = threading.Thread(target=write_later)
+    start = time.time()
+    writer.start()
+    assert buffer.get_batch(10, 2) == [0]
+    writer.join()
+    assert time.time() - start < 1
+
+    start = time.time()
+    assert buffer.get_batch(10, 0.05) == []
+    assert time.time() - start >= 0.05
+
+
+class FakeOptions(object):
+    device_type = 'auto'
+    host_mac = 'auto'
+    unit_sn = 'auto'
+    eth_backend = 'scapy'
+    eth_buffer_size = 2
+    eth_overflow = OVERFLOW_POLICY.DROP_NEWEST
+
+
+def test_ethernet_counters_in_statistics():
+    ethernet = Ethernet(FakeOptions())
+    frame = bytes(14) + b'\x00\x0aUU\x01\n' + bytes(6)
+    for _ in range(3):
+        ethernet.handle_raw_frame(frame)
+
+    counters = APP_CONTEXT.statistics.get_buffer_result()['ethernet_receive']
+    assert counters['dropped'] == 1
+    assert counters['high_watermark'] == 2
+    assert len(ethernet.read_batch(10)) == 2
+    assert ethernet.read() is None
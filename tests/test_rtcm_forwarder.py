@@ -0,0 +1,103 @@
+import sys
+import time
+import threading
+
+try:
+    from aceinna.models import WebserverArgs
+    from aceinna.framework.utils import helper
+    from aceinna.devices.widgets.rtcm_forwarder import (
+        RTCMForwarder, EthernetRTCMPacker, create_rtcm_forwarder)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.models import WebserverArgs
+    from aceinna.framework.utils import helper
+    from aceinna.devices.widgets.rtcm_forwarder import (
+        RTCMForwarder, EthernetRTCMPacker, create_rtcm_forwarder)
+
+DST_MAC = bytes([0x00, 0x11, 0x22, 0x33, 0x44, 0x55])
+SRC_MAC = bytes([0xa0, 0xb1, 0xc2, 0xd3, 0xe4, 0xf5])
+
+
+def message(size, value=0):
+    return bytes([0xD3, size >> 8, size & 0xFF]) + bytes([value]) * size + bytes(3)
+
+
+def test_packet_same_as_helper():
+    packer = EthernetRTCMPacker(DST_MAC, SRC_MAC)
+    for size in [1, 10, 30, 200, 1400]:
+        payload = bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+        expected = helper.build_ethernet_packet(
+            DST_MAC, SRC_MAC, b'\x02\x0b', list(payload)).actual_command
+        assert packer.pack(payload) == expected
+
+
+def test_coalesce_up_to_max_size():
+    written = []
+    forwarder = RTCMForwarder(written.append, max_size=100, max_latency=10)
+    messages = [message(20, index) for index in range(8)]
+    for item in messages:
+        forwarder.put(item)
+
+    # 26 bytes a message, 3 messages fit in 100 bytes
+    assert written == [b''.join(messages[0:3]), b''.join(messages[3:6])]
+    forwarder.close()
+    assert written[-1] == b''.join(messages[6:8])
+
+    statistics = forwarder.get_statistics()
+    assert statistics['frames'] == 8
+    assert statistics['packets'] == 3
+    assert statistics['bytes'] == 26 * 8
+
+
+def test_flush_after_max_latency():
+    written = []
+    done = threading.Event()
+
+    def write(data):
+        written.append((time.monotonic(), data))
+        done.set()
+
+    forwarder = RTCMForwarder(write, max_size=1400, max_latency=0.02)
+    start = time.monotonic()
+    forwarder.put(message(10, 1))
+    forwarder.put(message(10, 2))
+
+    assert done.wait(1)
+    assert written[0][1] == message(10, 1) + message(10, 2)
+    assert written[0][0] - start >= 0.02
+    assert forwarder.get_statistics()['max_latency_ms'] >= 20
+    forwarder.close()
+
+
+def test_large_message_written_alone():
+    written = []
+    forwarder = RTCMForwarder(written.append, max_size=100, max_latency=10)
+    forwarder.put(message(10))
+    forwarder.put(message(300))
+    forwarder.put(message(10, 1))
+    forwarder.close()
+
+    assert written == [message(10), message(300), message(10, 1)]
+
+
+def test_write_error_counted():
+    def write(data):
+        raise IOError('port closed')
+
+    forwarder = RTCMForwarder(write, max_size=10, max_latency=0)
+    forwarder.put(message(10))
+
+    assert forwarder.error_count == 1
+    assert forwarder.last_error == 'port closed'
+
+
+def test_latency_of_options():
+    written = []
+    forwarder = create_rtcm_forwarder(
+        written.append, WebserverArgs(rtcm_latency='0'))
+    forwarder.put(message(10))
+    assert forwarder.max_latency == 0 and len(written) == 1
+
+    forwarder = create_rtcm_forwarder(written.append, WebserverArgs())
+    assert forwarder.max_latency == 0.02
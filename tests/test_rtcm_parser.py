@@ -0,0 +1,74 @@
+import sys
+import random
+
+try:
+    from aceinna.core.gnss import (RTCMParser, calc_crc)
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.core.gnss import (RTCMParser, calc_crc)
+
+
+def bitwise_crc24q(data):
+    crc = 0
+    for byte_data in data:
+        crc ^= byte_data << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+    return crc & 0xFFFFFF
+
+
+def rtcm_frame(payload):
+    header = bytes([0xD3, len(payload) >> 8, len(payload) & 0xFF])
+    crc_value = bitwise_crc24q(header + payload)
+    return header + payload + crc_value.to_bytes(3, 'big')
+
+
+def collect(parser):
+    packets = []
+    parser.on('parsed', packets.extend)
+    return packets
+
+
+def test_crc_matches_bitwise_crc():
+    rand = random.Random(24)
+    for _ in range(50):
+        data = bytes(rand.getrandbits(8) for _ in range(rand.randint(0, 300)))
+        assert calc_crc(data, len(data)) == bitwise_crc24q(data)
+        assert calc_crc(list(data), len(data)) == bitwise_crc24q(data)
+
+
+def test_frames_across_receive_calls():
+    rand = random.Random(3)
+    frames = [rtcm_frame(bytes(rand.getrandbits(8)
+                               for _ in range(rand.randint(0, 1023))))
+              for _ in range(100)]
+    stream = b''
+    for frame in frames:
+        stream += bytes(rand.getrandbits(8) & 0x7F for _ in range(rand.randint(0, 5)))
+        stream += frame
+
+    parser = RTCMParser()
+    packets = collect(parser)
+    start = 0
+    while start < len(stream):
+        end = start + rand.randint(1, 1500)
+        parser.receive(stream[start:end])
+        start = end
+
+    assert packets == frames
+    assert all(isinstance(packet, bytes) for packet in packets)
+    assert parser.get_statistics()['valid_packet_count'] == 100
+
+
+def test_resync_after_crc_failure():
+    frames = [rtcm_frame(bytes([i]) * 20) for i in range(3)]
+    parser = RTCMParser()
+    packets = collect(parser)
+    # the first frame is cut, its length covers the header of next frame
+    parser.receive(frames[0][:10] + frames[1] + frames[2])
+
+    assert packets == frames[1:]
+    assert parser.crc_failed_count == 1
@@ -0,0 +1,172 @@
+import sys
+import os
+import json
+import random
+
+try:
+    from aceinna.framework.utils import (crc, helper)
+    from aceinna.devices.parsers.uart_framer import UartFramer
+    from aceinna.devices.parsers.rtk350l_message_parser import UartMessageParser
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.framework.utils import (crc, helper)
+    from aceinna.devices.parsers.uart_framer import UartFramer
+    from aceinna.devices.parsers.rtk350l_message_parser import UartMessageParser
+
+SETTING_FILE = os.path.join(
+    os.path.dirname(__file__), '..', 'src', 'aceinna', 'setting',
+    'RTK330L', 'RTK_INS', 'RTK330L.json')
+
+BEIDOU_PACKET_TYPES = ['s1', 'gN', 'iN', 's2', 'o1', 'hG', 'gB', 'uB', 'sC']
+
+
+def load_configuration():
+    with open(SETTING_FILE) as json_data:
+        return json.load(json_data)
+
+
+def uart_frame(packet_type, payload):
+    body = packet_type.encode() + bytes([len(payload)]) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def reference_analyse(data, packet_types=None):
+    '''
+    The former byte by byte state machine of the UART parsers, packet_types
+    is the userPacketsTypeList of the Beidou parser
+    '''
+    frames = []
+    frame = []
+    window = []
+    find_header = False
+    payload_len = 0
+    for data_block in data:
+        if find_header:
+            frame.append(data_block)
+            if len(frame) == 5:
+                payload_len = data_block
+            elif len(frame) == 5 + payload_len + 2:
+                packet_type = ''.join(['%c' % x for x in frame[2:4]])
+                result = helper.calc_crc(frame[2:-2])
+                frames.append((packet_type, bytes(frame), result == frame[-2:]))
+                find_header = False
+                payload_len = 0
+                window = []
+        else:
+            window = (window + [data_block])[-4 if packet_types else -2:]
+            if window[0:2] != [0x55, 0x55]:
+                continue
+            if packet_types is None:
+                frame = window[:]
+                find_header = True
+            elif len(window) == 4 and \
+                    ''.join(['%c' % x for x in window[2:4]]) in packet_types:
+                frame = window[:]
+                find_header = True
+    return frames
+
+
+def reference_parse_buffer(data_buffer):
+    '''
+    The former Queue based helper._parse_buffer
+    '''
+    response = {'parsed': False, 'parsed_end_index': 0, 'result': []}
+    data = list(data_buffer)
+    index = 0
+    parsed_data = []
+    while index < len(data):
+        byte_item = data[index]
+        index += 1
+        parsed_data = (parsed_data + [byte_item])[-2:]
+        if parsed_data != [0x55, 0x55]:
+            continue
+        if index + 3 > len(data):
+            break
+        packet_type = ''.join(['%c' % x for x in data[index:index + 2]])
+        packet_len = data[index + 2]
+        if len(data) - index - 3 < packet_len:
+            break
+        response['parsed'] = True
+        response['result'].append({
+            'type': packet_type,
+            'data': data[index + 3:index + 3 + packet_len]})
+        index += 3 + packet_len
+        response['parsed_end_index'] = index
+        parsed_data = []
+    return response
+
+
+def build_stream(rand, packet_types, garbage=b'\x00\x01\xaa\xfe'):
+    stream = bytearray()
+    for _ in range(300):
+        if rand.random() < 0.3:
+            stream.extend(rand.choice(garbage) for _ in range(rand.randint(1, 20)))
+        packet_type = rand.choice(packet_types)
+        payload = bytes(rand.getrandbits(8) for _ in range(rand.randint(0, 80)))
+        stream.extend(uart_frame(packet_type, payload))
+    return bytes(stream)
+
+
+def feed_in_chunks(rand, framer, stream):
+    frames = []
+    start = 0
+    while start < len(stream):
+        end = start + rand.randint(1, 300)
+        frames.extend(framer.feed(stream[start:end]))
+        start = end
+    return frames
+
+
+def test_framer_matches_reference_parser():
+    rand = random.Random(9)
+    packet_types = [item['name'] for item in
+                    load_configuration()['userMessages']['outputPackets']]
+    stream = build_stream(rand, packet_types)
+
+    expected = reference_analyse(stream)
+    assert len(expected) == 300
+    assert feed_in_chunks(rand, UartFramer(), stream) == expected
+
+
+def test_framer_with_packet_types_matches_reference_parser():
+    rand = random.Random(10)
+    # headers of unknown packet type are in the garbage
+    stream = build_stream(rand, BEIDOU_PACKET_TYPES, garbage=b'\x00UUzqx')
+
+    expected = reference_analyse(stream, BEIDOU_PACKET_TYPES)
+    assert len(expected) == 300
+    assert feed_in_chunks(rand, UartFramer(BEIDOU_PACKET_TYPES), stream) == expected
+
+
+def test_resync_after_crc_failure():
+    frames = [uart_frame('s1', bytes(range(i, i + 10))) for i in range(3)]
+    # the first frame is cut, its length byte covers part of the next frame
+    stream = frames[0][:8] + frames[1] + frames[2]
+
+    result = UartFramer().feed(stream)
+    assert result[0][2] is False
+    assert [item[1] for item in result if item[2]] == frames[1:]
+    assert [item[1] for item in reference_analyse(stream) if item[2]] == frames[2:]
+
+
+def test_parser_emits_every_frame():
+    configuration = load_configuration()
+    parser = UartMessageParser(configuration)
+    received = []
+    parser.on('continuous_message',
+              lambda **kwargs: received.append(kwargs['packet_type']))
+
+    # other output packets are emitted with the payload
+    stream = b'\x00' * 3
+    for packet_type in ['S2', 'iB'] * 5:
+        stream += uart_frame(packet_type, b'UU' * 10)
+    parser.analyse(stream)
+    assert len(received) == 10
+
+
+def test_parse_buffer_matches_reference():
+    rand = random.Random(11)
+    for _ in range(200):
+        data = bytes(rand.choice(b'UUU\x00\x01\x02\x05\x10') for _ in range(rand.randint(0, 60)))
+        assert helper._parse_buffer(list(data)) == reference_parse_buffer(data)
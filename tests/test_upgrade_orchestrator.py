@@ -0,0 +1,196 @@
+import sys
+import time
+import threading
+
+try:
+    from aceinna.models import WebserverArgs
+    from aceinna.core.event_base import EventBase
+    from aceinna.core.fleet_driver import FleetDriver
+    from aceinna.framework.communicators.serial_fleet import SerialFleet
+    from aceinna.devices.upgrade_orchestrator import UpgradeOrchestrator
+    from aceinna.devices.upgrade_workers import UPGRADE_EVENT
+except:  # pylint: disable=bare-except
+    print('load package from local')
+    sys.path.append('./src')
+    from aceinna.models import WebserverArgs
+    from aceinna.core.event_base import EventBase
+    from aceinna.core.fleet_driver import FleetDriver
+    from aceinna.framework.communicators.serial_fleet import SerialFleet
+    from aceinna.devices.upgrade_orchestrator import UpgradeOrchestrator
+    from aceinna.devices.upgrade_workers import UPGRADE_EVENT
+
+
+class Counter(object):
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.reads = 0
+        self.lock = threading.Lock()
+
+
+class FakeProvider(EventBase):
+    '''
+    Upgrade in a thread like the providers, emits progress, then restart or
+    failure
+    '''
+
+    def __init__(self, counter, fail=False):
+        super(FakeProvider, self).__init__()
+        self.counter = counter
+        self.fail = fail
+        self.is_upgrading = False
+        self.exclusive_upgrade = True
+        self.upgraded_content = None
+        self._preloaded_firmware = None
+
+    def preload_firmware(self, file, firmware_content):
+        self._preloaded_firmware = (file, firmware_content)
+
+    def download_firmware(self, file):
+        if self._preloaded_firmware and self._preloaded_firmware[0] == file:
+            return True, self._preloaded_firmware[1]
+        with self.counter.lock:
+            self.counter.reads += 1
+        return True, b'firmware of ' + file.encode()
+
+    def upgrade_framework(self, params):
+        self.is_upgrading = True
+        threading.Thread(target=self._upgrade, args=(params[1],)).start()
+
+    def _upgrade(self, file):
+        with self.counter.lock:
+            self.counter.running += 1
+            self.counter.max_running = max(
+                self.counter.max_running, self.counter.running)
+        _, content = self.download_firmware(file)
+        self.upgraded_content = content
+        for current in list(range(0, len(content), 4)) + [len(content)]:
+            self.emit('continous', 'upgrade_progress',
+                      {'addr': current, 'fs_len': len(content)})
+            time.sleep(0.005)
+        with self.counter.lock:
+            self.counter.running -= 1
+        if self.fail:
+            self.is_upgrading = False
+            self.emit('upgrade_failed', 'UPGRADE.FAILED.001', 'no ack')
+            return
+        self.emit('upgrade_restart')
+        self.is_upgrading = False
+
+
+def test_upgrade_with_concurrency_limit():
+    counter = Counter()
+    providers = dict(('unit-{0}'.format(index), FakeProvider(counter))
+                     for index in range(6))
+    orchestrator = UpgradeOrchestrator(providers, max_concurrency=2)
+    progress = {}
+    orchestrator.on(UPGRADE_EVENT.PROGRESS,
+                    lambda key, current, total: progress.__setitem__(key, current))
+
+    result = orchestrator.run(['upgrade', 'INS401.bin'])
+
+    assert result['succeeded'] == 6
+    assert result['failed'] == 0
+    assert result['units_per_hour'] > 0
+    assert counter.max_running == 2
+    # the firmware is read once, and shared by the devices
+    assert counter.reads == 1
+    contents = [provider.upgraded_content for provider in providers.values()]
+    assert all(content is contents[0] for content in contents)
+    assert progress == dict((key, len(contents[0])) for key in providers)
+    assert all(provider.exclusive_upgrade for provider in providers.values())
+
+
+def test_failure_is_reported_per_unit():
+    counter = Counter()
+    providers = {
+        'good': FakeProvider(counter),
+        'bad': FakeProvider(counter, fail=True)
+    }
+    orchestrator = UpgradeOrchestrator(providers, max_concurrency=4)
+    errors = []
+    orchestrator.on(UPGRADE_EVENT.ERROR,
+                    lambda key, message: errors.append((key, message)))
+
+    result = orchestrator.run(['upgrade', 'INS401.bin'])
+
+    assert result['units']['good']['status'] == 'success'
+    assert result['units']['bad']['status'] == 'failed'
+    assert errors == [('bad', 'no ack')]
+    # the listeners of orchestrator are removed after upgrade
+    assert providers['bad'].listeners['upgrade_failed'] == []
+
+
+def test_unit_timeout():
+    counter = Counter()
+    provider = FakeProvider(counter)
+    provider.upgrade_framework = lambda params: None
+
+    orchestrator = UpgradeOrchestrator({'idle': provider}, timeout=0.05)
+    result = orchestrator.run(['upgrade', 'INS401.bin'])
+
+    assert result['units']['idle']['message'] == 'Upgrade timeout'
+    assert result['units_per_hour'] == 0
+
+
+class FakeUartProvider(FakeProvider):
+    '''
+    upgrade_framework of a UART provider takes the file
+    '''
+
+    def setup(self, options):
+        pass
+
+    def upgrade_completed(self, options):
+        pass
+
+    def upgrade_framework(self, params):
+        self.is_upgrading = True
+        threading.Thread(target=self._upgrade, args=(params,)).start()
+
+
+class FakeSerialUnit(object):
+    def __init__(self, port, provider):
+        self.device_key = port
+        self.provider = provider
+
+    def find_device(self, callback, retries=0, not_found_handler=None):
+        if self.provider is None:
+            raise Exception('no response')
+        callback(self.provider)
+
+
+class FakeSerialFleet(object):
+    def __init__(self, units):
+        self.units = units
+
+    def discover(self):
+        return self.units
+
+
+def test_serial_fleet_units():
+    options = WebserverArgs(interface='uart', com_port='COM3, COM4', fleet=True)
+    units = SerialFleet(options).discover()
+
+    assert [unit.device_key for unit in units] == ['COM3', 'COM4']
+    assert [unit.com_port for unit in units] == ['COM3', 'COM4']
+    assert options.com_port == 'COM3, COM4'
+
+
+def test_upgrade_devices_on_serial_ports():
+    counter = Counter()
+    units = [FakeSerialUnit('/dev/ttyUSB{0}'.format(index), FakeUartProvider(counter))
+             for index in range(3)]
+    # a port without device does not stop the others
+    units.append(FakeSerialUnit('/dev/ttyUSB3', None))
+    options = WebserverArgs(interface='uart', fleet=True, upgrade_concurrency=3)
+    driver = FleetDriver(options, FakeSerialFleet(units))
+    driver.detect()
+
+    assert sorted(driver.get_providers()) == \
+        ['/dev/ttyUSB0', '/dev/ttyUSB1', '/dev/ttyUSB2']
+    result = driver.execute('upgrade_framework', 'RTK330L.bin')
+
+    assert result['data']['succeeded'] == 3
+    assert counter.max_running == 3
+    assert counter.reads == 1
@@ -0,0 +1,94 @@
+"""
+Micro benchmark of the CRC-CCITT used by the 0x5555 frames.
+Compares the bitwise implementation the parsers used to call with the
+table driven and the binascii backed paths in framework/utils/crc.
+
+    python tools/benchmarks/crc_benchmark.py [-s 1024] [-n 2000]
+"""
+import os
+import sys
+import time
+import argparse
+
+try:
+    from aceinna.framework.utils import crc
+except:  # pylint: disable=bare-except
+    sys.path.append('./src')
+    from aceinna.framework.utils import crc
+
+
+def bitwise_crc(payload):
+    '''
+    The former helper.calc_crc, kept as reference
+    '''
+    crc_value = 0x1D0F
+    for bytedata in payload:
+        crc_value = crc_value ^ (bytedata << 8)
+        i = 0
+        while i < 8:
+            if crc_value & 0x8000:
+                crc_value = (crc_value << 1) ^ 0x1021
+            else:
+                crc_value = crc_value << 1
+            i += 1
+        crc_value = crc_value & 0xffff
+    return crc_value
+
+
+def table_crc(payload):
+    return crc._update_by_table(crc.CRC16_INIT, payload)  # pylint: disable=protected-access
+
+
+def fast_crc(payload):
+    return crc.crc16(payload)
+
+
+def incremental_crc(payload, chunk_size=64):
+    state = crc.CRC16_INIT
+    view = memoryview(payload)
+    for start in range(0, len(view), chunk_size):
+        state = crc.update(state, view[start:start + chunk_size])
+    return state
+
+
+def measure(func, payload, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(payload)
+    elapsed = time.perf_counter() - start
+    return (len(payload) * iterations) / elapsed / (1024 * 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CRC micro benchmark')
+    parser.add_argument('-s', dest='size', type=int, default=1024,
+                        help='payload size in bytes')
+    parser.add_argument('-n', dest='iterations', type=int, default=2000,
+                        help='iterations of the fast paths')
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size)
+    expected = bitwise_crc(payload)
+
+    cases = [
+        ('bitwise (former calc_crc)', bitwise_crc, max(args.iterations // 100, 1)),
+        ('table, list input', lambda data: table_crc(list(data)), max(args.iterations // 10, 1)),
+        ('crc16, bytes input', fast_crc, args.iterations),
+        ('crc16, list input', lambda data: fast_crc(list(data)), args.iterations),
+        ('update, 64 byte chunks', incremental_crc, args.iterations),
+    ]
+
+    print('payload {0} bytes'.format(args.size))
+    baseline = None
+    for name, func, iterations in cases:
+        if func(payload) != expected:
+            raise AssertionError('{0} returns a different crc'.format(name))
+        throughput = measure(func, payload, iterations)
+        if baseline is None:
+            baseline = throughput
+        print('{0:<28s}{1:>12.2f} MB/s{2:>10.1f}x'.format(
+            name, throughput, throughput / baseline))
+
+
+if __name__ == '__main__':
+    main()
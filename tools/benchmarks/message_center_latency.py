@@ -0,0 +1,128 @@
+"""
+Latency of DeviceMessageCenter, from the moment communicator.read returns
+a block to the continuous_message emit of the frame in that block.
+A fake communicator feeds 0x5555 frames at a fixed rate, each carrying
+its sequence number, so no device is needed.
+
+    python tools/benchmarks/message_center_latency.py [-n 2000] [-r 200]
+"""
+import sys
+import time
+import struct
+import argparse
+import threading
+
+try:
+    from aceinna.framework.utils import crc
+    from aceinna.devices.message_center import (DeviceMessageCenter, EVENT_TYPE)
+    from aceinna.devices.parsers.rtk330l_message_parser import UartMessageParser
+except:  # pylint: disable=bare-except
+    sys.path.append('./src')
+    from aceinna.framework.utils import crc
+    from aceinna.devices.message_center import (DeviceMessageCenter, EVENT_TYPE)
+    from aceinna.devices.parsers.rtk330l_message_parser import UartMessageParser
+
+PACKET_TYPE = b'zB'
+
+CONFIGURATION = {
+    'userConfiguration': [],
+    'userMessages': {
+        'inputPackets': [],
+        'outputPackets': [{
+            'name': PACKET_TYPE.decode(),
+            'payload': [
+                {'type': 'uint32', 'name': 'sequence'},
+                {'type': 'double', 'name': 'value'}
+            ]
+        }]
+    }
+}
+
+
+def build_frame(sequence):
+    payload = struct.pack('<Id', sequence, 0.0)
+    body = PACKET_TYPE + bytes([len(payload)]) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+class FakeCommunicator(object):
+    '''
+    Return one frame per read at the given rate, None in between
+    '''
+
+    def __init__(self, count, rate):
+        self.type = 'fake'
+        self.read_times = {}
+        self._count = count
+        self._interval = 1.0 / rate
+        self._sequence = 0
+        self._next_time = time.perf_counter()
+
+    def read(self, size=100):  # pylint: disable=unused-argument
+        if self._sequence >= self._count:
+            return None
+        if time.perf_counter() < self._next_time:
+            return None
+
+        frame = build_frame(self._sequence)
+        self.read_times[self._sequence] = time.perf_counter()
+        self._sequence += 1
+        self._next_time += self._interval
+        return frame
+
+    def write(self, data, is_flush=False):  # pylint: disable=unused-argument
+        pass
+
+
+def percentile(values, ratio):
+    index = min(int(len(values) * ratio), len(values) - 1)
+    return values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Message center latency')
+    parser.add_argument('-n', dest='count', type=int, default=2000,
+                        help='number of frames')
+    parser.add_argument('-r', dest='rate', type=int, default=200,
+                        help='frames per second')
+    args = parser.parse_args()
+
+    communicator = FakeCommunicator(args.count, args.rate)
+    message_center = DeviceMessageCenter(communicator)
+    message_center.set_parser(UartMessageParser(CONFIGURATION))
+
+    latencies = []
+    done = threading.Event()
+
+    def on_continuous_message(packet_type, data, event_time, **kwargs):  # pylint: disable=unused-argument
+        sequence = data['sequence']
+        latencies.append(
+            time.perf_counter() - communicator.read_times[sequence])
+        if len(latencies) == args.count:
+            done.set()
+
+    message_center.on(EVENT_TYPE.CONTINUOUS_MESSAGE, on_continuous_message)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    message_center.setup()
+    done.wait(args.count / args.rate + 10)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    message_center.stop()
+
+    if not latencies:
+        print('no frame received')
+        return
+
+    latencies.sort()
+    print('frames {0}/{1} at {2} Hz'.format(
+        len(latencies), args.count, args.rate))
+    for name, ratio in [('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1)]:
+        print('{0:<6s}{1:>10.3f} ms'.format(
+            name, percentile(latencies, ratio) * 1000))
+    print('cpu   {0:>10.1f} %'.format(cpu / wall * 100))
+
+
+if __name__ == '__main__':
+    main()
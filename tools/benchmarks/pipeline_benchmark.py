@@ -0,0 +1,394 @@
+"""
+Offline benchmark of the receive -> parse -> log pipeline. Each case feeds a
+frame corpus, synthetic or recorded, to one stage of the pipeline and
+reports frames/s, MB/s, p50/p99 per frame latency and the peak RSS of the
+process running the case. Cases run in their own process, one by one.
+
+    python tools/benchmarks/pipeline_benchmark.py [-n 20000] [-o result.json]
+        [--corpus INS401=user_xxx.bin] [--baseline baseline.json] [--tolerance 0.2]
+
+With --baseline, it exits with 1 when frames/s of a case drops more than
+tolerance below the baseline.
+"""
+import os
+import sys
+import json
+import time
+import random
+import struct
+import argparse
+import platform
+import datetime
+import tempfile
+import multiprocessing
+
+try:
+    import aceinna
+    from aceinna.framework.utils import (crc, helper)
+    from aceinna.framework.file_storage import FileLoger
+    from aceinna.core.gnss import (RTCMParser, calc_crc)
+    from aceinna.devices.parsers.packet_decoder import get_output_decoder
+    from aceinna.devices.parsers.uart_framer import UartFramer
+    from aceinna.devices.parsers.ins401_log_decoder import (
+        UserLogDecoder, iter_frames)
+    from aceinna.devices.parsers import (
+        rtk330l_message_parser, rtk350l_message_parser, beidou_message_parser,
+        ins401_message_parser, rtk330l_packet_parser, rtk350l_packet_parser,
+        ins401_packet_parser)
+except:  # pylint: disable=bare-except
+    sys.path.append('./src')
+    import aceinna
+    from aceinna.framework.utils import (crc, helper)
+    from aceinna.framework.file_storage import FileLoger
+    from aceinna.core.gnss import (RTCMParser, calc_crc)
+    from aceinna.devices.parsers.packet_decoder import get_output_decoder
+    from aceinna.devices.parsers.uart_framer import UartFramer
+    from aceinna.devices.parsers.ins401_log_decoder import (
+        UserLogDecoder, iter_frames)
+    from aceinna.devices.parsers import (
+        rtk330l_message_parser, rtk350l_message_parser, beidou_message_parser,
+        ins401_message_parser, rtk330l_packet_parser, rtk350l_packet_parser,
+        ins401_packet_parser)
+
+SETTING_FOLDER = os.path.join(os.path.dirname(aceinna.__file__), 'setting')
+
+UART = 'uart'
+ETHERNET = 'ethernet'
+RTCM = 'RTCM'
+
+# product: (interface, setting file, message parser, packet parser)
+PRODUCTS = {
+    'RTK330L': (UART, os.path.join('RTK330L', 'RTK_INS', 'RTK330L.json'),
+                rtk330l_message_parser.UartMessageParser, rtk330l_packet_parser),
+    'RTK350LA': (UART, os.path.join('RTK350L', 'RTK_INS', 'RTK350LA.json'),
+                 rtk350l_message_parser.UartMessageParser, rtk350l_packet_parser),
+    'BEIDOU': (UART, os.path.join('beidou', 'INS', 'beidou.json'),
+               beidou_message_parser.UartMessageParser, rtk330l_packet_parser),
+    'INS401': (ETHERNET, os.path.join('INS401', 'RTK_INS', 'ins401.json'),
+               ins401_message_parser.EthernetMessageParser, ins401_packet_parser),
+    'INS402': (ETHERNET, os.path.join('INS402', 'RTK_INS', 'ins402.json'),
+               ins401_message_parser.EthernetMessageParser, ins401_packet_parser),
+    'INS502': (ETHERNET, os.path.join('INS502', 'RTK_INS', 'ins502.json'),
+               ins401_message_parser.EthernetMessageParser, ins401_packet_parser),
+}
+
+RTCM_CHUNK_SIZE = 1024
+
+
+def load_configuration(product):
+    with open(os.path.join(SETTING_FOLDER, PRODUCTS[product][1])) as json_data:
+        return json.load(json_data)
+
+
+def random_payload(rand, size):
+    # keep the exponent of float values away from NaN
+    return bytes(rand.getrandbits(6) for _ in range(size))
+
+
+def uart_frame(packet_type, payload):
+    body = packet_type.encode() + bytes([len(payload)]) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def ethernet_frame(packet_type, payload):
+    body = packet_type + struct.pack('<I', len(payload)) + payload
+    return b'UU' + body + crc.crc16_bytes(body)
+
+
+def rtcm_frame(rand):
+    payload = bytes(rand.getrandbits(8) for _ in range(rand.randint(20, 300)))
+    header = bytes([0xD3, len(payload) >> 8, len(payload) & 0xFF])
+    data = header + payload
+    return data + calc_crc(data, len(data)).to_bytes(3, 'big')
+
+
+def synthetic_frames(product, count, seed=17):
+    '''
+    Frames of the output packets of product, in random order
+    '''
+    rand = random.Random(seed)
+    if product == RTCM:
+        return [rtcm_frame(rand) for _ in range(count)]
+
+    interface = PRODUCTS[product][0]
+    if interface == ETHERNET:
+        # the logged packets, as they are sent on 100base-t1
+        layouts = list(UserLogDecoder().layouts.values())
+        templates = [(layout.packet_type, random_payload(rand, layout.size))
+                     for layout in layouts]
+        build = ethernet_frame
+    else:
+        templates = []
+        for output_packet in load_configuration(product)['userMessages']['outputPackets']:
+            decoder = get_output_decoder(output_packet)
+            size = decoder.size * (5 if decoder.is_list else 1)
+            if size == 0 or size > 255:
+                continue
+            templates.append((output_packet['name'], random_payload(rand, size)))
+        build = uart_frame
+
+    frames = [build(*template) for template in templates]
+    return [frames[rand.randrange(len(frames))] for _ in range(count)]
+
+
+def recorded_frames(product, path, count):
+    '''
+    Cut the frames out of a recorded log of product
+    '''
+    with open(path, 'rb') as log_file:
+        data = log_file.read()
+
+    if product == RTCM:
+        frames = [data[i:i + RTCM_CHUNK_SIZE]
+                  for i in range(0, len(data), RTCM_CHUNK_SIZE)]
+    elif PRODUCTS[product][0] == ETHERNET:
+        frames = [data[payload_index - 8:payload_index + payload_len + 2]
+                  for _, payload_index, payload_len in iter_frames(data)]
+    else:
+        frames = [frame for _, frame, crc_passed in UartFramer().feed(data)
+                  if crc_passed]
+    return frames[:count] if count else frames
+
+
+def get_peak_rss():
+    '''
+    Peak resident set size of this process in KB, None if it is unknown
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KB on linux
+    if sys.platform == 'darwin':
+        peak = peak // 1024
+    return peak
+
+
+def percentile(values, ratio):
+    index = min(int(len(values) * ratio), len(values) - 1)
+    return values[index]
+
+
+def measure(func, items):
+    perf_counter = time.perf_counter
+    latencies = []
+    append = latencies.append
+    wall_start = perf_counter()
+    for item in items:
+        start = perf_counter()
+        func(item)
+        append(perf_counter() - start)
+    wall = perf_counter() - wall_start
+    latencies.sort()
+    return wall, latencies
+
+
+# stages, each returns (prepare items, func) for the frames
+
+
+def stage_crc(product, frames):
+    return [list(frame[2:-2]) for frame in frames], helper.calc_crc
+
+
+def stage_analyse(product, frames):
+    message_parser = PRODUCTS[product][2](load_configuration(product))
+    if PRODUCTS[product][0] == ETHERNET:
+        return frames, message_parser.analyse
+    # the UART parsers are fed by the read blocks, one frame per block here
+    return [list(frame) for frame in frames], message_parser.analyse
+
+
+def stage_continuous_parser(product, frames):
+    interface, _, _, packet_parser = PRODUCTS[product]
+    output_packets = load_configuration(product)['userMessages']['outputPackets']
+    if interface == ETHERNET:
+        # payloads of the packets in the web UI tables
+        rand = random.Random(3)
+        items = []
+        for _ in range(len(frames)):
+            output_packet = output_packets[rand.randrange(len(output_packets))]
+            size = get_output_decoder(output_packet).size
+            items.append((random_payload(rand, size), output_packet))
+    else:
+        configurations = dict(
+            (output_packet['name'], output_packet) for output_packet in output_packets)
+        items = [(frame[5:-2], configurations[frame[2:4].decode()])
+                 for frame in frames]
+    parse = packet_parser.common_continuous_parser
+    return items, lambda item: parse(*item)
+
+
+def stage_rtcm_receive(product, frames):
+    return frames, RTCMParser().receive
+
+
+STAGES = {
+    'crc': stage_crc,
+    'analyse': stage_analyse,
+    'continuous_parser': stage_continuous_parser,
+    'rtcm_receive': stage_rtcm_receive,
+}
+
+
+def run_file_loger_case(product, count):
+    '''
+    FileLoger.log of decoded packets, in a temporary executor folder
+    '''
+    configuration = load_configuration(product)
+    rand = random.Random(5)
+    rows = []
+    decoders = [get_output_decoder(output_packet)
+                for output_packet in configuration['userMessages']['outputPackets']]
+    for _ in range(count):
+        decoder = decoders[rand.randrange(len(decoders))]
+        data = decoder.decode(random_payload(rand, decoder.size))
+        rows.append((decoder.name, data[0] if decoder.is_list else data))
+
+    setattr(sys, '__dev__', True)
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        file_loger = FileLoger(configuration)
+        file_loger.start_user_log('benchmark')
+        wall, latencies = measure(lambda row: file_loger.log(*row), rows)
+        file_loger.stop_user_log()
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, names in os.walk(folder) for name in names)
+        os.chdir(os.path.dirname(folder))
+    return wall, latencies, size
+
+
+def run_case(case):
+    '''
+    Run a case, in the worker process
+    '''
+    name, product, stage, corpus, count = case
+    if stage == 'file_loger':
+        wall, latencies, size = run_file_loger_case(product, count)
+    else:
+        if corpus == 'synthetic':
+            frames = synthetic_frames(product, count)
+        else:
+            frames = recorded_frames(product, corpus, count)
+        size = sum(len(frame) for frame in frames)
+        items, func = STAGES[stage](product, frames)
+        wall, latencies = measure(func, items)
+
+    frames_count = len(latencies)
+    return {
+        'name': name,
+        'product': product,
+        'stage': stage,
+        'corpus': corpus if corpus == 'synthetic' else os.path.basename(corpus),
+        'frames': frames_count,
+        'bytes': size,
+        'seconds': wall,
+        'frames_per_second': frames_count / wall if wall else 0,
+        'mb_per_second': size / wall / (1024 * 1024) if wall else 0,
+        'latency_p50_us': percentile(latencies, 0.5) * 1e6 if latencies else 0,
+        'latency_p99_us': percentile(latencies, 0.99) * 1e6 if latencies else 0,
+        'peak_rss_kb': get_peak_rss()
+    }
+
+
+def build_cases(count, corpora):
+    cases = [('crc.INS401', 'INS401', 'crc', 'synthetic', count)]
+    for product in PRODUCTS:
+        cases.append(('analyse.' + product, product, 'analyse', 'synthetic', count))
+        cases.append(('continuous_parser.' + product, product,
+                      'continuous_parser', 'synthetic', count))
+    cases.append(('rtcm_receive', RTCM, 'rtcm_receive', 'synthetic', count))
+    cases.append(('file_loger.INS401', 'INS401', 'file_loger', 'synthetic', count))
+
+    for product, path in corpora:
+        stage = 'rtcm_receive' if product == RTCM else 'analyse'
+        cases.append(('{0}.{1}.recorded'.format(stage, product),
+                      product, stage, path, 0))
+    return cases
+
+
+def compare_with_baseline(results, baseline_path, tolerance):
+    '''
+    Return the names of the cases slower than baseline
+    '''
+    with open(baseline_path) as baseline_file:
+        baseline = dict((case['name'], case)
+                        for case in json.load(baseline_file)['cases'])
+    regressions = []
+    for case in results['cases']:
+        expected = baseline.get(case['name'])
+        if expected is None or not expected['frames_per_second']:
+            continue
+        ratio = case['frames_per_second'] / expected['frames_per_second']
+        case['baseline_ratio'] = ratio
+        if ratio < 1 - tolerance:
+            regressions.append(case['name'])
+    return regressions
+
+
+def parse_corpus(value):
+    product, _, path = value.partition('=')
+    product = product.upper()
+    if product not in PRODUCTS and product != RTCM or not path:
+        raise argparse.ArgumentTypeError(
+            'corpus should be PRODUCT=path, PRODUCT is one of {0}'.format(
+                list(PRODUCTS) + [RTCM]))
+    return product, path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pipeline benchmark')
+    parser.add_argument('-n', dest='count', type=int, default=20000,
+                        help='number of synthetic frames per case')
+    parser.add_argument('-o', dest='output', type=str, default=None,
+                        help='json file of the result')
+    parser.add_argument('-k', dest='filter', type=str, default=None,
+                        help='only run the cases whose name contains it')
+    parser.add_argument('--corpus', dest='corpora', type=parse_corpus,
+                        action='append', default=[],
+                        help='recorded log, as PRODUCT=path, could be repeated')
+    parser.add_argument('--baseline', dest='baseline', type=str, default=None,
+                        help='json result to compare with')
+    parser.add_argument('--tolerance', dest='tolerance', type=float, default=0.2,
+                        help='allowed drop of frames/s from baseline')
+    args = parser.parse_args()
+
+    cases = [case for case in build_cases(args.count, args.corpora)
+             if not args.filter or args.filter in case[0]]
+
+    results = {
+        'version': aceinna.VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': datetime.datetime.now().isoformat(),
+        'cases': []
+    }
+
+    print('{0:<34s}{1:>12s}{2:>10s}{3:>10s}{4:>10s}{5:>12s}'.format(
+        'case', 'frames/s', 'MB/s', 'p50 us', 'p99 us', 'peak KB'))
+    context = multiprocessing.get_context('spawn')
+    for case in cases:
+        # a new process per case, so the peak RSS belongs to the case
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (case,))
+        results['cases'].append(result)
+        print('{name:<34s}{frames_per_second:>12.0f}{mb_per_second:>10.2f}'
+              '{latency_p50_us:>10.1f}{latency_p99_us:>10.1f}{peak:>12}'.format(
+                  peak=result['peak_rss_kb'] or '-', **result))
+
+    regressions = []
+    if args.baseline:
+        regressions = compare_with_baseline(results, args.baseline, args.tolerance)
+        for name in regressions:
+            print('regression: {0}'.format(name))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=4)
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()